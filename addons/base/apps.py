@@ -1,15 +1,21 @@
 import os
 import glob
+import importlib
 import mimetypes
 
 from django.apps import AppConfig
+from django.utils.functional import cached_property
+from werkzeug.routing import BuildError
 
 from mako.lookup import TemplateLookup
 from framework.routing import process_rules
-from framework.flask import app
+from framework.flask import app, url_for as flask_url_for
 from website import settings
 from website.util import rubeus
 
+# Addons whose routes are not added to the Flask app yet
+_deferred_routes = []
+
 
 def _is_image(filename):
     mtype, _ = mimetypes.guess_type(filename)
@@ -49,6 +55,29 @@ def generic_root_folder(addon_short_name):
     return _root_folder
 
 
+def load_addon_routes():
+    """Add the routing rules of the addons deferred by settings.LAZY_ADDON_LOADING
+    to the Flask app.
+    """
+    while _deferred_routes:
+        _deferred_routes.pop(0).load_routes()
+
+
+def _build_url_with_deferred_routes(error, endpoint, values):
+    """Load the deferred addon routes when a URL cannot be built, e.g. by
+    api_url_for in the API, and build it again.
+    """
+    if not _deferred_routes:
+        return None
+    load_addon_routes()
+    try:
+        return flask_url_for(endpoint, **values)
+    except BuildError:
+        return None
+
+app.url_build_error_handlers.append(_build_url_with_deferred_routes)
+
+
 class BaseAddonAppConfig(AppConfig):
     name = 'addons.base'
     label = 'addons_base'
@@ -78,9 +107,12 @@ class BaseAddonAppConfig(AppConfig):
     is_allowed_default = True
     for_institutions = False
 
-    def __init__(self, *args, **kwargs):
-        ret = super(BaseAddonAppConfig, self).__init__(*args, **kwargs).__init__()
-        # Build template lookup
+    # Whether the routing rules were added to the Flask app, see load_routes
+    routes_loaded = False
+
+    @cached_property
+    def template_lookup(self):
+        """Mako lookup of the settings templates, built on first use."""
         paths = [settings.TEMPLATES_PATH]
         if self.user_settings_template:
             paths.append(os.path.dirname(self.user_settings_template))
@@ -95,26 +127,24 @@ class BaseAddonAppConfig(AppConfig):
                 ]
             )
         )
-        if template_dirs:
-            self.template_lookup = TemplateLookup(
-                directories=template_dirs,
-                default_filters=[
-                    'unicode',  # default filter; must set explicitly when overriding
-                    'temp_ampersand_fixer',
-                    # FIXME: Temporary workaround for data stored in wrong format in DB. Unescape it before it gets re-escaped by Markupsafe. See [#OSF-4432]
-                    'h',
-                ],
-                imports=[
-                    'from website.util.sanitize import temp_ampersand_fixer',
-                    # FIXME: Temporary workaround for data stored in wrong format in DB. Unescape it before it gets re-escaped by Markupsafe. See [#OSF-4432]
-                    'from flask_babel import gettext as _',
-                    'from flask_babel import ngettext',
-                    'from markupsafe import escape as h',
-                ]
-            )
-        else:
-            self.template_lookup = None
-        return ret
+        if not template_dirs:
+            return None
+        return TemplateLookup(
+            directories=template_dirs,
+            default_filters=[
+                'unicode',  # default filter; must set explicitly when overriding
+                'temp_ampersand_fixer',
+                # FIXME: Temporary workaround for data stored in wrong format in DB. Unescape it before it gets re-escaped by Markupsafe. See [#OSF-4432]
+                'h',
+            ],
+            imports=[
+                'from website.util.sanitize import temp_ampersand_fixer',
+                # FIXME: Temporary workaround for data stored in wrong format in DB. Unescape it before it gets re-escaped by Markupsafe. See [#OSF-4432]
+                'from flask_babel import gettext as _',
+                'from flask_babel import ngettext',
+                'from markupsafe import escape as h',
+            ]
+        )
 
     @property
     def full_name(self):
@@ -173,8 +203,23 @@ class BaseAddonAppConfig(AppConfig):
             'has_page_icon': self.has_page_icon
         }
 
-    # Override Appconfig
-    def ready(self):
-        # Set up Flask routes
+    def load_routes(self):
+        """Add the routing rules of the addon to the Flask app, importing its
+        routes and views. Does nothing if they were already added.
+        """
+        if self.routes_loaded:
+            return
+        self.routes_loaded = True
         for route_group in self.routes:
             process_rules(app, **route_group)
+
+    # Override Appconfig
+    def ready(self):
+        if not settings.LAZY_ADDON_LOADING:
+            self.load_routes()
+            return
+        # Set up Flask routes when first needed, see load_addon_routes
+        for module in settings.SIGNAL_RECEIVER_MODULES:
+            importlib.import_module(module)
+        if not self.routes_loaded and self not in _deferred_routes:
+            _deferred_routes.append(self)
@@ -1,13 +1,17 @@
 # -*- coding: utf-8 -*-
 import abc
+import hashlib
+import json
 import six
 import logging
+import threading
 import time
 
-from django.db import models
+from django.db import models, transaction
 from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
 
+from osf.models.institution import Institution
 from osf.models.node import Node
 from osf.models.rdm_addons import RdmAddonOption
 from website import settings as website_settings
@@ -16,6 +20,7 @@ from admin.rdm.utils import get_institution_id
 from admin.rdm_addons.utils import get_rdm_addon_option
 from addons.base import exceptions
 from addons.base.models import BaseNodeSettings, BaseStorageAddon
+from addons.base.utils import run_in_threads
 from framework.auth import Auth
 
 logger = logging.getLogger(__name__)
@@ -29,6 +34,7 @@ ENABLED_ADDONS_FOR_INSTITUTIONS = []
 KEYNAME_BASE_FOLDER = 'base_folder'
 KEYNAME_USERMAP = 'usermap'
 KEYNAME_USERMAP_TMP = 'usermap_tmp'
+KEYNAME_SYNC_STATUS = 'sync_status'
 
 def register(node_settings_cls):
     name = node_settings_cls.SHORT_NAME
@@ -39,6 +45,8 @@ class InstitutionsNodeSettings(BaseNodeSettings):
     addon_option = models.ForeignKey(
         RdmAddonOption, null=True, blank=True, on_delete=models.CASCADE,
         related_name='%(app_label)s_node_settings')
+    # digest of the values synchronized by celery_sync_all()
+    sync_fingerprint = models.CharField(max_length=64, null=True, blank=True)
 
     class Meta:
         abstract = True
@@ -514,13 +522,118 @@ def sync_contributors(node, target_addons=None):
 from celery.contrib.abortable import AbortableTask
 from framework.celery_tasks import app as celery_app
 
+# number of nodes loaded and synchronized at a time by celery_sync_all()
+SYNC_ALL_CHUNK_SIZE = 100
+# threads per addon, overridden by SYNC_ALL_MAX_WORKERS of the addon settings
+SYNC_ALL_MAX_WORKERS = 4
+
+def sync_fingerprint(node, ns):
+    """Digest of the node values which are synchronized to the storage."""
+    contributors = []
+    for cont in node.contributors.iterator():
+        contributors.append([cont._id, cont.is_active, cont.eppn,
+                             ns.osfuser_to_extuser(cont),
+                             sorted(node.get_permissions(cont))])
+    values = [
+        node.title,
+        ns.base_folder,
+        sorted(ns.addon_option.external_accounts.values_list('id', flat=True)),
+        sorted(contributors),
+    ]
+    return hashlib.sha256(json.dumps(values)).hexdigest()
+
+def save_sync_status(addon_option, status):
+    with transaction.atomic():
+        # read again not to overwrite other keys changed by the admin
+        opt = RdmAddonOption.objects.select_for_update().get(pk=addon_option.pk)
+        if opt.extended is None:
+            opt.extended = {}
+        opt.extended[KEYNAME_SYNC_STATUS] = status
+        opt.save()
+
+def _sync_node_settings(node, ns, force):
+    """Synchronize title and contributors, returns 'synced', 'skipped' or 'failed'.
+
+    The folder of the node is recreated if it is missing even when nothing
+    changed since the last synchronization.
+    """
+    if not check_existence_and_create(node, ns, 'sync_all'):
+        return 'failed'
+    fingerprint = sync_fingerprint(node, ns)
+    if not force and ns.sync_fingerprint == fingerprint:
+        return 'skipped'
+    try:
+        ns.sync_title()
+        time.sleep(SYNC_WAIT)
+        ns.sync_contributors()
+        time.sleep(SYNC_WAIT)
+    except Exception:
+        logger.exception(u'sync_all: addon_name={}, title={}, GUID={}'.format(ns.SHORT_NAME, node.title, node._id))
+        return 'failed'
+    type(ns).objects.filter(pk=ns.pk).update(sync_fingerprint=fingerprint)
+    return 'synced'
+
+def _sync_all_for_addon(task, institution_id, addon_name, node_settings_cls, node_ids, force):
+    addon_option = get_rdm_addon_option(
+        Institution.objects.get(_id=institution_id).id, addon_name)
+    max_workers = getattr(node_settings_cls.addon_settings(),
+                          'SYNC_ALL_MAX_WORKERS', SYNC_ALL_MAX_WORKERS)
+    status = {
+        'state': 'running',
+        'total': len(node_ids),
+        'processed': 0,
+        'synced': 0,
+        'skipped': 0,
+        'failed': 0,
+        'started': int(time.time()),
+        'updated': int(time.time()),
+    }
+    save_sync_status(addon_option, status)
+    status_lock = threading.Lock()
+
+    def _func(node):
+        ns = node.get_addon(addon_name)
+        if ns is None or not ns.addon_option.is_allowed or not ns.complete:
+            result = 'skipped'
+        else:
+            result = _sync_node_settings(node, ns, force)
+        with status_lock:
+            status[result] += 1
+
+    try:
+        for i in range(0, len(node_ids), SYNC_ALL_CHUNK_SIZE):
+            if task.is_aborted():
+                status['state'] = 'aborted'
+                break
+            chunk = node_ids[i:i + SYNC_ALL_CHUNK_SIZE]
+            nodes = [n for n in Node.objects.filter(id__in=chunk) if is_available(n)]
+            run_in_threads(_func, nodes, max_workers)
+            status['processed'] = i + len(chunk)
+            status['updated'] = int(time.time())
+            save_sync_status(addon_option, status)
+        else:
+            status['state'] = 'finished'
+    finally:
+        if status['state'] == 'running':  # interrupted by an exception
+            status['state'] = 'failed'
+        status['updated'] = int(time.time())
+        save_sync_status(addon_option, status)
+    logger.info(u'sync_all: institution={}, addon_name={}, status={}'.format(institution_id, addon_name, status))
+
 @celery_app.task(bind=True, base=AbortableTask)
-def celery_sync_all(self, institution_id, target_addons=None):
+def celery_sync_all(self, institution_id, target_addons=None, force=False):
     time.sleep(5)  # is_allowed may not be updated.
-    for n in Node.objects.filter(affiliated_institutions___id=institution_id,
-                                 is_deleted=False):
-        sync_title(n, target_addons=target_addons, force=True)
-        sync_contributors(n, target_addons=target_addons)
+    node_ids = list(Node.objects.filter(
+        affiliated_institutions___id=institution_id,
+        is_deleted=False).order_by('id').values_list('id', flat=True))
+    for addon_name, node_settings_cls in ENABLED_ADDONS_FOR_INSTITUTIONS:
+        if addon_name not in website_settings.ADDONS_AVAILABLE_DICT:
+            continue  # skip
+        if target_addons and addon_name not in target_addons:
+            continue  # skip
+        _sync_all_for_addon(self, institution_id, addon_name,
+                            node_settings_cls, node_ids, force)
 
-def sync_all(institution_id, target_addons=None):
-    celery_sync_all.delay(institution_id, target_addons=target_addons)
+def sync_all(institution_id, target_addons=None, force=False):
+    celery_sync_all.delay(institution_id, target_addons=target_addons,
+                          force=force)
@@ -1,4 +1,9 @@
+import collections
+import sys
+import threading
+
 import markupsafe
+import six
 from os.path import basename
 from website.settings import MFR_SERVER_URL
 
@@ -54,3 +59,45 @@ def format_last_known_metadata(auth, node, file, error_type):
         ]
         return ''.join(parts)
     return msg
+
+
+def run_in_threads(func, items, max_threads):
+    """Call func(item) for each item, in at most max_threads threads.
+
+    The first exception raised by func stops the remaining items and is
+    raised again in the calling thread.
+    """
+    if max_threads <= 1 or len(items) <= 1:
+        for item in items:
+            func(item)
+        return
+    items = collections.deque(items)
+    items_lock = threading.Lock()
+    errors = []
+
+    def worker():
+        from django.db import connection
+        try:
+            while True:
+                with items_lock:
+                    if not items or errors:
+                        return
+                    item = items.popleft()
+                try:
+                    func(item)
+                except Exception:
+                    with items_lock:
+                        errors.append(sys.exc_info())
+                    return
+        finally:
+            # each thread has its own DB connection
+            connection.close()
+
+    threads = [threading.Thread(target=worker)
+               for _ in range(min(max_threads, len(items)))]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    if errors:
+        six.reraise(*errors[0])
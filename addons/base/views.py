@@ -48,7 +48,7 @@ from website.project import decorators
 from website.project.decorators import must_be_contributor_or_public, must_be_valid_project, check_contributor_auth
 from website.ember_osf_web.decorators import ember_flag_is_active
 from website.project.utils import serialize_node
-from website.util import rubeus, timestamp
+from website.util import post_upload, rubeus, timestamp, waterbutler_auth
 
 
 # import so that associated listener is instantiated and gets emails
@@ -157,6 +157,19 @@ permission_map = {
     'movefrom': permissions.WRITE,
 }
 
+_prereg_schema_ids = {}
+
+def get_prereg_schema_id():
+    """Id of the Prereg Challenge schema, looked up once per process."""
+    if 'prereg' not in _prereg_schema_ids:
+        try:
+            _prereg_schema_ids['prereg'] = RegistrationSchema.objects.only('id').get(
+                name='Prereg Challenge', schema_version=2).id
+        except RegistrationSchema.DoesNotExist:
+            # not memoized, the schema may be added later
+            return None
+    return _prereg_schema_ids['prereg']
+
 def check_access(node, auth, action, cas_resp):
     """Verify that user can perform requested action on resource. Raise appropriate
     error code if action cannot proceed.
@@ -208,20 +221,15 @@ def check_access(node, auth, action, cas_resp):
 
         # Users with the prereg admin permission should be allowed to download files
         # from prereg challenge draft registrations.
-        try:
-            prereg_schema = RegistrationSchema.objects.get(name='Prereg Challenge', schema_version=2)
-            allowed_nodes = [node] + node.parents
-            prereg_draft_registration = DraftRegistration.objects.filter(
-                branched_from__in=allowed_nodes,
-                registration_schema=prereg_schema
-            )
-            if action == 'download' and \
-                        auth.user is not None and \
-                        prereg_draft_registration.count() > 0 and \
-                        auth.user.has_perm('osf.administer_prereg'):
+        if action == 'download' and \
+                auth.user is not None and \
+                auth.user.has_perm('osf.administer_prereg'):
+            prereg_schema_id = get_prereg_schema_id()
+            if prereg_schema_id is not None and DraftRegistration.objects.filter(
+                branched_from__in=[node] + node.parents,
+                registration_schema_id=prereg_schema_id
+            ).exists():
                 return True
-        except RegistrationSchema.DoesNotExist:
-            pass
 
     raise HTTPError(httplib.FORBIDDEN if auth.user else httplib.UNAUTHORIZED)
 
@@ -301,14 +309,32 @@ def get_auth(auth, **kwargs):
     if not node:
         raise HTTPError(httplib.NOT_FOUND)
 
-    check_access(node, auth, action, cas_resp)
+    # The access checks of a folder operation are the same for each file
+    cacheable = cas_resp is None and isinstance(node, AbstractNode)
+    allowed, generation = waterbutler_auth.lookup(auth, node, provider_name, action) if cacheable else (False, None)
+    if not allowed:
+        check_access(node, auth, action, cas_resp)
+        if cacheable:
+            waterbutler_auth.store(auth, node, provider_name, action, generation)
     provider_settings = None
     if hasattr(node, 'get_addon'):
         provider_settings = node.get_addon(provider_name)
         if not provider_settings:
             raise HTTPError(httplib.BAD_REQUEST)
 
-    path = data.get('path')
+    if 'paths' in data:
+        # Batch of files of one operation, e.g. a folder download
+        if not isinstance(data['paths'], list) or data.get('version'):
+            raise HTTPError(httplib.BAD_REQUEST)
+        return {'payloads': [
+            make_waterbutler_payload(auth, node, provider_settings, provider_name, action, data, path)
+            for path in data['paths']
+        ]}
+    return {'payload': make_waterbutler_payload(auth, node, provider_settings, provider_name, action, data, data.get('path'))}
+
+
+def make_waterbutler_payload(auth, node, provider_settings, provider_name, action, data, path):
+    """Encrypted response of get_auth for a file of the node, once the access is checked."""
     credentials = None
     waterbutler_settings = None
     fileversion = None
@@ -321,8 +347,7 @@ def get_auth(auth, **kwargs):
                 # default to most recent version if none is provided in the response
                 version = int(data['version']) if data.get('version') else filenode.versions.count()
                 try:
-                    fileversion = FileVersion.objects.filter(
-                        basefilenode___id=file_id,
+                    fileversion = filenode.versions.filter(
                         identifier=version
                     ).select_related('region').get()
                 except FileVersion.DoesNotExist:
@@ -363,7 +388,7 @@ def get_auth(auth, **kwargs):
         credentials = node.serialize_waterbutler_credentials(provider_name)
         waterbutler_settings = node.serialize_waterbutler_settings(provider_name)
 
-    return {'payload': jwe.encrypt(jwt.encode({
+    return jwe.encrypt(jwt.encode({
         'exp': timezone.now() + datetime.timedelta(seconds=settings.WATERBUTLER_JWT_EXPIRATION),
         'data': {
             'auth': make_auth(auth.user),  # A waterbutler auth dict not an Auth object
@@ -375,7 +400,7 @@ def get_auth(auth, **kwargs):
                 _internal=True
             )
         }
-    }, settings.WATERBUTLER_JWT_SECRET, algorithm=settings.WATERBUTLER_JWT_ALGORITHM), WATERBUTLER_JWE_KEY)}
+    }, settings.WATERBUTLER_JWT_SECRET, algorithm=settings.WATERBUTLER_JWT_ALGORITHM), WATERBUTLER_JWE_KEY)
 
 
 LOG_ACTION_MAP = {
@@ -530,37 +555,33 @@ def create_waterbutler_log(payload, **kwargs):
                 provider = payload['metadata']['provider']
                 timestamp.file_node_deleted(node._id, provider, src_path)
 
-    def prepare_file_node(provider):
-        with transaction.atomic():
-            # to reduce possibility of MultipleObjectsReturned.
-            # [GRDM-13530, 15698, 17045, 17065]
-            # (MultipleObjectsReturned may occur when creation of
-            #  BaseFileNode is called in long transaction.)
-            file_node = BaseFileNode.resolve_class(
-                provider, BaseFileNode.FILE
-            ).get_or_create(node, '/' + metadata.get('path').lstrip('/'))
-            if file_node:
-                func_hash = getattr(file_node, 'get_hash_for_timestamp', None)
-                if func_hash:
-                    extras = {}
-                    # collect new metadata from waterbutler
-                    # and update external hashes of the file_node
-                    # to update timestamp by file hash
-                    file_node.touch(
-                        request.headers.get('Authorization'),
-                        **dict(
-                            extras,
-                            cookie=user.get_or_create_cookie()
-                        )
-                    )
+    if settings.POST_UPLOAD_ASYNC and not isinstance(node, Preprint):
+        # hashes, timestamp and file_updated signals are handled by a worker
+        if file_created_or_updated:
+            post_upload.enqueue(node, user, action, payload,
+                                metadata=metadata, created_flag=created_flag)
+        elif file_node_moved:
+            post_upload.enqueue(node, user, action, payload, metadata=metadata, move={
+                'src_provider': src_provider,
+                'dest_provider': dest_provider,
+                'src_path': src_path,
+                'dest_path': dest_path,
+                'src_metadata': src_metadata,
+            })
+        else:
+            post_upload.enqueue(node, user, action, payload)
+        return {'status': 'success'}
 
+    auth_header = request.headers.get('Authorization')
     if file_created_or_updated:
-        prepare_file_node(metadata['provider'])
+        post_upload.refresh_file_node(node, user, metadata['provider'],
+                                      metadata['path'], auth_header)
         with transaction.atomic():  # long transaction
             timestamp.file_created_or_updated(node, metadata, user.id,
                                               created_flag)
     elif file_node_moved:
-        prepare_file_node(dest_provider)
+        post_upload.refresh_file_node(node, user, dest_provider,
+                                      metadata['path'], auth_header)
         with transaction.atomic():  # long transaction
             timestamp.file_node_moved(auth.user.id, node._id,
                                       src_provider, dest_provider,
@@ -777,6 +798,8 @@ def verify_timestamp(auth, path, provider, **kwargs):
         'timestamp_verify_result_title': verify_result['verify_result_title'],
         'use_hash': verify_result['use_hash'],
         'external_timestamp': verify_result['external_timestamp'],
+        # the timestamp of the latest upload is not updated yet
+        'timestamp_pending': post_upload.is_timestamp_pending(target, provider, path),
     }
 
 
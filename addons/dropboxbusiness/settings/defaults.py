@@ -25,6 +25,15 @@ PROPERTY_SPLIT_DATA_CONF = {
     }
 }
 
+# Seconds a TeamInfo (members, admins, team folders) is reused by the
+# timestamp sync before being rebuilt from the Dropbox API
+TEAM_INFO_CACHE_EXPIRATION_SEC = 600
+# Number of threads checking timestamps of the changed files of a team
+TIMESTAMP_SYNC_WORKERS_PER_TEAM = 4
+# Seconds to wait before listing changes, so that timestamps added by
+# create_waterbutler_log() for uploads from GRDM are found
+TIMESTAMP_SYNC_DELAY_SEC = 5
+
 # Max file size permitted by frontend in megabytes
 MAX_UPLOAD_SIZE = 150
 
@@ -103,3 +103,42 @@ class TestDropboxBusiness(unittest.TestCase):
         assert_equal(result.group_id, 'g:dummy')
 
 
+
+
+class TestTimestampSync(unittest.TestCase):
+
+    def tearDown(self):
+        from addons.dropboxbusiness import utils
+        utils._team_info_cache.clear()
+
+    def test_team_info_is_cached_per_team(self):
+        from addons.dropboxbusiness import utils
+        with patch(DBXBIZ + '.utils.TeamInfo') as mock_team_info:
+            mock_team_info.side_effect = lambda f, m, **kw: Mock(
+                fileaccess_token=f, management_token=m,
+                created=utils.time.time())
+            first = utils.get_team_info_for_sync('dbtid:1', 'f', 'm')
+            assert_is(utils.get_team_info_for_sync('dbtid:1', 'f', 'm'), first)
+            assert_is_not(utils.get_team_info_for_sync('dbtid:2', 'f', 'm'), first)
+            # tokens are changed
+            assert_is_not(utils.get_team_info_for_sync('dbtid:1', 'f2', 'm'), first)
+            second = utils.get_team_info_for_sync('dbtid:1', 'f2', 'm')
+            utils.invalidate_team_info('dbtid:1')
+            assert_is_not(utils.get_team_info_for_sync('dbtid:1', 'f2', 'm'), second)
+            assert_equal(mock_team_info.call_count, 4)
+
+    def test_latest_file_attrs(self):
+        from addons.dropboxbusiness import utils
+        a1 = Mock(path_display='/Team/A.txt', path_lower='/team/a.txt')
+        b = Mock(path_display='/Team/b.txt', path_lower='/team/b.txt')
+        a2 = Mock(path_display='/team/a.txt', path_lower='/team/a.txt')
+        no_path = Mock(path_display=None, path_lower=None)
+        assert_equal(utils._latest_file_attrs([a1, b, no_path, a2]), [b, a2])
+
+    def test_run_in_threads(self):
+        from addons.base.utils import run_in_threads
+        results = []
+        with patch('django.db.connection') as mock_connection:
+            run_in_threads(results.append, list(range(100)), 4)
+        assert_equal(sorted(results), list(range(100)))
+        assert_equal(mock_connection.close.call_count, 4)
@@ -25,6 +25,7 @@ from osf.models import BaseFileNode, OSFUser
 from osf.models.external import ExternalAccount
 # from osf.models.nodelog import NodeLog
 from osf.models.rdm_addons import RdmAddonOption
+from addons.base.utils import run_in_threads
 from addons.dropboxbusiness import settings, lock
 from admin.rdm_addons.utils import get_rdm_addon_option
 from website.util import timestamp, waterbutler
@@ -398,6 +399,8 @@ def update_admin_dbmid(team_id):
                          team_info=True, admin=True, groups=True)
     admin_group, admin_dbmid_list = get_current_admin_group_and_sync(team_info)
     new_admin_dbmid = get_current_admin_dbmid(m_opt, admin_dbmid_list)
+    # members or admins may have changed
+    invalidate_team_info(team_id)
     # update admin_dbmid for fileaccess_client_admin
     team_info.set_admin_dbmid(new_admin_dbmid)
 
@@ -562,19 +565,7 @@ class TeamInfo(object):
     _fileaccess_client = None
     _fileaccess_client2 = None  # for bugfix
     _management_client = None
-    dbmid_to_email = {}
-    dbmid_to_role = {}
-    dbmid_to_dbid = {}
-    email_to_dbmid = {}
-    dbid_to_dbmid = {}
     _admin_dbmid = None
-    admin_dbmid_all = []
-    admin_email_all = []
-    group_name_to_id = {}
-    group_id_to_name = {}
-    team_folders = {}  # team_folder_id -> TeamFolder
-    team_folder_names = {}  # team_folder name -> TeamFolder
-    property_fields = set()
     property_template_id = None
 
     def __init__(self, fileaccess_token, management_token,
@@ -587,6 +578,20 @@ class TeamInfo(object):
         DEBUG('init TeamInfo()')
         self.fileaccess_token = fileaccess_token
         self.management_token = management_token
+        # per instance, not shared between teams
+        self.dbmid_to_email = {}
+        self.dbmid_to_role = {}
+        self.dbmid_to_dbid = {}
+        self.email_to_dbmid = {}
+        self.dbid_to_dbmid = {}
+        self.admin_dbmid_all = []
+        self.admin_email_all = []
+        self.group_name_to_id = {}
+        self.group_id_to_name = {}
+        self.team_folders = {}  # team_folder_id -> TeamFolder
+        self.team_folder_names = {}  # team_folder name -> TeamFolder
+        self.property_fields = set()
+        self.created = time.time()
         self.session = dropbox.dropbox.create_session(
             max_connections=max_connections)
 
@@ -690,7 +695,7 @@ class TeamInfo(object):
         self.dbmid_to_role = {}
         self.dbmid_to_dbid = {}
         self.email_to_dbmid = {}
-        self.dbid_to_email = {}
+        self.dbid_to_dbmid = {}
         # NOTE: client = self.management_client ... usable
         client = self.fileaccess_client_team
         while has_more:
@@ -1016,6 +1021,7 @@ class FileAttr(object):
     def __init__(self, team_info, ent):
         self.team_info = team_info
         self.path_display = ent.path_display
+        self.path_lower = ent.path_lower
         self.optype = self.OPTYPE_UNKNOWN
         self.modified_by = None  # email
 
@@ -1203,6 +1209,38 @@ def _check_and_add_timestamp(team_info, file_attr):
                 logger.exception('project guid={}'.format(addon.owner._id))
     # Unknown team_folder_id is ignored.
 
+_team_info_cache = {}  # team_id -> TeamInfo
+_team_info_cache_lock = threading.Lock()
+
+def get_team_info_for_sync(team_id, fileaccess_token, management_token):
+    """TeamInfo with admins, reused for TEAM_INFO_CACHE_EXPIRATION_SEC."""
+    with _team_info_cache_lock:
+        team_info = _team_info_cache.get(team_id)
+    if team_info is not None and \
+       team_info.fileaccess_token == fileaccess_token and \
+       team_info.management_token == management_token and \
+       time.time() - team_info.created < settings.TEAM_INFO_CACHE_EXPIRATION_SEC:
+        return team_info
+    team_info = TeamInfo(fileaccess_token, management_token, admin=True)
+    with _team_info_cache_lock:
+        _team_info_cache[team_id] = team_info
+    return team_info
+
+def invalidate_team_info(team_id):
+    with _team_info_cache_lock:
+        _team_info_cache.pop(team_id, None)
+
+def _latest_file_attrs(files):
+    """Keep the last entry of each path, the check reads the current state."""
+    latest = collections.OrderedDict()
+    for file_attr in files:
+        if file_attr.path_display is None:  # optional, cannot be checked
+            continue
+        key = file_attr.path_lower or file_attr.path_display.lower()
+        latest.pop(key, None)
+        latest[key] = file_attr
+    return list(latest.values())
+
 def team_id_to_instituion(team_id):
     try:
         ea = ExternalAccount.objects.get(
@@ -1237,15 +1275,21 @@ def celery_check_updated_files(self, team_ids):
         admin_dbmid = opt.extended.get(KEY_ADMIN_ID, None)
         list_cursor = opt.extended.get(KEY_LIST_CURSOR, None)
 
-        team_info = TeamInfo(fileaccess_token, management_token, admin=True)
+        team_info = get_team_info_for_sync(dbtid, fileaccess_token,
+                                           management_token)
         # Dropbox Team Admin is changed
         if admin_dbmid != team_info.admin_dbmid:
             admin_dbmid = team_info.admin_dbmid
             opt.extended[KEY_ADMIN_ID] = admin_dbmid
             list_cursor = None
         files, cursor = team_info.list_updated_files(list_cursor)
-        for file_attr in files:
-            _check_and_add_timestamp(team_info, file_attr)
+        files = _latest_file_attrs(files)
+        started = time.time()
+        run_in_threads(lambda file_attr: _check_and_add_timestamp(team_info, file_attr),
+                        files, settings.TIMESTAMP_SYNC_WORKERS_PER_TEAM)
+        elapsed = time.time() - started
+        logger.info(u'checked {} changed entries of Dropbox Business Team ID={} in {:.2f}s ({:.1f} entries/s)'.format(
+            len(files), dbtid, elapsed, len(files) / elapsed if elapsed > 0 else 0))
         opt.extended[KEY_LIST_CURSOR] = cursor
         opt.save()
 
@@ -1258,7 +1302,7 @@ def celery_check_updated_files(self, team_ids):
         if len(team_ids) == 0:
             break
         # to wait for updating timestamp in create_waterbutler_log()
-        time.sleep(5)
+        time.sleep(settings.TIMESTAMP_SYNC_DELAY_SEC)
         for dbtid in team_ids:
             institution = team_id_to_instituion(dbtid)
             name = u'Institution={}, Dropbox Business Team ID={}'.format(
@@ -1267,6 +1311,8 @@ def celery_check_updated_files(self, team_ids):
                 DEBUG(u'check and update timestamp: {}'.format(name))
                 _check_team_files(dbtid)
             except Exception:
+                # rebuild members and team folders at the next run
+                invalidate_team_info(dbtid)
                 logger.exception(name)
         team_ids = []
 
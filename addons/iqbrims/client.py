@@ -4,6 +4,11 @@ import json
 import logging
 import os
 import string
+import threading
+import time
+
+from django.conf import settings as django_settings
+from django.core.cache import caches
 
 from framework.exceptions import HTTPError
 
@@ -11,7 +16,42 @@ from website.util.client import BaseClient
 from addons.iqbrims import settings
 
 logger = logging.getLogger(__name__)
-_user_settings_cache = {}
+
+USER_SETTINGS_CACHE_KEY = 'settings:{folder_id}'
+USER_SETTINGS_LOCK_KEY = 'lock:{folder_id}'
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket which blocks callers exceeding the rate."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+_rate_limiter = TokenBucket(settings.API_RATE_LIMIT_PER_SEC,
+                            settings.API_RATE_LIMIT_BURST)
+
+
+class RateLimitedClient(BaseClient):
+
+    def _make_request(self, method, url, **kwargs):
+        _rate_limiter.acquire()
+        return super(RateLimitedClient, self)._make_request(method, url, **kwargs)
 
 
 class IQBRIMSAuthClient(BaseClient):
@@ -26,7 +66,7 @@ class IQBRIMSAuthClient(BaseClient):
         ).json()
 
 
-class IQBRIMSClient(BaseClient):
+class IQBRIMSClient(RateLimitedClient):
 
     def __init__(self, access_token=None):
         self.access_token = access_token
@@ -208,28 +248,31 @@ class IQBRIMSClient(BaseClient):
             'trashed = false',
             "mimeType = 'application/vnd.google-apps.folder'",
         ])
-        res = self._make_request(
-            'GET',
-            self._build_url(settings.API_BASE_URL, 'drive', 'v2', 'files', ),
-            params={'q': query},
-            expects=(200, ),
-            throws=HTTPError(401)
-        )
-        return res.json()['items']
+        return self._list_items(query)
 
     def files(self, folder_id='root'):
         query = ' and '.join([
             "'{0}' in parents".format(folder_id),
             'trashed = false',
         ])
-        res = self._make_request(
-            'GET',
-            self._build_url(settings.API_BASE_URL, 'drive', 'v2', 'files', ),
-            params={'q': query},
-            expects=(200, ),
-            throws=HTTPError(401)
-        )
-        return res.json()['items']
+        return self._list_items(query)
+
+    def _list_items(self, query):
+        params = {'q': query, 'maxResults': settings.DRIVE_LIST_PAGE_SIZE}
+        items = []
+        while True:
+            res = self._make_request(
+                'GET',
+                self._build_url(settings.API_BASE_URL, 'drive', 'v2', 'files', ),
+                params=dict(params),
+                expects=(200, ),
+                throws=HTTPError(401)
+            )
+            data = res.json()
+            items += data['items']
+            if not data.get('nextPageToken'):
+                return items
+            params['pageToken'] = data['nextPageToken']
 
     def create_folder(self, folder_id, title):
         res = self._make_request(
@@ -342,7 +385,7 @@ class IQBRIMSClient(BaseClient):
             return True, self.copy_file(src_file_id, folder_id, title)
 
 
-class SpreadsheetClient(BaseClient):
+class SpreadsheetClient(RateLimitedClient):
 
     def __init__(self, resource_id, access_token=None):
         self.resource_id = resource_id
@@ -513,32 +556,7 @@ class SpreadsheetClient(BaseClient):
 
     def add_files(self, files_sheet_id, files_sheet_idx,
                   mgmt_sheet_id, mgmt_sheet_idx, files):
-        top = {'depth': 0, 'name': None, 'files': [], 'dirs': []}
-        max_depth = 0
-        for f in files:
-            if f.endswith('/'):
-                continue
-            if len(f.strip()) == 0:
-                continue
-            paths = f.split('/')
-            target = top
-            for i, p in enumerate(paths):
-                if i == len(paths) - 1:
-                    target['files'].append(p)
-                    continue
-                next_target = None
-                for d in target['dirs']:
-                    if p == d['name']:
-                        next_target = d
-                        break
-                if next_target is None:
-                    new_depth = target['depth'] + 1
-                    d = {'depth': new_depth, 'name': p, 'files': [], 'dirs': []}
-                    if max_depth < new_depth:
-                        max_depth = new_depth
-                    target['dirs'].append(d)
-                    next_target = d
-                target = next_target
+        top, max_depth = self._build_file_tree(files)
         fc = self.ensure_columns(mgmt_sheet_id, ['Filled'], row=1)
         self.update_row(mgmt_sheet_id,
                         ['FALSE' if c == 'Filled' else '' for c in fc],
@@ -563,23 +581,25 @@ class SpreadsheetClient(BaseClient):
         values = [self._to_file_row(c, t, v, ex)
                   for (v, t), ex in zip(values, exts)]
         r = u'{0}!A{2}:{1}{2}'.format(files_sheet_id, self._row_name(len(c)), 1 + COMMENT_MARGIN)
-        res = self._make_request(
-            'POST',
-            self._build_url(settings.SHEETS_API_BASE_URL, 'v4', 'spreadsheets',
-                            self.resource_id, 'values', r + ':append'),
-            params={'valueInputOption': 'RAW'},
-            headers={
-                'Content-Type': 'application/json',
-            },
-            data=json.dumps({
-                'range': r,
-                'values': values,
-                'majorDimension': 'ROWS'
-            }),
-            expects=(200, ),
-            throws=HTTPError(401)
-        )
-        logger.info('Inserted: {}'.format(res.json()))
+        chunk_size = settings.SHEETS_MAX_ROWS_PER_REQUEST
+        for offset in range(0, max(len(values), 1), chunk_size):
+            res = self._make_request(
+                'POST',
+                self._build_url(settings.SHEETS_API_BASE_URL, 'v4', 'spreadsheets',
+                                self.resource_id, 'values', r + ':append'),
+                params={'valueInputOption': 'RAW'},
+                headers={
+                    'Content-Type': 'application/json',
+                },
+                data=json.dumps({
+                    'range': r,
+                    'values': values[offset:offset + chunk_size],
+                    'majorDimension': 'ROWS'
+                }),
+                expects=(200, ),
+                throws=HTTPError(401)
+            )
+            logger.info('Inserted: {}'.format(res.json()))
         ext_col_index = max_depth + 2 + num_of_fcolumns
         col_count = ext_col_index + 1 + num_of_fcolumns
 
@@ -664,6 +684,30 @@ class SpreadsheetClient(BaseClient):
         )
         logger.info('DataValidation Updated: {}'.format(res.json()))
 
+    def _build_file_tree(self, files):
+        top = {'depth': 0, 'name': None, 'files': [], 'dirs': []}
+        # Directories indexed by their path, to find parents in constant time
+        dirs = {(): top}
+        max_depth = 0
+        for f in files:
+            if f.endswith('/'):
+                continue
+            if len(f.strip()) == 0:
+                continue
+            paths = tuple(f.split('/'))
+            target = top
+            for i in range(1, len(paths)):
+                next_target = dirs.get(paths[:i])
+                if next_target is None:
+                    next_target = {'depth': i, 'name': paths[i - 1],
+                                   'files': [], 'dirs': []}
+                    max_depth = max(max_depth, i)
+                    target['dirs'].append(next_target)
+                    dirs[paths[:i]] = next_target
+                target = next_target
+            target['files'].append(paths[-1])
+        return top, max_depth
+
     def _row_name(self, index):
         if index < len(string.ascii_uppercase):
             return string.ascii_uppercase[index]
@@ -739,23 +783,62 @@ class IQBRIMSWorkflowUserSettings(object):
         self.folder_id = folder_id
         self._cache = None
 
+    @staticmethod
+    def _shared_cache():
+        return caches[django_settings.IQBRIMS_USER_SETTINGS_CACHE_NAME]
+
+    @classmethod
+    def invalidate(cls, folder_id):
+        """Drop the cached settings of the folder in every process."""
+        cls._shared_cache().delete(USER_SETTINGS_CACHE_KEY.format(folder_id=folder_id))
+
     def load(self):
+        """Return the settings of the folder, cached across processes.
+
+        Only the process which takes the lock refetches expired settings,
+        the others keep using the expired ones meanwhile. Settings sheets
+        whose modifiedDate did not change are not read again.
+        """
         if self._cache is not None:
             return self._cache
-        global _user_settings_cache
+        shared_cache = self._shared_cache()
+        key = USER_SETTINGS_CACHE_KEY.format(folder_id=self.folder_id)
+        lock_key = USER_SETTINGS_LOCK_KEY.format(folder_id=self.folder_id)
         exp = datetime.timedelta(seconds=settings.USER_SETTINGS_CACHE_EXPIRATION_SEC)
-        if 'loadedTime' in _user_settings_cache and \
-           datetime.datetime.now() - _user_settings_cache['loadedTime'] < exp:
-            self._cache = _user_settings_cache.copy()
-            return self._cache
+        deadline = time.time() + settings.USER_SETTINGS_CACHE_WAIT_SEC
+        while True:
+            cached = shared_cache.get(key)
+            if cached is not None and \
+               datetime.datetime.now() - cached['loadedTime'] < exp:
+                self._cache = cached
+                return self._cache
+            if shared_cache.add(lock_key, True, settings.USER_SETTINGS_CACHE_LOCK_SEC):
+                break
+            if cached is not None:
+                self._cache = cached
+                return self._cache
+            if time.time() > deadline:
+                # The refreshing process is too slow, fetch without the lock
+                self._cache = self._fetch(None)
+                return self._cache
+            time.sleep(0.1)
+        try:
+            self._cache = self._fetch(cached)
+            shared_cache.set(key, self._cache, settings.USER_SETTINGS_CACHE_TIMEOUT_SEC)
+        finally:
+            shared_cache.delete(lock_key)
+        return self._cache
+
+    def _fetch(self, cached):
         client = IQBRIMSClient(self.access_token)
         files = client.files(self.folder_id)
         files = [f for f in files if f['title'] == settings.USER_SETTINGS_SHEET_FILENAME]
         if len(files) == 0:
             sheet = client.create_spreadsheet(self.folder_id, settings.USER_SETTINGS_SHEET_FILENAME)
-        elif 'modifiedDate' in _user_settings_cache and files[0]['modifiedDate'] == _user_settings_cache['modifiedDate']:
-            self._cache = _user_settings_cache.copy()
-            return self._cache
+        elif cached is not None and files[0]['modifiedDate'] == cached['modifiedDate']:
+            cached = cached.copy()
+            cached['loadedTime'] = datetime.datetime.now()
+            return cached
         else:
             sheet = files[0]
         sclient = SpreadsheetClient(sheet['id'], self.access_token)
@@ -774,12 +857,11 @@ class IQBRIMSWorkflowUserSettings(object):
         row_max = sheets[0]['properties']['gridProperties']['rowCount']
         keys = sclient.get_row_values(sheet_id, columns.index('Key'), row_max)
         values = sclient.get_row_values(sheet_id, columns.index('Value'), row_max)
-        _user_settings_cache['loadedTime'] = datetime.datetime.now()
-        _user_settings_cache['modifiedDate'] = files[0]['modifiedDate'] \
-                                               if len(files) > 0 else None
-        _user_settings_cache['settings'] = dict(zip(keys, values))
-        self._cache = _user_settings_cache.copy()
-        return self._cache
+        return {
+            'loadedTime': datetime.datetime.now(),
+            'modifiedDate': files[0]['modifiedDate'] if len(files) > 0 else None,
+            'settings': dict(zip(keys, values)),
+        }
 
     @property
     def LABO_LIST(self):
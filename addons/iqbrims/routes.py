@@ -136,6 +136,11 @@ api_routes = {
             '/project/<pid>/node/<nid>/iqbrims/message',
         ], 'post', views.iqbrims_get_message, json_renderer),
 
+        Rule([
+            '/project/<pid>/iqbrims/workflow/user-settings',
+            '/project/<pid>/node/<nid>/iqbrims/workflow/user-settings',
+        ], 'delete', views.iqbrims_invalidate_user_settings, json_renderer),
+
     ],
     'prefix': '/api/v1'
 }
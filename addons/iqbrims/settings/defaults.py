@@ -28,6 +28,15 @@ OAUTH_BASE_URL = 'https://accounts.google.com/o/oauth2/'
 API_BASE_URL = 'https://www.googleapis.com/'
 SHEETS_API_BASE_URL = 'https://sheets.googleapis.com/'
 
+# Requests per second (and burst size) shared by all Drive/Sheets API clients
+# of a process, to stay below the per-user quotas of the Google APIs
+API_RATE_LIMIT_PER_SEC = 10
+API_RATE_LIMIT_BURST = 20
+# Max number of items per page when listing Drive folders
+DRIVE_LIST_PAGE_SIZE = 1000
+# Max number of rows sent by one Sheets API values request
+SHEETS_MAX_ROWS_PER_REQUEST = 5000
+
 APPSHEET_FILENAME = 'IQB-RIMS'
 APPSHEET_SHEET_NAME = 'Registrations'
 APPSHEET_DEPOSIT_COLUMNS = [('Updated', '_updated'),
@@ -83,3 +92,10 @@ MESSAGES = {}
 USER_SETTINGS_SHEET_FILENAME = 'Settings'
 USER_SETTINGS_SHEET_SHEET_NAME = 'Settings'
 USER_SETTINGS_CACHE_EXPIRATION_SEC = 60
+# Seconds the expired settings are kept to be revalidated by their modifiedDate
+USER_SETTINGS_CACHE_TIMEOUT_SEC = 60 * 60 * 24
+# Max seconds a process may spend refreshing the shared settings cache
+# before another process is allowed to take over the refresh
+USER_SETTINGS_CACHE_LOCK_SEC = 30
+# Max seconds to wait for another process filling an empty settings cache
+USER_SETTINGS_CACHE_WAIT_SEC = 10
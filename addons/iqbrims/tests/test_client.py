@@ -10,7 +10,6 @@ from addons.iqbrims.client import (
     SpreadsheetClient,
     IQBRIMSFlowableClient,
     IQBRIMSWorkflowUserSettings,
-    _user_settings_cache
 )
 from addons.iqbrims.tests.utils import MockResponse
 from addons.iqbrims import settings
@@ -112,8 +111,54 @@ class TestIQBRIMSClient(OsfTestCase):
             assert_equal(kwargs['data'], '{"role": "reader"}')
 
 
+    def test_files_paged(self):
+        client = IQBRIMSClient('0001')
+        pages = [MockResponse('{"items": [{"title": "a"}], "nextPageToken": "p2"}', 200),
+                 MockResponse('{"items": [{"title": "b"}]}', 200)]
+        with mock.patch.object(client, '_make_request',
+                               side_effect=pages) as mkreq:
+            files = client.files('folderid456')
+            assert_equal([f['title'] for f in files], ['a', 'b'])
+            assert_equal(len(mkreq.mock_calls), 2)
+            name, args, kwargs = mkreq.mock_calls[0]
+            assert_not_in('pageToken', kwargs['params'])
+            name, args, kwargs = mkreq.mock_calls[1]
+            assert_equal(kwargs['params']['pageToken'], 'p2')
+
+
 class TestIQBRIMSSpreadsheetClient(OsfTestCase):
 
+    def test_build_file_tree(self):
+        client = SpreadsheetClient('0001')
+        top, max_depth = client._build_file_tree(
+            ['a/b/file1.txt', 'a/file2.txt', 'a/b/file3.txt', 'c/file4.txt', 'a/', '']
+        )
+        assert_equal(max_depth, 2)
+        assert_equal([d['name'] for d in top['dirs']], ['a', 'c'])
+        a = top['dirs'][0]
+        assert_equal(a['files'], ['file2.txt'])
+        assert_equal([d['name'] for d in a['dirs']], ['b'])
+        assert_equal(a['dirs'][0]['files'], ['file1.txt', 'file3.txt'])
+        assert_equal(a['dirs'][0]['depth'], 2)
+
+    @mock.patch.object(settings, 'SHEETS_MAX_ROWS_PER_REQUEST', 2)
+    def test_add_files_chunked(self):
+        client = SpreadsheetClient('0001')
+        with mock.patch.object(client, 'ensure_columns',
+                               side_effect=lambda sid, cols, row: cols):
+            with mock.patch.object(client, '_make_request',
+                                   return_value=MockResponse('{"test": true}',
+                                                             200)) as mkreq:
+                client.add_files('sheet01', 1, 'sheet02', 2,
+                                 ['file{}.txt'.format(i) for i in range(5)])
+                assert_equal(len(mkreq.mock_calls), 1 + 3 + 1)
+                rows = []
+                for name, args, kwargs in mkreq.mock_calls[1:4]:
+                    assert_true(args[1].endswith(':append'))
+                    rows += json.loads(kwargs['data'])['values']
+                assert_equal([r[1] for r in rows],
+                             ['file{}.txt'.format(i) for i in range(5)])
+
     def test_add_files_no_dirs(self):
         client = SpreadsheetClient('0001')
         with mock.patch.object(client, 'ensure_columns',
@@ -646,8 +691,7 @@ class TestIQBRIMSWorkflowUserSettings(OsfTestCase):
         values = ['john', 'test', 'https://test.someuniv.ac.jp/test/',
                   'workflow123', 'workflow456']
         mock_get_row_values.side_effect = lambda sid, col, rcount: keys if col == 0 else values
-        if 'loadedTime' in _user_settings_cache:
-            del _user_settings_cache['loadedTime']
+        IQBRIMSWorkflowUserSettings.invalidate('test_folder')
 
         client = IQBRIMSWorkflowUserSettings('0001', 'test_folder')
         assert_equal(client.LABO_LIST, settings.LABO_LIST)
@@ -677,8 +721,7 @@ class TestIQBRIMSWorkflowUserSettings(OsfTestCase):
         keys = ['LABO_LIST']
         values = ['[{"id": "xxx", "text": "XXX"}, {"id": "yyy", "text": "YYY"}]']
         mock_get_row_values.side_effect = lambda sid, col, rcount: keys if col == 0 else values
-        if 'loadedTime' in _user_settings_cache:
-            del _user_settings_cache['loadedTime']
+        IQBRIMSWorkflowUserSettings.invalidate('test_folder')
 
         client = IQBRIMSWorkflowUserSettings('0001', 'test_folder')
         assert_equal(client.LABO_LIST, [{'id': 'xxx', 'text': 'XXX'}, {'id': 'yyy', 'text': 'YYY'}])
@@ -708,12 +751,46 @@ class TestIQBRIMSWorkflowUserSettings(OsfTestCase):
         keys = ['LABO_LIST']
         values = ['[{"id": "xxx", "tet": "XXX"}, {"id": "yyy", "text": "YYY"}]']
         mock_get_row_values.side_effect = lambda sid, col, rcount: keys if col == 0 else values
-        if 'loadedTime' in _user_settings_cache:
-            del _user_settings_cache['loadedTime']
+        IQBRIMSWorkflowUserSettings.invalidate('test_folder')
 
         client = IQBRIMSWorkflowUserSettings('0001', 'test_folder')
         assert_equal(client.LABO_LIST, [{'text': u"No text: {u'tet': u'XXX', u'id': u'xxx'}", 'id': 'error'}])
 
+    @mock.patch.object(IQBRIMSClient, 'files')
+    @mock.patch.object(SpreadsheetClient, 'sheets')
+    @mock.patch.object(SpreadsheetClient, 'ensure_columns')
+    @mock.patch.object(SpreadsheetClient, 'get_row_values')
+    def test_load_shared_between_instances(self, mock_get_row_values, mock_ensure_columns,
+                                           mock_sheets, mock_files):
+        mock_files.return_value = [{'id': 'test_spreadsheet',
+                                    'title': settings.USER_SETTINGS_SHEET_FILENAME,
+                                    'modifiedDate': '2020-01-01T00:00:00.000Z'}]
+        mock_sheets.return_value = [
+          {'properties': {'title': settings.USER_SETTINGS_SHEET_SHEET_NAME,
+                          'gridProperties': {'rowCount': 1}}}
+        ]
+        mock_ensure_columns.side_effect = lambda sid, cols: cols
+        mock_get_row_values.side_effect = lambda sid, col, rcount: ['FLOWABLE_USER'] if col == 0 else ['john']
+        IQBRIMSWorkflowUserSettings.invalidate('test_folder')
+
+        assert_equal(IQBRIMSWorkflowUserSettings('0001', 'test_folder').FLOWABLE_USER, 'john')
+        assert_equal(IQBRIMSWorkflowUserSettings('0002', 'test_folder').FLOWABLE_USER, 'john')
+        assert_equal(len(mock_files.mock_calls), 1)
+        assert_equal(len(mock_sheets.mock_calls), 1)
+
+        # Expired, but the settings sheet has not been modified
+        with mock.patch.object(settings, 'USER_SETTINGS_CACHE_EXPIRATION_SEC', 0):
+            assert_equal(IQBRIMSWorkflowUserSettings('0003', 'test_folder').FLOWABLE_USER, 'john')
+        assert_equal(len(mock_files.mock_calls), 2)
+        assert_equal(len(mock_sheets.mock_calls), 1)
+
+        # Expired while another process is refreshing
+        IQBRIMSWorkflowUserSettings._shared_cache().add('lock:test_folder', True)
+        with mock.patch.object(settings, 'USER_SETTINGS_CACHE_EXPIRATION_SEC', 0):
+            assert_equal(IQBRIMSWorkflowUserSettings('0004', 'test_folder').FLOWABLE_USER, 'john')
+        assert_equal(len(mock_files.mock_calls), 2)
+        IQBRIMSWorkflowUserSettings._shared_cache().delete('lock:test_folder')
+
 
 class TestIQBRIMSFlowableClient(OsfTestCase):
 
@@ -2276,6 +2276,29 @@ URL: http://test.test<br>
         assert_equal(res.json['notify_body'], 'Variable #1 is Variable #1, Variable #2 is null')
         assert_equal(res.json['user_email'], True)
 
+    @mock.patch.object(IQBRIMSWorkflowUserSettings, 'invalidate')
+    @mock.patch.object(iqbrims_views, '_get_management_node')
+    def test_invalidate_user_settings(self, mock_get_management_node, mock_invalidate):
+        management_project = ProjectFactory()
+        management_project.add_addon('iqbrims', auth=None)
+        management_addon = management_project.get_addon('iqbrims')
+        management_addon.folder_id = 'management_folder'
+        management_addon.save()
+        mock_get_management_node.return_value = management_project
+
+        node_settings = self.project.get_addon('iqbrims')
+        node_settings.secret = 'secret123'
+        node_settings.process_definition_id = 'process456'
+        node_settings.save()
+        token = hashlib.sha256(('secret123' + 'process456' +
+                                self.project._id).encode('utf8')).hexdigest()
+
+        url = self.project.api_url_for('iqbrims_invalidate_user_settings')
+        res = self.app.delete(url, headers={'X-RDM-Token': token})
+
+        assert_equal(res.status_code, 200)
+        mock_invalidate.assert_called_once_with('management_folder')
+
 
 class TestWorkflowStateViews(IQBRIMSAddonTestCase, OsfTestCase):
 
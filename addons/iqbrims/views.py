@@ -593,6 +593,19 @@ def iqbrims_get_message(**kwargs):
     msg['notify_type'] = messageid
     return msg
 
+@must_be_valid_project
+@must_have_addon(SHORT_NAME, 'node')
+@must_have_valid_hash()
+def iqbrims_invalidate_user_settings(**kwargs):
+    """Make every process reload the workflow settings sheet of the management node."""
+    node = kwargs['node'] or kwargs['project']
+    management_node = _get_management_node(node)
+    management_node_addon = IQBRIMSNodeSettings.objects.get(owner=management_node)
+    if management_node_addon is None:
+        raise HTTPError(http.BAD_REQUEST, 'IQB-RIMS addon disabled in management node')
+    IQBRIMSWorkflowUserSettings.invalidate(management_node_addon.folder_id)
+    return {'status': 'complete'}
+
 def _iqbrims_import_auth_from_management_node(node, node_addon, management_node):
     """Grant oauth access on user_settings of management_node and
     set reference of user_settings and external_account of management_node
@@ -12,6 +12,12 @@ ROOT_FOLDER_FORMAT = 'GRDM_{title}_{guid}'
 PROPERTY_KEY_TIMESTAMP = 'grdm-timestamp'
 PROPERTY_KEY_TIMESTAMP_STATUS = 'grdm-timestamp-status'
 
+# Number of threads checking timestamps of the files updated on Nextcloud
+TIMESTAMP_SYNC_WORKERS = 4
+
+# Number of projects synchronized at a time by sync_all()
+SYNC_ALL_MAX_WORKERS = 4
+
 DEBUG_URL = None
 DEBUG_USER = None
 DEBUG_PASSWORD = None
@@ -136,3 +136,83 @@ class TestNextcloudinstitutions(unittest.TestCase):
         result = self.project.get_addon(NAME)
         assert_true(isinstance(result, NodeSettings))
         assert_equal(result.root_folder_fullpath, self._expected_root_folder)
+
+
+class TestCheckUpdatedFiles(unittest.TestCase):
+
+    def _fileinfo(self, path, mtime, ftype='file'):
+        return Mock(path=path, mtime=mtime, ftype=ftype, muser=None)
+
+    def test_project_index(self):
+        from addons.nextcloudinstitutions.utils import ProjectIndex
+        p1 = Mock(root_folder_fullpath='/GRDM/GRDM_a_abcde')
+        p2 = Mock(root_folder_fullpath='/GRDM/GRDM_b_fghij')
+        index = ProjectIndex([p1, p2])
+        assert_equal(list(index.lookup('/GRDM/GRDM_a_abcde/dir/file.txt')),
+                     [(p1, '/dir/file.txt')])
+        assert_equal(list(index.lookup('/GRDM/GRDM_b_fghij/file.txt')),
+                     [(p2, '/file.txt')])
+        assert_equal(list(index.lookup('/GRDM/GRDM_a_abcde')), [])
+        assert_equal(list(index.lookup('/GRDM/GRDM_a_abcdefg/file.txt')), [])
+        assert_equal(list(index.lookup('/Other/file.txt')), [])
+
+    def test_check_updated_files_dedup(self):
+        from addons.nextcloudinstitutions import utils
+        files = [
+            self._fileinfo('/GRDM/GRDM_a_abcde/a.txt', '100'),
+            self._fileinfo('/GRDM/GRDM_a_abcde/dir', '101', ftype='dir'),
+            self._fileinfo('/GRDM/GRDM_a_abcde/a.txt', '102'),
+            self._fileinfo('/GRDM/GRDM_a_abcde/b.txt', '103'),
+        ]
+        index = utils.ProjectIndex([Mock(root_folder_fullpath='/GRDM/GRDM_a_abcde')])
+        checked = {}
+        with patch.object(utils, '_check_for_file') as mock_check:
+            latest = utils._check_updated_files('test', index, files, '0', {}, checked)
+            assert_equal(latest, '103')
+            assert_equal(sorted(c[0][1] for c in mock_check.call_args_list),
+                         ['/a.txt', '/b.txt'])
+            # same events in the next listing are skipped
+            mock_check.reset_mock()
+            latest = utils._check_updated_files('test', index, files, latest, {}, checked)
+            assert_equal(latest, '103')
+            assert_false(mock_check.called)
+
+    def test_sync_all_skips_unchanged_node(self):
+        from addons.base import institutions_utils
+        node = Mock(title='title', _id='abcde')
+        ns = Mock(sync_fingerprint='fp', SHORT_NAME=NAME)
+        type(ns).objects = Mock()
+        with patch.object(institutions_utils, 'sync_fingerprint', return_value='fp'), \
+             patch.object(institutions_utils, 'check_existence_and_create', return_value=True), \
+             patch.object(institutions_utils, 'SYNC_WAIT', 0):
+            assert_equal(institutions_utils._sync_node_settings(node, ns, False), 'skipped')
+            assert_false(ns.sync_title.called)
+            assert_equal(institutions_utils._sync_node_settings(node, ns, True), 'synced')
+            assert_true(ns.sync_title.called)
+            assert_true(ns.sync_contributors.called)
+            type(ns).objects.filter.return_value.update.assert_called_with(sync_fingerprint='fp')
+
+    def test_sync_all_recreates_folder_of_unchanged_node(self):
+        from addons.base import institutions_utils
+        node = Mock(title='title', _id='abcde')
+        ns = Mock(sync_fingerprint='fp', SHORT_NAME=NAME, exists=False)
+        with patch.object(institutions_utils, 'sync_fingerprint', return_value='fp'):
+            assert_equal(institutions_utils._sync_node_settings(node, ns, False), 'skipped')
+            ns.create_folder.assert_called_once_with(ns.client, ns.base_folder, ns.folder_name)
+            assert_false(ns.sync_title.called)
+            assert_false(ns.sync_contributors.called)
+
+    def test_sync_all_status_not_left_running(self):
+        from addons.base import institutions_utils
+        task = Mock()
+        task.is_aborted.return_value = False
+        statuses = []
+        with patch.object(institutions_utils, 'get_rdm_addon_option'), \
+             patch.object(institutions_utils, 'Institution'), \
+             patch.object(institutions_utils, 'Node'), \
+             patch.object(institutions_utils, 'run_in_threads', side_effect=Exception('error')), \
+             patch.object(institutions_utils, 'save_sync_status',
+                          side_effect=lambda opt, status: statuses.append(status['state'])):
+            with assert_raises(Exception):
+                institutions_utils._sync_all_for_addon(task, 'inst', NAME, NodeSettings, [1], False)
+        assert_equal(statuses, ['running', 'failed'])
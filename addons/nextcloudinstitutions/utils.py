@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import collections
 import logging
 import time
 import math
@@ -19,6 +20,7 @@ from osf.models import BaseFileNode, OSFUser
 from osf.models.external import ExternalAccount
 from osf.models.rdm_addons import RdmAddonOption
 from website.util import timestamp, waterbutler
+from addons.base.utils import run_in_threads
 from addons.nextcloudinstitutions import apps, settings
 from addons.nextcloudinstitutions.lock import TMPDIR, LOCK_PREFIX
 from addons.base.lock import Lock
@@ -212,12 +214,19 @@ def _select_admin(node):
     raise Exception('unexpected condition')
 
 
-def _check_for_file(project, path, fileinfo):
+def _get_admin(node, admins):
+    """(admin, cookie) of the node, cached in `admins` for a run."""
+    if node.id not in admins:
+        admin = _select_admin(node)
+        admins[node.id] = (admin, admin.get_or_create_cookie())
+    return admins[node.id]
+
+
+def _check_for_file(project, path, fileinfo, admins=None):
     node = project.owner
     if node.is_deleted:
         return
-    admin = _select_admin(node)
-    admin_cookie = admin.get_or_create_cookie()
+    admin, admin_cookie = _get_admin(node, {} if admins is None else admins)
     created = True
 
     cls = BaseFileNode.resolve_class(SHORT_NAME, BaseFileNode.FILE)
@@ -283,16 +292,88 @@ def _check_for_file(project, path, fileinfo):
         node._id, path, verify_result.get('verify_result_title')))
 
 
-def _check_project_files(addon_option, fileinfo):
-    from addons.nextcloudinstitutions.models import NodeSettings
+def _split_path(path):
+    return [name for name in path.split('/') if name]
+
+
+class ProjectIndex(object):
+    """Prefix tree of the root folders of the projects using an addon option."""
+
+    def __init__(self, projects):
+        self.tree = {}
+        for project in projects:
+            node = self.tree
+            for name in _split_path(project.root_folder_fullpath):
+                node = node.setdefault(name, {})
+            # None cannot be a folder name
+            node.setdefault(None, []).append(project)
+
+    @classmethod
+    def for_addon_option(cls, addon_option):
+        from addons.nextcloudinstitutions.models import NodeSettings
+        return cls(NodeSettings.objects.filter(
+            addon_option=addon_option).select_related('owner'))
+
+    def lookup(self, path):
+        """Yield (project, internal path) of the projects containing path."""
+        names = _split_path(path)
+        node = self.tree
+        for i, name in enumerate(names):
+            for project in node.get(None, ()):
+                yield project, '/' + '/'.join(names[i:])
+            node = node.get(name)
+            if node is None:
+                return
+
+
+def _check_project_files(index, fileinfo, admins=None):
+    for project, internal_path in index.lookup(fileinfo.path):
+        DEBUG(u'internal_path: {}'.format(internal_path))
+        _check_for_file(project, internal_path, fileinfo, admins=admins)
+
+
+def _latest_updated_files(updated_files):
+    """Files of the updated list, only the latest event of each path."""
+    latest = collections.OrderedDict()
+    for f in updated_files:
+        if f.ftype != 'file':
+            continue
+        prev = latest.pop(f.path, None)
+        if prev is not None and f.mtime < prev.mtime:
+            f = prev
+        latest[f.path] = f
+    return list(latest.values())
+
+
+def _check_updated_files(name, index, updated_files, latest, admins, checked):
+    """Check the files in parallel and return the newest mtime checked.
+
+    `checked` maps paths to the mtime already checked in this run, so
+    repeated events of a file are processed once.
+    """
+    files = [f for f in _latest_updated_files(updated_files)
+             if checked.get(f.path) != f.mtime]
+    succeeded = []
+
+    def check(f):
+        DEBUG(u'path: {}, mtime: {}, modified user: {}'.format(f.path, f.mtime, f.muser))
+        try:
+            _check_project_files(index, f, admins=admins)
+            succeeded.append(f)
+        except Exception:
+            logger.exception(u'{}, path={}'.format(name, f.path))
 
-    for project in NodeSettings.objects.filter(addon_option=addon_option):
-        path = project.root_folder_fullpath
-        if fileinfo.path.startswith(path):
-            internal_path = fileinfo.path[len(path):]
-            if internal_path:
-                DEBUG(u'internal_path: {}'.format(internal_path))
-                _check_for_file(project, internal_path, fileinfo)
+    started = time.time()
+    run_in_threads(check, files, settings.TIMESTAMP_SYNC_WORKERS)
+    elapsed = time.time() - started
+    logger.info(u'checked {} of {} updated entries of Nextcloud in {:.2f}s'.format(
+        len(files), len(updated_files), elapsed))
+    for f in succeeded:
+        checked[f.path] = f.mtime
+        if latest < f.mtime:
+            latest = f.mtime
+            DEBUG(u'latest: {}'.format(str(latest)))
+    return latest
 
 
 @celery_app.task(bind=True, base=AbortableTask)
@@ -324,20 +405,16 @@ def celery_check_updated_files(self, provider_id, since, interval):
         DEBUG(u'get "since" from DB: {}'.format(val))
         since = val
 
+    name = u'Insititution={}, Nextcloud ID={}'.format(opt.institution, provider_id)
+    index = ProjectIndex.for_addon_option(opt)
+    admins = {}
+    checked = {}
+
     updated_files = _list_updated_files(ea, since)
     DEBUG(u'update files: {}'.format(str(updated_files)))
 
-    latest = since
-    for f in updated_files:
-        DEBUG(u'path: {}, mtime: {}, modified user: {}'.format(f.path, f.mtime, f.muser))
-        if f.ftype == 'file':
-            try:
-                _check_project_files(opt, f)
-                if latest < f.mtime:
-                    latest = f.mtime
-                    DEBUG(u'latest: {}'.format(str(latest)))
-            except Exception:
-                logger.exception(u'Insititution={}, Nextcloud ID={}'.format(opt.institution, provider_id))
+    latest = _check_updated_files(name, index, updated_files or [], since,
+                                  admins, checked)
 
     # wait for the specified interval
     current_time = time.time()
@@ -351,16 +428,8 @@ def celery_check_updated_files(self, provider_id, since, interval):
     updated_files2 = _list_updated_files(ea, latest)
     DEBUG(u'update files2: {}'.format(str(updated_files2)))
 
-    for f in updated_files2:
-        DEBUG(u'path: {}, mtime: {}, modified user: {}'.format(f.path, f.mtime, f.muser))
-        if f.ftype == 'file':
-            try:
-                _check_project_files(opt, f)
-                if latest < f.mtime:
-                    latest = f.mtime
-                    DEBUG(u'latest: {}'.format(str(latest)))
-            except Exception:
-                logger.exception(u'Insititution={}, Nextcloud ID={}'.format(opt.institution, provider_id))
+    latest = _check_updated_files(name, index, updated_files2 or [], latest,
+                                  admins, checked)
 
     opt.extended[NEXTCLOUD_FILE_UPDATE_SINCE] = latest
     opt.save()
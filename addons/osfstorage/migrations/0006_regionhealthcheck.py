@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addons_osfstorage', '0005_region_mfr_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionHealthCheck',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checked_at', models.DateTimeField(auto_now_add=True)),
+                ('is_available', models.BooleanField(default=False)),
+                ('latency_ms', models.IntegerField(blank=True, null=True)),
+                ('message', models.TextField(blank=True, default='')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='health_checks', to='addons_osfstorage.Region')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='regionhealthcheck',
+            index_together=set([('region', 'checked_at')]),
+        ),
+    ]
@@ -1,12 +1,16 @@
 from __future__ import unicode_literals
 
+import datetime
 import logging
 
 from django.apps import apps
 from django.dispatch import receiver
-from django.db import models, connection
+from django.db import models, connection, transaction
+from django.db.models import Q
 from django.db.models.signals import post_save
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from django_bulk_update.helper import bulk_update
 from psycopg2._psycopg import AsIs
 
 from addons.base.models import BaseNodeSettings, BaseStorageAddon, BaseUserSettings
@@ -42,44 +46,125 @@ class OsfStorageFolderManager(BaseFileNodeManager):
 class OsfStorageFileNode(BaseFileNode):
     _provider = 'osfstorage'
 
+    # Denormalized copy of the computed materialized path. Set when the node is
+    # created or moved; the descendants of a moved or renamed folder are reset in
+    # the same transaction and set again as they are saved. Existing nodes are
+    # filled by the backfill_osfstorage_materialized_paths command. Reads never
+    # write it.
+    _cached_materialized_path = models.TextField(blank=True, null=True)
+
+    MATERIALIZED_PATHS_SQL = """
+        WITH RECURSIVE materialized_path_cte(id, parent_id, GEN_PATH) AS (
+          SELECT
+            T.id,
+            T.parent_id,
+            T.name :: TEXT AS GEN_PATH
+          FROM %s AS T
+          WHERE T.id = ANY(%s)
+          UNION ALL
+          SELECT
+            R.id,
+            T.parent_id,
+            (T.name || '/' || R.GEN_PATH) AS GEN_PATH
+          FROM materialized_path_cte AS R
+            JOIN %s AS T ON T.id = R.parent_id
+          WHERE R.parent_id IS NOT NULL
+        )
+        SELECT id, gen_path
+        FROM materialized_path_cte AS N
+        WHERE parent_id IS NULL;
+    """
+
+    CLEAR_DESCENDANT_PATHS_SQL = """
+        WITH RECURSIVE descendants(id) AS (
+          SELECT id FROM %s WHERE parent_id = %s
+          UNION ALL
+          SELECT C.id FROM %s AS C
+            JOIN descendants AS D ON C.parent_id = D.id
+        )
+        UPDATE %s SET _cached_materialized_path = NULL
+        WHERE id IN (SELECT id FROM descendants) AND _cached_materialized_path IS NOT NULL;
+    """
+
+    MARK_ANCESTORS_CHECKED_OUT_SQL = """
+        WITH RECURSIVE ancestors(id, parent_id) AS (
+          SELECT id, parent_id FROM %s WHERE id = %s
+          UNION ALL
+          SELECT T.id, T.parent_id FROM %s AS T
+            JOIN ancestors AS A ON T.id = A.parent_id
+        )
+        UPDATE %s SET _subtree_checked_out = TRUE
+        WHERE id IN (SELECT parent_id FROM ancestors) AND _subtree_checked_out IS FALSE;
+    """
+
     @property
     def materialized_path(self):
-        sql = """
-            WITH RECURSIVE materialized_path_cte(parent_id, GEN_PATH) AS (
-              SELECT
-                T.parent_id,
-                T.name :: TEXT AS GEN_PATH
-              FROM %s AS T
-              WHERE T.id = %s
-              UNION ALL
-              SELECT
-                T.parent_id,
-                (T.name || '/' || R.GEN_PATH) AS GEN_PATH
-              FROM materialized_path_cte AS R
-                JOIN %s AS T ON T.id = R.parent_id
-              WHERE R.parent_id IS NOT NULL
-            )
-            SELECT gen_path
-            FROM materialized_path_cte AS N
-            WHERE parent_id IS NULL
-            LIMIT 1;
-        """
-        with connection.cursor() as cursor:
-            cursor.execute(sql, [AsIs(self._meta.db_table), self.pk, AsIs(self._meta.db_table)])
-            row = cursor.fetchone()
-            if not row:
-                return '/'
-
-            path = row[0]
-            if not self.is_file:
-                path = path + '/'
-            return path
+        if self._cached_materialized_path is not None:
+            return self._cached_materialized_path
+        if not self.pk:
+            return '/'
+        resolved = getattr(self, '_resolved_materialized_path', None)
+        if resolved is not None:
+            return resolved
+        return self.resolve_materialized_paths([self])[self.pk]
 
     @materialized_path.setter
     def materialized_path(self, val):
         # raise Exception('Cannot set materialized path on OSFStorage as it is computed.')
         logger.warn('Cannot set materialized path on OSFStorage because it\'s computed.')
 
+    def _build_materialized_path(self, parent, name):
+        """Return the materialized path of this node under `parent`, None if unknown."""
+        if parent is None:
+            path = name
+        elif isinstance(parent, OsfStorageFileNode):
+            path = parent.materialized_path + name
+        else:
+            return None
+        return path if self.is_file else path + '/'
+
+    @classmethod
+    def resolve_materialized_paths(cls, file_nodes, save=False):
+        """Return a dict mapping the pk of each of `file_nodes` to its materialized path.
+
+        Cached paths are reused; the remaining ones are computed with a single
+        recursive query and kept on the instances, so that listings pay one query
+        per page. Only with `save` are they written to the cache column.
+        """
+        paths = {}
+        missing = {}
+        for file_node in file_nodes:
+            if not isinstance(file_node, OsfStorageFileNode):
+                continue
+            if file_node._cached_materialized_path is not None:
+                paths[file_node.pk] = file_node._cached_materialized_path
+            elif file_node.pk:
+                missing[file_node.pk] = file_node
+        if not missing:
+            return paths
+
+        table = AsIs(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(cls.MATERIALIZED_PATHS_SQL, [table, list(missing.keys()), table])
+            computed = dict(cursor.fetchall())
+
+        resolved = []
+        for pk, file_node in missing.items():
+            path = computed.get(pk)
+            if path is None:
+                paths[pk] = '/'
+                continue
+            if not file_node.is_file:
+                path = path + '/'
+            file_node._resolved_materialized_path = path
+            paths[pk] = path
+            if save:
+                file_node._cached_materialized_path = path
+                resolved.append(file_node)
+        if resolved:
+            bulk_update(resolved, update_fields=['_cached_materialized_path'])
+        return paths
+
     @classmethod
     def get(cls, _id, target):
         return cls.objects.get(_id=_id, target_object_id=target.id, target_content_type=ContentType.objects.get_for_model(target))
@@ -164,6 +249,9 @@ class OsfStorageFileNode(BaseFileNode):
     def delete(self, user=None, parent=None, **kwargs):
         self._path = self.path
         self._materialized_path = self.materialized_path
+        # Trashed nodes keep their path in _materialized_path; set again on restore
+        self._cached_materialized_path = None
+        self._resolved_materialized_path = None
         return super(OsfStorageFileNode, self).delete(user=user, parent=parent) if self._check_delete_allowed() else None
 
     def move_under(self, destination_parent, name=None):
@@ -176,7 +264,15 @@ class OsfStorageFileNode(BaseFileNode):
         if most_recent_fileversion and most_recent_fileversion.region != destination_parent.target.osfstorage_region:
             most_recent_fileversion.region = destination_parent.target.osfstorage_region
             most_recent_fileversion.save()
-        return super(OsfStorageFileNode, self).move_under(destination_parent, name)
+        with transaction.atomic():
+            if not self.is_file:
+                # The descendants are set again as _update_node saves them
+                table = AsIs(self._meta.db_table)
+                with connection.cursor() as cursor:
+                    cursor.execute(self.CLEAR_DESCENDANT_PATHS_SQL, [table, self.pk, table, table])
+            self._cached_materialized_path = self._build_materialized_path(destination_parent, name or self.name)
+            self._resolved_materialized_path = None
+            return super(OsfStorageFileNode, self).move_under(destination_parent, name)
 
     def check_in_or_out(self, user, checkout, save=False):
         """
@@ -209,6 +305,8 @@ class OsfStorageFileNode(BaseFileNode):
 
         if self.is_checked_out and action == NodeLog.CHECKED_IN or not self.is_checked_out and action == NodeLog.CHECKED_OUT:
             self.checkout = checkout
+            # the subtree checkout flags of the ancestors are updated on save
+            self._checked_in = checkout is None
             if isinstance(target, Loggable):
                 target.add_log(
                     action=action,
@@ -230,10 +328,42 @@ class OsfStorageFileNode(BaseFileNode):
             if save:
                 self.save()
 
+    def _mark_ancestors_checked_out(self):
+        table = AsIs(self._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(self.MARK_ANCESTORS_CHECKED_OUT_SQL, [table, self.pk, table, table])
+
+    def _unmark_ancestors_checked_out(self):
+        """Clear the subtree checkout flags of the ancestors which have nothing checked out left."""
+        parent_id = self.parent_id
+        while parent_id is not None:
+            if OsfStorageFileNode.objects.filter(parent_id=parent_id).filter(
+                Q(checkout__isnull=False) |
+                Q(_subtree_checked_out=True) |
+                Q(type=OsfStorageFolder._typedmodels_type, _subtree_checked_out__isnull=True)
+            ).exists():
+                return
+            OsfStorageFolder.objects.filter(id=parent_id).update(_subtree_checked_out=False)
+            parent_id = OsfStorageFolder.objects.filter(id=parent_id).values_list('parent_id', flat=True).first()
+
     def save(self):
         self._path = ''
         self._materialized_path = ''
-        return super(OsfStorageFileNode, self).save()
+        if not self.pk:
+            # a new node, or a copy of one
+            self._cached_materialized_path = self._build_materialized_path(self.parent, self.name)
+            if not self.is_file:
+                self._subtree_checked_out = False
+        elif self._cached_materialized_path is None:
+            self._cached_materialized_path = self._build_materialized_path(self.parent, self.name)
+        self._resolved_materialized_path = None
+        ret = super(OsfStorageFileNode, self).save()
+        if self.checkout_id is not None:
+            self._mark_ancestors_checked_out()
+        elif getattr(self, '_checked_in', False):
+            self._unmark_ancestors_checked_out()
+        self._checked_in = False
+        return ret
 
 
 class OsfStorageFile(OsfStorageFileNode, File):
@@ -411,11 +541,34 @@ class OsfStorageFile(OsfStorageFileNode, File):
 class OsfStorageFolder(OsfStorageFileNode, Folder):
 
     is_root = models.NullBooleanField()
+    # False when nothing below this folder is checked out. True or None (not
+    # known yet) mean that the subtree has to be searched. Set on the ancestors
+    # when a node is saved checked out, cleared again on check in.
+    _subtree_checked_out = models.NullBooleanField()
 
     objects = OsfStorageFolderManager()
 
     @property
     def is_checked_out(self):
+        if self.checkout_id is not None:
+            return True
+        # Read from the database: a descendant may have been checked out since
+        # this folder was loaded.
+        if OsfStorageFolder.objects.filter(pk=self.pk, _subtree_checked_out=False).exists():
+            return False
+        return self._search_checked_out()
+
+    def _search_checked_out(self):
+        """Search this folder and its subtree for a checked out node."""
+        # Nothing can be checked out below this folder if nothing is checked out
+        # in the whole target, which is a cheap indexed lookup.
+        if not OsfStorageFileNode.objects.filter(
+            target_object_id=self.target_object_id,
+            target_content_type_id=self.target_content_type_id,
+            checkout__isnull=False,
+        ).exists():
+            return False
+
         sql = """
             WITH RECURSIVE is_checked_out_cte(id, parent_id, checkout_id) AS (
               SELECT
@@ -487,6 +640,29 @@ class Region(models.Model):
     class Meta:
         unique_together = ('_id', 'name')
 
+    def latest_health_check(self):
+        """Latest RegionHealthCheck within STORAGE_HEALTH_CHECK_TTL, or None."""
+        since = timezone.now() - datetime.timedelta(seconds=website_settings.STORAGE_HEALTH_CHECK_TTL)
+        return self.health_checks.filter(checked_at__gte=since).order_by('-checked_at', '-id').first()
+
+    @property
+    def is_known_down(self):
+        """True when the latest recent health check failed."""
+        check = self.latest_health_check()
+        return check is not None and not check.is_available
+
+
+class RegionHealthCheck(models.Model):
+    """Result of a connection probe of the storage of a Region."""
+    region = models.ForeignKey(Region, related_name='health_checks', on_delete=models.CASCADE)
+    checked_at = models.DateTimeField(auto_now_add=True)
+    is_available = models.BooleanField(default=False)
+    latency_ms = models.IntegerField(null=True, blank=True)
+    message = models.TextField(blank=True, default='')
+
+    class Meta:
+        index_together = (('region', 'checked_at'),)
+
 
 class UserSettings(BaseUserSettings):
     default_region = models.ForeignKey(Region, null=True, on_delete=models.CASCADE)
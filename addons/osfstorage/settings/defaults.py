@@ -37,3 +37,6 @@ MAX_UPLOAD_SIZE = 5 * 1024  # 5 GB
 
 # Max file size permitted by frontend in megabytes for verified users
 HIGH_MAX_UPLOAD_SIZE = 5 * 1024  # 5 GB
+
+# Max number of items returned by one page of the children listing used by WaterButler
+MAX_CHILDREN_PAGE_SIZE = 10000
@@ -299,6 +299,79 @@ class TestOsfstorageFileNode(StorageTestCase):
         child = self.node_settings.get_root().append_folder('Cloud').append_file('Carp')
         assert_equals('/Cloud/Carp', child.materialized_path)
 
+    def test_materialized_path_cached_on_create(self):
+        folder = self.node_settings.get_root().append_folder('Cloud')
+        child = folder.append_file('Carp')
+        assert_equals('/Cloud/', OsfStorageFileNode.load(folder._id)._cached_materialized_path)
+        assert_equals('/Cloud/Carp', OsfStorageFileNode.load(child._id)._cached_materialized_path)
+
+    def test_materialized_path_is_not_cached_on_read(self):
+        child = self.node_settings.get_root().append_folder('Cloud').append_file('Carp')
+        OsfStorageFileNode.objects.filter(id=child.id).update(_cached_materialized_path=None)
+        assert_equals('/Cloud/Carp', OsfStorageFileNode.load(child._id).materialized_path)
+        assert_is(OsfStorageFileNode.load(child._id)._cached_materialized_path, None)
+
+    def test_materialized_path_cache_kept_on_save(self):
+        child = self.node_settings.get_root().append_folder('Cloud').append_file('Carp')
+        with mock.patch.object(OsfStorageFileNode, 'resolve_materialized_paths') as mock_resolve:
+            child = OsfStorageFileNode.load(child._id)
+            child.save()
+            assert_equals('/Cloud/Carp', child.materialized_path)
+        assert_false(mock_resolve.called)
+        assert_equals('/Cloud/Carp', OsfStorageFileNode.load(child._id)._cached_materialized_path)
+
+    def test_materialized_path_cache_set_on_move(self):
+        folder = self.node_settings.get_root().append_folder('Cloud')
+        child = folder.append_folder('Rain').append_file('Carp')
+        move_to = self.node_settings.get_root().append_folder('Sky')
+
+        folder.move_under(move_to, name='Fog')
+
+        assert_equals('/Sky/Fog/', OsfStorageFileNode.load(folder._id)._cached_materialized_path)
+        assert_equals('/Sky/Fog/Rain/Carp', OsfStorageFileNode.load(child._id)._cached_materialized_path)
+
+    def test_materialized_path_cache_reset_on_move_of_ancestor(self):
+        folder = self.node_settings.get_root().append_folder('Cloud')
+        child = folder.append_folder('Rain').append_file('Carp')
+        OsfStorageFileNode.resolve_materialized_paths([child], save=True)
+
+        # Cleared by the move itself, not only by _update_node saving each descendant
+        with mock.patch.object(models.BaseFileNode, '_update_node'):
+            folder.move_under(self.node_settings.get_root(), name='Sky')
+
+        assert_is(OsfStorageFileNode.load(child._id)._cached_materialized_path, None)
+
+    def test_materialized_path_cache_not_copied(self):
+        to_copy = self.node_settings.get_root().append_file('Carp')
+        copy_to = self.node_settings.get_root().append_folder('Cloud')
+        assert_equals('/Carp', to_copy.materialized_path)
+
+        copied = to_copy.copy_under(copy_to)
+
+        assert_equals('/Cloud/Carp', copied.materialized_path)
+        assert_equals('/Cloud/Carp', OsfStorageFileNode.load(copied._id)._cached_materialized_path)
+
+    def test_resolve_materialized_paths(self):
+        folder = self.node_settings.get_root().append_folder('Cloud')
+        children = [folder.append_file('Carp'), folder.append_folder('Tuna')]
+        OsfStorageFileNode.objects.filter(id__in=[folder.id] + [each.id for each in children]).update(_cached_materialized_path=None)
+        paths = OsfStorageFileNode.resolve_materialized_paths(
+            [OsfStorageFileNode.load(each._id) for each in [folder] + children]
+        )
+        assert_equals({
+            folder.pk: '/Cloud/',
+            children[0].pk: '/Cloud/Carp',
+            children[1].pk: '/Cloud/Tuna/',
+        }, paths)
+        assert_is(OsfStorageFileNode.load(folder._id)._cached_materialized_path, None)
+
+    def test_resolve_materialized_paths_save(self):
+        child = self.node_settings.get_root().append_folder('Cloud').append_file('Carp')
+        OsfStorageFileNode.objects.filter(id=child.id).update(_cached_materialized_path=None)
+        child = OsfStorageFileNode.load(child._id)
+        OsfStorageFileNode.resolve_materialized_paths([child], save=True)
+        assert_equals('/Cloud/Carp', OsfStorageFileNode.load(child._id)._cached_materialized_path)
+
     def test_copy(self):
         to_copy = self.node_settings.get_root().append_file('Carp')
         copy_to = self.node_settings.get_root().append_folder('Cloud')
@@ -890,6 +963,31 @@ class TestOsfStorageCheckout(StorageTestCase):
         with assert_raises(FileNodeCheckedOutError):
             folder.delete()
 
+    def test_subtree_checkout_flag(self):
+        folder = self.root_node.append_folder('folder')
+        subfolder = folder.append_folder('subfolder')
+        self.file.move_under(subfolder)
+        assert_false(OsfStorageFolder.load(folder._id)._subtree_checked_out)
+
+        self.file.check_in_or_out(self.user, self.user, save=True)
+        assert_true(OsfStorageFolder.load(folder._id)._subtree_checked_out)
+        assert_true(OsfStorageFolder.load(subfolder._id)._subtree_checked_out)
+        assert_true(folder.is_checked_out)
+
+        self.file.check_in_or_out(self.user, None, save=True)
+        assert_false(OsfStorageFolder.load(folder._id)._subtree_checked_out)
+        assert_false(OsfStorageFolder.load(subfolder._id)._subtree_checked_out)
+        with mock.patch.object(OsfStorageFolder, '_search_checked_out') as mock_search:
+            assert_false(folder.is_checked_out)
+        assert_false(mock_search.called)
+
+    def test_subtree_checkout_flag_unknown(self):
+        folder = self.root_node.append_folder('folder')
+        self.file.move_under(folder)
+        self.file.check_in_or_out(self.user, self.user, save=True)
+        OsfStorageFolder.objects.filter(id=folder.id).update(_subtree_checked_out=None)
+        assert_true(folder.is_checked_out)
+
     def test_move_checked_out_file(self):
         self.file.check_in_or_out(self.user, self.user, save=True)
         self.file.reload()
@@ -171,6 +171,67 @@ class TestGetMetadataHook(HookTestCase):
         assert_equal(res_date_modified, expected_date_modified)
         assert_equal(res_date_created, expected_date_created)
 
+    def test_children_metadata_paginated(self):
+        root = self.node_settings.get_root()
+        children = [root.append_file('file{}'.format(i)) for i in range(5)]
+        res = self.send_hook(
+            'osfstorage_get_children',
+            {'fid': root._id, 'user_id': self.user._id, 'page_size': 2},
+            {},
+            self.node
+        )
+        assert_equal([each['id'] for each in res.json], [each._id for each in children[:2]])
+
+        res = self.send_hook(
+            'osfstorage_get_children',
+            {'fid': root._id, 'user_id': self.user._id, 'page_size': 2, 'cursor': res.json[-1]['id']},
+            {},
+            self.node
+        )
+        assert_equal([each['id'] for each in res.json], [each._id for each in children[2:4]])
+
+    def test_children_metadata_paginated_cursor_trashed(self):
+        root = self.node_settings.get_root()
+        children = [root.append_file('file{}'.format(i)) for i in range(5)]
+        children[1].delete()
+        res = self.send_hook(
+            'osfstorage_get_children',
+            {'fid': root._id, 'user_id': self.user._id, 'page_size': 2, 'cursor': children[1]._id},
+            {},
+            self.node
+        )
+        assert_equal([each['id'] for each in res.json], [each._id for each in children[2:4]])
+
+    def test_children_metadata_invalid_page_size(self):
+        res = self.send_hook(
+            'osfstorage_get_children',
+            {'fid': self.node_settings.get_root()._id, 'user_id': self.user._id, 'page_size': 'zero'},
+            {},
+            self.node,
+            expect_errors=True,
+        )
+        assert_equal(res.status_code, 400)
+
+    def test_children_metadata_recursive(self):
+        record = recursively_create_file(self.node_settings, 'kind/of/magic.mp3')
+        root = self.node_settings.get_root()
+        res = self.send_hook(
+            'osfstorage_get_children',
+            {'fid': root._id, 'user_id': self.user._id, 'recursive': 'true'},
+            {},
+            self.node
+        )
+        folder_of = record.parent
+        folder_kind = folder_of.parent
+        assert_equal(
+            [(each['id'], each['kind'], each['parent']) for each in res.json],
+            [
+                (folder_kind._id, 'folder', root._id),
+                (folder_of._id, 'folder', folder_kind._id),
+                (record._id, 'file', folder_of._id),
+            ]
+        )
+
     def test_osf_storage_root(self):
         auth = Auth(self.project.creator)
         result = osf_storage_root(self.node_settings.config, self.node_settings, auth)
@@ -17,7 +17,7 @@ from framework.auth.decorators import must_be_signed, must_be_logged_in
 
 from api.caching.tasks import update_storage_usage
 from osf.exceptions import InvalidTagError, TagNotFoundError
-from osf.models import FileVersion, OSFUser
+from osf.models import BaseFileNode, FileVersion, OSFUser
 from osf.utils.permissions import WRITE
 from osf.utils.requests import check_select_for_update
 from website.project.decorators import (
@@ -173,13 +173,67 @@ def osfstorage_get_metadata(file_node, **kwargs):
     return file_node.serialize(version=version, include_full=True)
 
 
+CHILDREN_SQL = """
+    SELECT id FROM osf_basefilenode
+    WHERE parent_id = %(parent_id)s
+    AND (NOT type IN ('osf.trashedfilenode', 'osf.trashedfile', 'osf.trashedfolder'))
+"""
+
+DESCENDANTS_SQL = """
+    WITH RECURSIVE descendants(id) AS (
+        SELECT id FROM osf_basefilenode
+        WHERE parent_id = %(parent_id)s
+        AND (NOT type IN ('osf.trashedfilenode', 'osf.trashedfile', 'osf.trashedfolder'))
+        UNION ALL
+        SELECT C.id FROM osf_basefilenode AS C
+        JOIN descendants AS D ON C.parent_id = D.id
+        WHERE (NOT C.type IN ('osf.trashedfilenode', 'osf.trashedfile', 'osf.trashedfolder'))
+    )
+    SELECT id FROM descendants
+"""
+
+
+def _get_children_page_size():
+    page_size = request.args.get('page_size')
+    if page_size is None:
+        return None
+    try:
+        page_size = int(page_size)
+    except ValueError:
+        page_size = 0
+    if page_size < 1:
+        raise make_error(httplib.BAD_REQUEST, message_short='Invalid page_size')
+    return min(page_size, osf_storage_settings.MAX_CHILDREN_PAGE_SIZE)
+
+
 @must_be_signed
 @decorators.autoload_filenode(must_be='folder')
 def osfstorage_get_children(file_node, **kwargs):
+    """List the children of a folder in a single query.
+
+    Optional query parameters:
+
+    * ``page_size``: Return at most this many children, ordered by id.
+    * ``cursor``: Only return the children listed after the child with this id,
+      i.e. the ``id`` of the last item of the previous page.
+    * ``recursive``: List the whole subtree instead of the direct children. Each
+      item then has a ``parent`` key with the id of its parent folder.
+    """
     from django.contrib.contenttypes.models import ContentType
     user_id = request.args.get('user_id')
     user_content_type_id = ContentType.objects.get_for_model(OSFUser).id
     user_pk = OSFUser.objects.filter(guids___id=user_id, guids___id__isnull=False).values_list('pk', flat=True).first()
+    recursive = request.args.get('recursive', '').lower() in ('1', 'true')
+    page_size = _get_children_page_size()
+
+    after_id = 0
+    cursor_id = request.args.get('cursor')
+    if cursor_id:
+        # The last item of the previous page may have been trashed since
+        after_id = BaseFileNode.objects.filter(_id=cursor_id).values_list('id', flat=True).first()
+        if after_id is None:
+            raise make_error(httplib.BAD_REQUEST, message_short='Invalid cursor')
+
     with connection.cursor() as cursor:
         # Read the documentation on FileVersion's fields before reading this code
         cursor.execute("""
@@ -192,15 +246,16 @@ def osfstorage_get_children(file_node, **kwargs):
                         , 'kind', 'file'
                         , 'size', LATEST_VERSION.size
                         , 'downloads',  COALESCE(DOWNLOAD_COUNT, 0)
-                        , 'version', (SELECT COUNT(*) FROM osf_basefilenode_versions WHERE osf_basefilenode_versions.basefilenode_id = F.id)
+                        , 'version', VERSIONS.count
                         , 'contentType', LATEST_VERSION.content_type
                         , 'modified', LATEST_VERSION.created
-                        , 'created', EARLIEST_VERSION.created
+                        , 'created', VERSIONS.created
                         , 'checkout', CHECKOUT_GUID
                         , 'md5', LATEST_VERSION.metadata ->> 'md5'
                         , 'sha256', LATEST_VERSION.metadata ->> 'sha256'
                         , 'sha512', LATEST_VERSION.metadata ->> 'sha512'
                         , 'latestVersionSeen', SEEN_LATEST_VERSION.case
+                        {parent_field}
                     )
                 ELSE
                     json_build_object(
@@ -208,10 +263,19 @@ def osfstorage_get_children(file_node, **kwargs):
                         , 'path', '/' || F._id || '/'
                         , 'name', F.name
                         , 'kind', 'folder'
+                        {parent_field}
                     )
                 END
+                ORDER BY F.id
             )
-            FROM osf_basefilenode AS F
+            FROM (
+                SELECT * FROM osf_basefilenode
+                WHERE id IN ({children})
+                AND id > %(after_id)s
+                ORDER BY id
+                LIMIT %(page_size)s
+            ) AS F
+            LEFT JOIN osf_basefilenode AS PARENT ON PARENT.id = F.parent_id
             LEFT JOIN LATERAL (
                 SELECT * FROM osf_fileversion
                 JOIN osf_basefilenode_versions ON osf_fileversion.id = osf_basefilenode_versions.fileversion_id
@@ -220,21 +284,19 @@ def osfstorage_get_children(file_node, **kwargs):
                 LIMIT 1
             ) LATEST_VERSION ON TRUE
             LEFT JOIN LATERAL (
-                SELECT * FROM osf_fileversion
+                SELECT COUNT(*) AS count, MIN(osf_fileversion.created) AS created FROM osf_fileversion
                 JOIN osf_basefilenode_versions ON osf_fileversion.id = osf_basefilenode_versions.fileversion_id
                 WHERE osf_basefilenode_versions.basefilenode_id = F.id
-                ORDER BY created ASC
-                LIMIT 1
-            ) EARLIEST_VERSION ON TRUE
+            ) VERSIONS ON TRUE
             LEFT JOIN LATERAL (
                 SELECT _id from osf_guid
                 WHERE object_id = F.checkout_id
-                AND content_type_id = %s
+                AND content_type_id = %(user_content_type_id)s
                 LIMIT 1
             ) CHECKOUT_GUID ON TRUE
             LEFT JOIN LATERAL (
                 SELECT P.total AS DOWNLOAD_COUNT FROM osf_pagecounter AS P
-                WHERE P._id = 'download:' || %s || ':' || F._id
+                WHERE P._id = 'download:' || %(target_id)s || ':' || F._id
                 LIMIT 1
             ) DOWNLOAD_COUNT ON TRUE
             LEFT JOIN LATERAL (
@@ -242,7 +304,7 @@ def osfstorage_get_children(file_node, **kwargs):
                 SELECT (1) FROM osf_fileversionusermetadata
                   INNER JOIN osf_fileversion ON osf_fileversionusermetadata.file_version_id = osf_fileversion.id
                   INNER JOIN osf_basefilenode_versions ON osf_fileversion.id = osf_basefilenode_versions.fileversion_id
-                  WHERE osf_fileversionusermetadata.user_id = %s
+                  WHERE osf_fileversionusermetadata.user_id = %(user_pk)s
                   AND osf_basefilenode_versions.basefilenode_id = F.id
                 LIMIT 1
               )
@@ -253,29 +315,30 @@ def osfstorage_get_children(file_node, **kwargs):
                     CASE WHEN EXISTS(
                       SELECT (1) FROM osf_fileversionusermetadata
                       WHERE osf_fileversionusermetadata.file_version_id = LATEST_VERSION.fileversion_id
-                      AND osf_fileversionusermetadata.user_id = %s
+                      AND osf_fileversionusermetadata.user_id = %(user_pk)s
                       LIMIT 1
                     )
                     THEN
-                      json_build_object('user', %s, 'seen', TRUE)
+                      json_build_object('user', %(user_id)s, 'seen', TRUE)
                     ELSE
-                      json_build_object('user', %s, 'seen', FALSE)
+                      json_build_object('user', %(user_id)s, 'seen', FALSE)
                     END
                 ELSE
                   NULL
                 END
             ) SEEN_LATEST_VERSION ON TRUE
-            WHERE parent_id = %s
-            AND (NOT F.type IN ('osf.trashedfilenode', 'osf.trashedfile', 'osf.trashedfolder'))
-        """, [
-            user_content_type_id,
-            file_node.target._id,
-            user_pk,
-            user_pk,
-            user_id,
-            user_id,
-            file_node.id
-        ])
+        """.format(
+            children=DESCENDANTS_SQL if recursive else CHILDREN_SQL,
+            parent_field=", 'parent', PARENT._id" if recursive else '',
+        ), {
+            'parent_id': file_node.id,
+            'after_id': after_id,
+            'page_size': page_size,
+            'user_content_type_id': user_content_type_id,
+            'target_id': file_node.target._id,
+            'user_pk': user_pk,
+            'user_id': user_id,
+        })
         return cursor.fetchone()[0] or []
 
 
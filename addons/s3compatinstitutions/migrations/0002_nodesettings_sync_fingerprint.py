@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('addons_s3compatinstitutions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nodesettings',
+            name='sync_fingerprint',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -8,6 +8,9 @@ DEFAULT_BASE_BUCKET = 'GRDM'
 # available: {guid} (required) (DO NOT USE "{title}")
 ROOT_FOLDER_FORMAT = '{guid}'
 
+# Number of projects synchronized at a time by sync_all()
+SYNC_ALL_MAX_WORKERS = 4
+
 DEBUG_URL = None
 DEBUG_USER = None
 DEBUG_PASSWORD = None
@@ -4,10 +4,15 @@ from io import BytesIO
 from lxml import etree
 import os
 import datetime
+import hashlib
 import mimetypes
+import time
 import httplib as http
+from django.conf import settings as django_settings
+from django.core.cache import caches
 from framework.exceptions import HTTPError
 from requests.exceptions import ConnectionError
+from addons.weko import settings as weko_settings
 
 logger = logging.getLogger('addons.weko.client')
 
@@ -50,17 +55,43 @@ class Index(object):
         return self.raw['about']
 
 
+class IndexTree(object):
+    """Indices of a service document, with lookups by id and by parent."""
+
+    def __init__(self, indices):
+        self.indices = indices
+        self.by_id = {}
+        self.children = {}
+        for index in indices:
+            self.by_id[index.identifier] = index
+            self.children.setdefault(index.parentIdentifier, []).append(index)
+
+    def get(self, index_id):
+        return self.by_id.get(str(index_id))
+
+    def path_ids(self, index_id):
+        """Ids from the root index down to index_id."""
+        ids = []
+        index = self.by_id[str(index_id)]
+        while index is not None:
+            ids.insert(0, index.identifier)
+            index = self.by_id.get(index.parentIdentifier)
+        return ids
+
+
 class Connection(object):
     host = None
     token = None
     username = None
     password = None
+    account_id = None
 
-    def __init__(self, host, token=None, username=None, password=None):
+    def __init__(self, host, token=None, username=None, password=None, account_id=None):
         self.host = host
         self.token = token
         self.username = username
         self.password = password
+        self.account_id = account_id
 
     def get_login_user(self, default_user=None):
         resp = requests.get(self.host + 'servicedocument.php',
@@ -78,6 +109,56 @@ class Connection(object):
         tree = etree.parse(BytesIO(resp.content))
         return tree
 
+    def get_cached(self, path):
+        """Same as get(), but the document is shared through the WEKO cache.
+
+        Cached documents are used as-is for SERVICE_DOCUMENT_CACHE_TTL
+        seconds, then revalidated with If-None-Match/If-Modified-Since.
+        Documents cached with other credentials of the account (e.g. before
+        its token was refreshed) are not used.
+        """
+        cache = caches[django_settings.WEKO_CACHE_NAME]
+        key = self._cache_key(path)
+        cached = cache.get(key)
+        if cached is not None and cached.get('credentials') != self._credentials_digest():
+            cached = None
+        if cached is not None and \
+           time.time() - cached['loaded'] < weko_settings.SERVICE_DOCUMENT_CACHE_TTL:
+            return etree.parse(BytesIO(cached['content']))
+        headers = {}
+        if cached is not None and cached['etag'] is not None:
+            headers['If-None-Match'] = cached['etag']
+        if cached is not None and cached['last_modified'] is not None:
+            headers['If-Modified-Since'] = cached['last_modified']
+        resp = requests.get(self.host + path, **self._requests_args(headers or None))
+        if resp.status_code == 304 and cached is not None:
+            cached['loaded'] = time.time()
+        elif resp.status_code != 200:
+            resp.raise_for_status()
+        else:
+            cached = {'content': resp.content,
+                      'etag': resp.headers.get('ETag'),
+                      'last_modified': resp.headers.get('Last-Modified'),
+                      'credentials': self._credentials_digest(),
+                      'loaded': time.time()}
+        cache.set(key, cached, weko_settings.SERVICE_DOCUMENT_CACHE_TIMEOUT)
+        return etree.parse(BytesIO(cached['content']))
+
+    def invalidate(self, path):
+        caches[django_settings.WEKO_CACHE_NAME].delete(self._cache_key(path))
+
+    def _cache_key(self, path):
+        # Documents depend on the privileges of the account
+        account = self.account_id if self.account_id is not None else self.username
+        return hashlib.sha256(u'\n'.join([self.host, account or u'', path]).encode('utf8')).hexdigest()
+
+    def _credentials_digest(self):
+        if self.token is not None:
+            credentials = self.token
+        else:
+            credentials = u'\n'.join([self.username or u'', self.password or u''])
+        return hashlib.sha256(credentials.encode('utf8')).hexdigest()
+
     def get_url(self, url):
         resp = requests.get(url, **self._requests_args())
         if resp.status_code != 200:
@@ -114,10 +195,11 @@ def parse_index(desc):
                  index_id=desc.find('{%s}identifier' % DC_NAMESPACE).text,
                  about=desc.attrib['{%s}about' % RDF_NAMESPACE])
 
-def connect(sword_url, token=None, username=None, password=None):
+def connect(sword_url, token=None, username=None, password=None, account_id=None):
     try:
         return Connection(sword_url, token=token,
-                          username=username, password=password)
+                          username=username, password=password,
+                          account_id=account_id)
     except ConnectionError:
         return None
 
@@ -130,16 +212,19 @@ def connect_from_settings(weko_settings, node_settings):
     provider = WEKOProvider(node_settings.external_account)
 
     if provider.repoid is not None:
-        return connect(provider.sword_url, token=provider.token)
+        return connect(provider.sword_url, token=provider.token,
+                       account_id=provider.account._id)
     else:
         return connect(provider.sword_url, username=provider.userid,
-                       password=provider.password)
+                       password=provider.password,
+                       account_id=provider.account._id)
 
 
-def connect_or_error(sword_url, token=None, username=None, password=None):
+def connect_or_error(sword_url, token=None, username=None, password=None, account_id=None):
     try:
         return Connection(sword_url, token=token,
-                          username=username, password=password)
+                          username=username, password=password,
+                          account_id=account_id)
     except UnauthorizedError:
         raise HTTPError(http.UNAUTHORIZED)
 
@@ -152,14 +237,23 @@ def connect_from_settings_or_401(weko_settings, node_settings):
     provider = WEKOProvider(node_settings.external_account)
 
     if provider.repoid is not None:
-        return connect_or_error(provider.sword_url, token=provider.token)
+        return connect_or_error(provider.sword_url, token=provider.token,
+                                account_id=provider.account._id)
     else:
         return connect_or_error(provider.sword_url, username=provider.userid,
-                                password=provider.password)
+                                password=provider.password,
+                                account_id=provider.account._id)
+
+
+def get_index_tree(connection):
+    return IndexTree(_parse_indices(connection.get_cached('servicedocument.php')))
 
 
 def get_all_indices(connection):
-    root = connection.get('servicedocument.php')
+    return get_index_tree(connection).indices
+
+
+def _parse_indices(root):
     indices = []
     for desc in root.findall('.//{%s}Description' % RDF_NAMESPACE):
         indices.append(parse_index(desc))
@@ -180,10 +274,10 @@ def get_all_indices(connection):
 
 
 def get_index_by_id(connection, index_id):
-    return list(filter(lambda i: i.identifier == index_id, get_all_indices(connection)))[0]
+    return get_index_tree(connection).get(index_id)
 
 def get_serviceitemtype(connection):
-    root = connection.get('serviceitemtype.php')
+    root = connection.get_cached('serviceitemtype.php')
     logger.debug('Serviceitemtype: {}'.format(etree.tostring(root)))
     r = {'metadata': [], 'item_type': []}
     for metadata in root.findall('metadata'):
@@ -226,7 +320,7 @@ def delete(connection, url):
     connection.delete_url(url)
 
 def post(connection, insert_index_id, stream, stream_size):
-    root = connection.get('servicedocument.php')
+    root = connection.get_cached('servicedocument.php')
     target = None
     for collection in root.findall('.//{%s}collection' % APP_NAMESPACE):
         target = collection.attrib['href']
@@ -283,10 +377,11 @@ def create_index(connection, title_ja=None, title_en=None, relation=None):
     }
     root = connection.post_url(target, stream, default_headers=weko_headers)
     logger.info('Result: {}'.format(etree.tostring(root)))
+    connection.invalidate('servicedocument.php')
     return index_id
 
 def update_index(connection, index_id, title_ja=None, title_en=None, relation=None):
-    root = connection.get('servicedocument.php')
+    root = connection.get_cached('servicedocument.php')
     target = None
     for collection in root.findall('.//{%s}collection' % APP_NAMESPACE):
         target = collection.attrib['href']
@@ -316,6 +411,7 @@ def update_index(connection, index_id, title_ja=None, title_en=None, relation=No
     }
     root = connection.post_url(target, stream, default_headers=weko_headers)
     logger.info('Result: {}'.format(etree.tostring(root)))
+    connection.invalidate('servicedocument.php')
 
 def create_import_xml(item_type, internal_item_type_id, uploaded_filenames, title, title_en, contributors):
     post_xml = etree.Element('export')
@@ -1,6 +1,12 @@
 
 REQUEST_TIMEOUT = 15
 
+# Seconds during which cached service documents are used without revalidation
+SERVICE_DOCUMENT_CACHE_TTL = 60
+
+# Seconds after which cached service documents are dropped from the cache
+SERVICE_DOCUMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
 REPOSITORIES = {'no_host.repo.nii.ac.jp':
                  {'host': 'http://no_host.repo.nii.ac.jp/weko/sword/',
                   'client_id': None, 'client_secret': None,
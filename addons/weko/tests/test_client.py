@@ -291,9 +291,10 @@ def etree_to_dict(t):
 
 
 class MockResponse:
-    def __init__(self, content, status_code):
+    def __init__(self, content, status_code, headers=None):
         self.content = content
         self.status_code = status_code
+        self.headers = headers or {}
 
 
 mock_response_404 = MockResponse('404 not found', 404)
@@ -339,3 +340,62 @@ class TestWEKOClient(OsfTestCase):
                                        fake_weko_item_uploaded_filenames2, fake_weko_item_title,
                                        fake_weko_item_title_en, fake_weko_item_contributors)
         assert(etree_to_dict(res), etree_to_dict(etree.XML(fake_expected_create_import_xml2)))
+
+    @mock.patch('requests.get')
+    def test_weko_service_document_cached(self, get_req_mock):
+        get_req_mock.return_value = MockResponse(fake_weko_service_document_xml, 200,
+                                                 headers={'ETag': '"v1"'})
+        self.conn.invalidate('servicedocument.php')
+
+        index = client.get_index_by_id(self.conn, str(fake_weko_last_index_id))
+        assert_equal(index.title, 'fake project title')
+        assert_equal(client.get_index_by_id(self.conn, 'unknown'), None)
+        assert_equal(get_req_mock.call_count, 1)
+
+        # Revalidated once expired
+        get_req_mock.return_value = MockResponse('', 304)
+        with mock.patch.object(client.weko_settings, 'SERVICE_DOCUMENT_CACHE_TTL', 0):
+            indices = client.get_all_indices(self.conn)
+        assert_equal([i.identifier for i in indices], [str(fake_weko_last_index_id)])
+        assert_equal(get_req_mock.call_count, 2)
+        assert_equal(get_req_mock.call_args[1]['headers'], {'If-None-Match': '"v1"'})
+
+    @mock.patch('requests.get')
+    def test_weko_service_document_cached_per_account(self, get_req_mock):
+        get_req_mock.return_value = MockResponse(fake_weko_service_document_xml, 200)
+        conn = client.connect_or_error(self.host, token='token1', account_id='account1')
+        conn.invalidate('servicedocument.php')
+        cache = client.caches[client.django_settings.WEKO_CACHE_NAME]
+        with mock.patch.object(cache, 'set', wraps=cache.set) as set_mock:
+            client.get_all_indices(conn)
+        # Keyed by the account, not by its token
+        other_conn = client.connect_or_error(self.host, token='token2', account_id='account1')
+        assert_equal(set_mock.call_args[0][0], other_conn._cache_key('servicedocument.php'))
+        assert_equal(set_mock.call_args[0][2], client.weko_settings.SERVICE_DOCUMENT_CACHE_TIMEOUT)
+        client.get_all_indices(conn)
+        assert_equal(get_req_mock.call_count, 1)
+
+        # Refreshing the token of the account drops its cached documents
+        client.get_all_indices(other_conn)
+        assert_equal(get_req_mock.call_count, 2)
+        assert_not_in('If-None-Match', get_req_mock.call_args[1]['headers'] or {})
+
+    @mock.patch('requests.get', side_effect=mock_requests_get)
+    @mock.patch('requests.post', side_effect=mock_requests_post)
+    def test_weko_create_index_invalidates_cache(self, post_req_mock, get_req_mock):
+        self.conn.invalidate('servicedocument.php')
+        client.get_all_indices(self.conn)
+        client.create_index(self.conn)
+        client.get_all_indices(self.conn)
+        # get_all_indices, create_index and get_all_indices again
+        assert_equal(get_req_mock.call_count, 3)
+
+    def test_weko_index_tree(self):
+        parent = client.Index(title='parent', index_id='1')
+        child = client.Index(title='--child', index_id='2')
+        child.parentIdentifier = '1'
+        tree = client.IndexTree([parent, child])
+        assert_equal(tree.get(2), child)
+        assert_equal(tree.children[None], [parent])
+        assert_equal(tree.children['1'], [child])
+        assert_equal(tree.path_ids(2), ['1', '2'])
@@ -255,12 +255,12 @@ def weko_create_index(node_addon, auth, **kwargs):
         log_date=now,
     )
 
-    indices = client.get_all_indices(connection)
+    tree = client.get_index_tree(connection)
 
     return {'nodeId': node._id,
             'name': title_ja,
             'kind': 'folder',
-            'path': _get_path(indices, index_id),
+            'path': _get_path(tree, index_id),
             'provider': SHORT_NAME}, http.OK
 
 @must_have_permission('write')
@@ -321,10 +321,5 @@ def _weko_root_folder(node_addon, auth, **kwargs):
 def weko_root_folder(node_addon, auth, **kwargs):
     return _weko_root_folder(node_addon, auth=auth)
 
-def _get_path(indices, index_id):
-    index = filter(lambda i: str(i.identifier) == str(index_id), indices)[0]
-    if index.parentIdentifier is None:
-        return '/weko:{}/'.format(index_id)
-    else:
-        return '{}weko:{}/'.format(_get_path(indices, index.parentIdentifier),
-                              index_id)
+def _get_path(tree, index_id):
+    return '/' + ''.join(['weko:{}/'.format(i) for i in tree.path_ids(index_id)])
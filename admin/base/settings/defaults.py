@@ -330,6 +330,14 @@ EMBEDDED_DS_URL = osf_settings.EMBEDDED_DS_URL
 
 # mail address uses mail from rdm_announcement
 ANNOUNCEMENT_EMAIL_FROM = 'noreply@rdm.rcos.nii.ac.jp'
+# Bcc recipients per announcement email
+ANNOUNCEMENT_EMAIL_BATCH_SIZE = 100
+# Seconds between announcement emails, to limit the sending rate
+ANNOUNCEMENT_EMAIL_INTERVAL = 1
+# Attempts to send a batch before the delivery is stopped as failed
+ANNOUNCEMENT_MAX_ATTEMPTS = 3
+# Device tokens per push notification request
+ANNOUNCEMENT_PUSH_BATCH_SIZE = 1000
 
 # Addon Controls
 ENABLE_FORCE_CHECK = False
@@ -13,6 +13,8 @@ urlpatterns = [
     url(r'^(?P<institution_id>[0-9]+)/delete/$', views.DeleteInstitution.as_view(), name='delete'),
     url(r'^(?P<institution_id>[0-9]+)/cannot_delete/$', views.CannotDeleteInstitution.as_view(), name='cannot_delete'),
     url(r'^(?P<institution_id>[0-9]+)/nodes/$', views.InstitutionNodeList.as_view(), name='nodes'),
+    url(r'^user_list_by_institution_id/(?P<institution_id>[0-9]+)/csv/$', views.UserListByInstitutionIDCSV.as_view(), name='institution_user_list_csv'),
     url(r'^user_list_by_institution_id/(?P<institution_id>.*)/$', views.UserListByInstitutionID.as_view(), name='institution_user_list'),
     url(r'^statistical_status_default_storage/$', views.StatisticalStatusDefaultStorage.as_view(), name='statistical_status_default_storage'),
+    url(r'^statistical_status_default_storage/csv/$', views.StatisticalStatusDefaultStorageCSV.as_view(), name='statistical_status_default_storage_csv'),
 ]
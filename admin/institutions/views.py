@@ -1,13 +1,13 @@
 from __future__ import unicode_literals
 
+import csv
 import json
-from operator import itemgetter
 
 from django.core import serializers
 from django.shortcuts import redirect
 from django.forms.models import model_to_dict
 from django.core.urlresolvers import reverse_lazy
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.generic import ListView, DetailView, View, CreateView, UpdateView, DeleteView, TemplateView
 from django.contrib.auth.mixins import PermissionRequiredMixin, UserPassesTestMixin
 from admin.rdm.utils import RdmPermissionMixin
@@ -219,24 +219,36 @@ class CannotDeleteInstitution(TemplateView):
 
 class QuotaUserList(ListView):
     """Base class for UserListByInstitutionID and StatisticalStatusDefaultStorage.
+
+    Quota values are annotated on the user queryset, so that sorting and
+    pagination are done by the database and only one page of users is loaded.
     """
+    ORDER_BY_FIELDS = {
+        'fullname': 'fullname',
+        'username': 'username',
+        'ratio': 'quota_ratio',
+        'usage': 'quota_used',
+        'remaining': 'quota_remaining',
+        'quota': 'quota_max',
+    }
 
     def custom_size_abbreviation(self, size, abbr):
         if abbr == 'B':
             return (size / api_settings.BASE_FOR_METRIC_PREFIX, 'KB')
         return size, abbr
 
-    def get_user_quota_info(self, user, storage_type):
-        max_quota, used_quota = quota.get_quota_info(user, storage_type)
-        max_quota_bytes = max_quota * api_settings.SIZE_UNIT_GB
-        remaining_quota = max_quota_bytes - used_quota
+    def get_user_quota_info(self, user):
+        """Format a user annotated by quota.annotate_quota_info() for the templates."""
+        max_quota = user.quota_max
+        used_quota = int(user.quota_used)
+        remaining_quota = int(user.quota_remaining)
         used_quota_abbr = self.custom_size_abbreviation(*quota.abbreviate_size(used_quota))
         remaining_abbr = self.custom_size_abbreviation(*quota.abbreviate_size(remaining_quota))
         return {
-            'id': user.guids.first()._id,
+            'id': user.guid_id,
             'fullname': user.fullname,
             'username': user.username,
-            'ratio': float(used_quota) / max_quota_bytes * 100,
+            'ratio': user.quota_ratio or 0.0,
             'usage': used_quota,
             'usage_value': used_quota_abbr[0],
             'usage_abbr': used_quota_abbr[1],
@@ -247,15 +259,14 @@ class QuotaUserList(ListView):
         }
 
     def get_queryset(self):
-        user_list = self.get_userlist()
-        order_by = self.get_order_by()
-        reverse = self.get_direction() != 'asc'
-        user_list.sort(key=itemgetter(order_by), reverse=reverse)
-        return user_list
+        order_by = self.ORDER_BY_FIELDS[self.get_order_by()]
+        if self.get_direction() != 'asc':
+            order_by = '-' + order_by
+        return self.get_userlist().order_by(order_by, 'pk')
 
     def get_order_by(self):
         order_by = self.request.GET.get('order_by', 'ratio')
-        if order_by not in ['fullname', 'username', 'ratio', 'usage', 'remaining', 'quota']:
+        if order_by not in self.ORDER_BY_FIELDS:
             return 'ratio'
         return order_by
 
@@ -275,13 +286,47 @@ class QuotaUserList(ListView):
         self.paginator, self.page, self.query_set, self.is_paginated = \
             self.paginate_queryset(self.query_set, self.page_size)
 
-        kwargs['users'] = self.query_set
+        kwargs['users'] = [self.get_user_quota_info(user) for user in self.query_set]
         kwargs['page'] = self.page
         kwargs['order_by'] = self.get_order_by()
         kwargs['direction'] = self.get_direction()
         return super(QuotaUserList, self).get_context_data(**kwargs)
 
 
+class _Echo(object):
+    """File-like object that returns what is written, for streaming csv rows."""
+
+    def write(self, value):
+        return value
+
+
+class QuotaUserListCSVMixin(object):
+    """Export every user of a QuotaUserList as csv, in the order of the list.
+
+    Rows are streamed from a server-side cursor, so large institutions are
+    exported without loading all of their users in memory.
+    """
+    CSV_HEADER = ['id', 'fullname', 'username', 'ratio', 'usage', 'remaining', 'quota']
+
+    def get(self, request, *args, **kwargs):
+        writer = csv.writer(_Echo())
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in self.iter_csv_rows()),
+            content_type='text/csv'
+        )
+        response['Content-Disposition'] = 'attachment; filename=quota_users.csv'
+        return response
+
+    def iter_csv_rows(self):
+        yield self.CSV_HEADER
+        for user in self.get_queryset().iterator():
+            info = self.get_user_quota_info(user)
+            yield [
+                info[key].encode('utf-8') if isinstance(info[key], unicode) else info[key]
+                for key in self.CSV_HEADER
+            ]
+
+
 class UserListByInstitutionID(QuotaUserList, PermissionRequiredMixin):
     template_name = 'institutions/list_institute.html'
     permission_required = 'osf.view_osfuser'
@@ -289,15 +334,19 @@ class UserListByInstitutionID(QuotaUserList, PermissionRequiredMixin):
     paginate_by = 10
 
     def get_userlist(self):
-        user_list = []
-        for user in OSFUser.objects.filter(affiliated_institutions=self.kwargs['institution_id']):
-            user_list.append(self.get_user_quota_info(user, UserQuota.NII_STORAGE))
-        return user_list
+        return quota.annotate_quota_info(
+            OSFUser.objects.filter(affiliated_institutions=self.kwargs['institution_id']),
+            UserQuota.NII_STORAGE
+        )
 
     def get_institution(self):
         return Institution.objects.get(id=self.kwargs['institution_id'])
 
 
+class UserListByInstitutionIDCSV(QuotaUserListCSVMixin, UserListByInstitutionID):
+    pass
+
+
 class StatisticalStatusDefaultStorage(QuotaUserList, RdmPermissionMixin, UserPassesTestMixin):
     template_name = 'institutions/statistical_status_default_storage.html'
     permission_required = 'osf.view_institution'
@@ -309,12 +358,17 @@ class StatisticalStatusDefaultStorage(QuotaUserList, RdmPermissionMixin, UserPas
             and self.request.user.affiliated_institutions.exists()
 
     def get_userlist(self):
-        user_list = []
         institution = self.request.user.affiliated_institutions.first()
-        if institution is not None and Region.objects.filter(_id=institution._id).exists():
-            for user in OSFUser.objects.filter(affiliated_institutions=institution.id):
-                user_list.append(self.get_user_quota_info(user, UserQuota.CUSTOM_STORAGE))
-        return user_list
+        if institution is None or not Region.objects.filter(_id=institution._id).exists():
+            return quota.annotate_quota_info(OSFUser.objects.none(), UserQuota.CUSTOM_STORAGE)
+        return quota.annotate_quota_info(
+            OSFUser.objects.filter(affiliated_institutions=institution.id),
+            UserQuota.CUSTOM_STORAGE
+        )
 
     def get_institution(self):
         return self.request.user.affiliated_institutions.first()
+
+
+class StatisticalStatusDefaultStorageCSV(QuotaUserListCSVMixin, StatisticalStatusDefaultStorage):
+    pass
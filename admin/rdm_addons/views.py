@@ -28,7 +28,7 @@ def init_app():
     attach_handlers(app, website_settings)
     for addon in website_settings.ADDONS_AVAILABLE:
         try:
-            addon.ready()
+            addon.load_routes()
         except AssertionError:
             pass
     return app
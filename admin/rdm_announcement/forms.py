@@ -43,7 +43,8 @@ class SendForm(forms.ModelForm):
 
     class Meta:
         model = RdmAnnouncement
-        exclude = ['user', 'date_sent', 'is_success']
+        exclude = ['user', 'date_sent', 'is_success', 'status', 'recipient_institutions',
+                   'last_recipient_id', 'sent_count', 'error', 'date_completed']
 
 class SettingsForm(forms.ModelForm):
 
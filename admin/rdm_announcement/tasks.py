@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""Background delivery of RDM announcements.
+
+Recipients are read in batches from a server-side cursor ordered by id and
+the id of the last delivered recipient is saved after each batch, so a
+failed delivery can be queued again and resumed where it stopped.
+"""
+import logging
+import time
+from urlparse import urlparse
+
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from admin.base import settings as admin_settings
+from framework.celery_tasks import app as celery_app
+from osf.models.rdm_announcement import RdmAnnouncement, RdmAnnouncementOption, RdmFcmDevice
+from osf.models.user import OSFUser
+from website.settings import SUPPORT_EMAIL
+
+logger = logging.getLogger(__name__)
+
+# announcement types delivered by deliver_announcement()
+QUEUED_TYPES = ('Email', 'Push notification')
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _with_retries(func, *args):
+    attempt = 1
+    while True:
+        try:
+            return func(*args)
+        except Exception:
+            if attempt >= admin_settings.ANNOUNCEMENT_MAX_ATTEMPTS:
+                raise
+            logger.warning('Announcement batch failed (attempt {}), retrying'.format(attempt), exc_info=True)
+            time.sleep(2 ** attempt)
+            attempt += 1
+
+
+def _save_progress(announcement, last_recipient_id, count):
+    announcement.last_recipient_id = last_recipient_id
+    announcement.sent_count += count
+    announcement.save(update_fields=['last_recipient_id', 'sent_count'])
+
+
+def email_recipients(announcement):
+    """(OSFUser.id, username) of the recipients not delivered yet."""
+    users = OSFUser.objects.filter(id__gt=announcement.last_recipient_id)
+    if announcement.recipient_institutions is None:
+        users = users.filter(is_active=True, is_registered=True)
+    else:
+        users = users.filter(
+            affiliated_institutions__in=announcement.recipient_institutions).distinct()
+    return users.order_by('id').values_list('id', 'username').iterator()
+
+
+def push_recipients(announcement):
+    """(RdmFcmDevice.id, device_token) of the devices not delivered yet."""
+    devices = RdmFcmDevice.objects.filter(id__gt=announcement.last_recipient_id)
+    if announcement.recipient_institutions is not None:
+        devices = devices.filter(
+            user__affiliated_institutions__in=announcement.recipient_institutions).distinct()
+    return devices.order_by('id').values_list('id', 'device_token').iterator()
+
+
+def _deliver_email(announcement):
+    connection = get_connection(
+        backend=admin_settings.EMAIL_BACKEND,
+        host=admin_settings.EMAIL_HOST,
+        port=admin_settings.EMAIL_PORT,
+        username=admin_settings.EMAIL_HOST_USER,
+        password=admin_settings.EMAIL_HOST_PASSWORD,
+        use_tls=admin_settings.EMAIL_USE_TLS,
+    )
+    to = [SUPPORT_EMAIL or announcement.user.username]
+
+    def send(addresses):
+        email = EmailMessage(
+            subject=announcement.title,
+            body=announcement.body,
+            from_email=admin_settings.ANNOUNCEMENT_EMAIL_FROM,
+            to=to,
+            bcc=addresses,
+            connection=connection,
+        )
+        try:
+            email.send(fail_silently=False)
+        except Exception:
+            # reconnect at the next attempt
+            connection.close()
+            raise
+
+    # one SMTP session for all batches
+    connection.open()
+    try:
+        for batch in _batches(email_recipients(announcement),
+                              admin_settings.ANNOUNCEMENT_EMAIL_BATCH_SIZE):
+            _with_retries(send, [username for _, username in batch])
+            _save_progress(announcement, batch[-1][0], len(batch))
+            time.sleep(admin_settings.ANNOUNCEMENT_EMAIL_INTERVAL)
+    finally:
+        connection.close()
+
+
+def _deliver_push(announcement):
+    from pyfcm import FCMNotification
+    push_service = FCMNotification(api_key=admin_settings.FCM_SETTINGS.get('FCM_SERVER_KEY'))
+
+    def send(tokens):
+        push_service.notify_multiple_devices(registration_ids=tokens,
+                                             message_title=announcement.title,
+                                             message_body=announcement.body)
+
+    for batch in _batches(push_recipients(announcement),
+                          admin_settings.ANNOUNCEMENT_PUSH_BATCH_SIZE):
+        _with_retries(send, list(set(token for _, token in batch)))
+        _save_progress(announcement, batch[-1][0], len(batch))
+
+
+def send_redmine(data, option):
+    ret = {'is_success': True, 'error': ''}
+    try:
+        from redminelib import Redmine
+        api_url = getattr(option, 'redmine_api_url')
+        api_key = getattr(option, 'redmine_api_key')
+        url_info = urlparse(api_url)
+        redmine_url = url_info.scheme + '://' + url_info.netloc
+        project_identifier = url_info.path.split('/')[2]
+        redmine = Redmine(redmine_url, key=api_key, raise_attr_exception=('Project', 'Issue'))
+        issue = redmine.issue.new()
+        all_status_id = list(redmine.issue_status.all().values_list('id', flat=True))
+        all_priority_id = list(redmine.enumeration.filter(resource='issue_priorities').values_list('id', flat=True))
+        issue.project_id = project_identifier
+        issue.subject = '[{}] {}'.format(data['announcement_type'], data['title'])
+        issue.description = data['body']
+        issue.status_id = all_status_id[0]
+        issue.priority_id = all_priority_id[0]
+        issue.save()
+    except Exception as e:
+        ret['is_success'] = False
+        ret['error'] = 'Redmine error: ' + str(e)
+    finally:
+        return ret
+
+
+@celery_app.task(ignore_result=True)
+def deliver_announcement(announcement_id):
+    announcement = RdmAnnouncement.objects.get(id=announcement_id)
+    if announcement.status == RdmAnnouncement.STATUS_SENT:
+        return
+    announcement.status = RdmAnnouncement.STATUS_SENDING
+    announcement.error = None
+    announcement.save(update_fields=['status', 'error'])
+
+    try:
+        if announcement.announcement_type == 'Email':
+            _deliver_email(announcement)
+        else:
+            _deliver_push(announcement)
+        option = RdmAnnouncementOption.objects.filter(user_id=announcement.user_id).first()
+        if option and option.redmine_api_url and option.redmine_api_key:
+            ret = send_redmine({
+                'title': announcement.title,
+                'body': announcement.body,
+                'announcement_type': announcement.announcement_type,
+            }, option)
+            if not ret['is_success']:
+                raise Exception(ret['error'])
+    except Exception as e:
+        logger.exception('Delivery of announcement {} failed after {} recipients'.format(
+            announcement.id, announcement.sent_count))
+        announcement.status = RdmAnnouncement.STATUS_FAILED
+        announcement.error = str(e)
+        announcement.save(update_fields=['status', 'error'])
+        return
+
+    announcement.status = RdmAnnouncement.STATUS_SENT
+    announcement.is_success = True
+    announcement.date_completed = timezone.now()
+    announcement.save(update_fields=['status', 'is_success', 'date_completed'])
+    logger.info('Announcement {} delivered to {} recipients'.format(
+        announcement.id, announcement.sent_count))
@@ -9,4 +9,6 @@ urlpatterns = [
     url(r'^send/$', views.SendView.as_view(), name='send'),
     url(r'^settings/$', views.SettingsView.as_view(), name='settings'),
     url(r'^update/$', views.SettingsUpdateView.as_view(), name='update'),
+    url(r'^delivery/(?P<announcement_id>[0-9]+)/$', views.DeliveryStatusView.as_view(), name='delivery_status'),
+    url(r'^delivery/(?P<announcement_id>[0-9]+)/resume/$', views.ResumeDeliveryView.as_view(), name='delivery_resume'),
 ]
@@ -1,23 +1,20 @@
 # -*- coding: utf-8 -*-
 
 from django.contrib.auth.mixins import UserPassesTestMixin
+from django.core.exceptions import PermissionDenied
 from django.core.urlresolvers import reverse_lazy
-from django.shortcuts import render, redirect
-from django.views.generic import UpdateView, TemplateView, FormView
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.views.generic import UpdateView, TemplateView, FormView, View
 
 from admin.rdm.utils import RdmPermissionMixin
+from admin.rdm_announcement import tasks
 from admin.rdm_announcement.forms import PreviewForm, SendForm, SettingsForm
 
-from osf.models.rdm_announcement import RdmAnnouncementOption, RdmFcmDevice
+from osf.models.rdm_announcement import RdmAnnouncement, RdmAnnouncementOption
 from osf.models.user import OSFUser
-from django.core.mail import EmailMessage
-from website.settings import SUPPORT_EMAIL
-from admin.base.settings import FCM_SETTINGS
-from admin.base.settings import EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER, EMAIL_HOST_PASSWORD, EMAIL_USE_TLS, ANNOUNCEMENT_EMAIL_FROM  # noqa
-from redminelib import Redmine
-from pyfcm import FCMNotification
 import facebook
-from urlparse import urlparse
 import tweepy
 
 class RdmAnnouncementPermissionMixin(RdmPermissionMixin):
@@ -190,11 +187,19 @@ class SendView(RdmAnnouncementPermissionMixin, UserPassesTestMixin, FormView):
         login_user_id = self.request.user.id
         form = SendForm(request.POST)
         if form.is_valid():
-            ret = self.send(form)
             data = form.cleaned_data
+            if data['announcement_type'] in tasks.QUEUED_TYPES:
+                ret = self.queue_delivery(form)
+                if ret['is_success']:
+                    msg = 'Queued for delivery.'
+                else:
+                    msg = ret['error']
+                return render(request, 'rdm_announcement/send.html', {'msg': msg, 'data': data})
+            ret = self.send(form)
             if ret['is_success']:
                 temp = form.save(commit=False)
                 temp.user_id = login_user_id
+                temp.status = RdmAnnouncement.STATUS_SENT
                 temp.save()
                 msg = 'Send successfully!'
             else:
@@ -213,50 +218,15 @@ class SendView(RdmAnnouncementPermissionMixin, UserPassesTestMixin, FormView):
             option = RdmAnnouncementOption.objects.get(user_id=login_user_id)
         else:
             option = RdmAnnouncementOption.objects.create()
-        if announcement_type == 'Email':
-            ret = self.send_email(data)
-        elif announcement_type == 'SNS (Twitter)':
+        # Email and push notification are delivered by queue_delivery()
+        if announcement_type == 'SNS (Twitter)':
             ret = self.send_twitter(data, option)
-        elif announcement_type == 'SNS (Facebook)':
-            ret = self.send_facebook(data, option)
         else:
-            ret = self.push_notification(data)
+            ret = self.send_facebook(data, option)
         if ret['is_success'] and getattr(option, 'redmine_api_url') and getattr(option, 'redmine_api_key'):
             if option.redmine_api_url and option.redmine_api_key:
                 ret = self.send_redmine(data, option)
         return ret
-    # Email
-    def send_email(self, data):
-        ret = {'is_success': True, 'error': ''}
-        now_user = self.request.user
-        to_list = []
-        if self.is_super_admin:
-            all_users = OSFUser.objects.all()
-            for user in all_users:
-                if user.is_active and user.is_registered:
-                    to_list.append(user.username)
-        elif self.is_admin:
-            now_institutions_id = list(now_user.affiliated_institutions.all().values_list('pk', flat=True))
-            qs = OSFUser.objects.filter(affiliated_institutions__in=now_institutions_id).distinct().values_list('username', flat=True)
-            to_list = list(qs)
-        else:
-            ret['is_success'] = False
-            return ret
-        try:
-            email = EmailMessage(
-                subject=data['title'],
-                body=data['body'],
-                from_email=ANNOUNCEMENT_EMAIL_FROM,
-                to=[SUPPORT_EMAIL or now_user.username],
-                bcc=to_list
-            )
-            email.send(fail_silently=False)
-        except Exception as e:
-            ret['is_success'] = False
-            ret['error'] = 'Email error: ' + str(e)
-        finally:
-            return ret
-
     # SNS (Twitter)
     def send_twitter(self, data, option):
         ret = {'is_success': True, 'error': ''}
@@ -291,65 +261,66 @@ class SendView(RdmAnnouncementPermissionMixin, UserPassesTestMixin, FormView):
         finally:
             return ret
 
-    # Push notification
-    def push_notification(self, data):
+    # Redmine
+    def send_redmine(self, data, option):
+        return tasks.send_redmine(data, option)
+
+    # Email and push notification, delivered by a background job
+    def queue_delivery(self, form):
         ret = {'is_success': True, 'error': ''}
-        now_user = self.request.user
-        to_list = []
         if self.is_super_admin:
-            all_users_id = list(OSFUser.objects.all().values_list('pk', flat=True))
-            all_tokens = RdmFcmDevice.objects.filter(user_id__in=all_users_id).distinct().values_list(
-                'device_token', flat=True)
-            to_list = list(all_tokens)
+            institutions = None  # all users
         elif self.is_admin:
-            now_institutions_id = list(now_user.affiliated_institutions.all().values_list('pk', flat=True))
-            all_institution_users_id = list(OSFUser.objects.filter(affiliated_institutions__in=now_institutions_id).distinct().values_list(
-                'pk', flat=True))
-            all_institution_tokens = RdmFcmDevice.objects.filter(user_id__in=all_institution_users_id).distinct().values_list(
-                'device_token', flat=True)
-            to_list = list(all_institution_tokens)
+            institutions = list(self.request.user.affiliated_institutions.all().values_list('pk', flat=True))
         else:
             ret['is_success'] = False
             return ret
-        try:
-            api_key = FCM_SETTINGS.get('FCM_SERVER_KEY')
-            FCMNotification(api_key=api_key)
-            push_service = FCMNotification(api_key=api_key)
-            registration_ids = list(set(to_list))  # Remove duplicates
-            message_title = data['title']
-            message_body = data['body']
-            push_service.notify_multiple_devices(registration_ids=registration_ids, message_title=message_title,
-                                                 message_body=message_body)
-        except Exception as e:
-            ret['is_success'] = False
-            ret['error'] = 'Push notification error: ' + str(e)
-        finally:
-            return ret
-
-    # Redmine
-    def send_redmine(self, data, option):
-        ret = {'is_success': True, 'error': ''}
-        try:
-            api_url = getattr(option, 'redmine_api_url')
-            api_key = getattr(option, 'redmine_api_key')
-            url_info = urlparse(api_url)
-            redmine_url = url_info.scheme + '://' + url_info.netloc
-            project_identifier = url_info.path.split('/')[2]
-            redmine = Redmine(redmine_url, key=api_key, raise_attr_exception=('Project', 'Issue'))
-            issue = redmine.issue.new()
-            all_status_id = list(redmine.issue_status.all().values_list('id', flat=True))
-            all_priority_id = list(redmine.enumeration.filter(resource='issue_priorities').values_list('id', flat=True))
-            issue.project_id = project_identifier
-            issue.subject = '[{}] {}'.format(data['announcement_type'], data['title'])
-            issue.description = data['body']
-            issue.status_id = all_status_id[0]
-            issue.priority_id = all_priority_id[0]
-            issue.save()
-        except Exception as e:
-            ret['is_success'] = False
-            ret['error'] = 'Redmine error: ' + str(e)
-        finally:
-            return ret
+        announcement = form.save(commit=False)
+        announcement.user_id = self.request.user.id
+        announcement.recipient_institutions = institutions
+        announcement.status = RdmAnnouncement.STATUS_QUEUED
+        announcement.save()
+        transaction.on_commit(lambda: tasks.deliver_announcement.delay(announcement.id))
+        return ret
 
     def get(self, request, *args, **kwargs):
         return redirect(reverse_lazy('announcement:index'))
+
+
+class DeliveryMixin(RdmAnnouncementPermissionMixin, UserPassesTestMixin):
+    raise_exception = True
+
+    def test_func(self):
+        """check user permissions"""
+        return self.has_auth
+
+    def get_announcement(self):
+        announcement = get_object_or_404(RdmAnnouncement, id=self.kwargs['announcement_id'])
+        if not self.is_super_admin and announcement.user_id != self.request.user.id:
+            raise PermissionDenied
+        return announcement
+
+    def delivery_status(self, announcement):
+        return {
+            'id': announcement.id,
+            'announcement_type': announcement.announcement_type,
+            'status': announcement.status,
+            'sent_count': announcement.sent_count,
+            'error': announcement.error,
+            'date_sent': announcement.date_sent,
+            'date_completed': announcement.date_completed,
+        }
+
+class DeliveryStatusView(DeliveryMixin, View):
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(self.delivery_status(self.get_announcement()))
+
+class ResumeDeliveryView(DeliveryMixin, View):
+    def post(self, request, *args, **kwargs):
+        announcement = self.get_announcement()
+        if announcement.status != RdmAnnouncement.STATUS_FAILED:
+            return JsonResponse(self.delivery_status(announcement), status=400)
+        announcement.status = RdmAnnouncement.STATUS_QUEUED
+        announcement.save(update_fields=['status'])
+        transaction.on_commit(lambda: tasks.deliver_announcement.delay(announcement.id))
+        return JsonResponse(self.delivery_status(announcement))
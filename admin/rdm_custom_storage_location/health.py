@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Health checks of the institutional storages.
+
+Every Region with an institutional storage is probed concurrently with the
+credentials saved by the admin, and each probe is bounded by
+STORAGE_HEALTH_CHECK_TIMEOUT. Results are kept as RegionHealthCheck rows,
+which serve both as the recent result (see Region.is_known_down) and as the
+latency and availability history of the region.
+"""
+import datetime
+import httplib
+import logging
+import threading
+import time
+
+from boxsdk import Client as BoxClient, OAuth2
+from django.db import connection
+from django.utils import timezone
+
+from addons.base.utils import run_in_threads
+from addons.box import settings as box_settings
+from addons.googledrive.client import GoogleDriveClient
+from addons.osfstorage.models import Region, RegionHealthCheck
+from addons.osfstorage.settings import DEFAULT_REGION_ID
+from admin.rdm_custom_storage_location import utils
+from osf.models import Institution
+from website import settings as osf_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _result(test_connection_result):
+    message, status = test_connection_result
+    return status == httplib.OK, message.get('message', '')
+
+def _probe_s3(region, credentials, settings):
+    return _result(utils.test_s3_connection(
+        credentials['access_key'], credentials['secret_key'], settings['bucket']))
+
+def _probe_s3compat(region, credentials, settings):
+    return _result(utils.test_s3compat_connection(
+        credentials['host'], credentials['access_key'], credentials['secret_key'],
+        settings['bucket']))
+
+def _probe_swift(region, credentials, settings):
+    return _result(utils.test_swift_connection(
+        credentials['auth_version'], credentials['auth_url'],
+        credentials['username'], credentials['password'],
+        credentials['tenant_name'], credentials['user_domain_name'],
+        credentials['project_domain_name'], settings['container']))
+
+def _probe_owncloud(region, credentials, settings):
+    return _result(utils.test_owncloud_connection(
+        credentials['host'], credentials['username'], credentials['password'],
+        settings['folder'], settings['provider']))
+
+def _probe_box(region, credentials, settings):
+    oauth = OAuth2(client_id=box_settings.BOX_KEY,
+                   client_secret=box_settings.BOX_SECRET,
+                   access_token=credentials['token'])
+    BoxClient(oauth).folder(settings['folder']).get()
+    return True, 'Credentials are valid'
+
+def _probe_googledrive(region, credentials, settings):
+    GoogleDriveClient(credentials['token']).folders(settings['folder']['id'])
+    return True, 'Credentials are valid'
+
+def _probe_dropboxbusiness(region, credentials, settings):
+    institution = Institution.objects.get(_id=region._id)
+    return _result(utils.test_dropboxbusiness_connection(institution))
+
+def _probe_nextcloudinstitutions(region, credentials, settings):
+    provider_name = 'nextcloudinstitutions'
+    institution = Institution.objects.get(_id=region._id)
+    data = utils.get_nextcloudinstitutions_credentials(institution)
+    return _result(utils.test_owncloud_connection(
+        data[provider_name + '_host'], data[provider_name + '_username'],
+        data[provider_name + '_password'], data[provider_name + '_folder'],
+        provider_name))
+
+def _probe_s3compatinstitutions(region, credentials, settings):
+    provider_name = 's3compatinstitutions'
+    institution = Institution.objects.get(_id=region._id)
+    data = utils.get_s3compatinstitutions_credentials(institution)
+    return _result(utils.test_s3compat_connection(
+        data[provider_name + '_endpoint_url'], data[provider_name + '_access_key'],
+        data[provider_name + '_secret_key'], data[provider_name + '_bucket']))
+
+PROBES = {
+    's3': _probe_s3,
+    's3compat': _probe_s3compat,
+    'swift': _probe_swift,
+    'owncloud': _probe_owncloud,
+    'nextcloud': _probe_owncloud,
+    'box': _probe_box,
+    'googledrive': _probe_googledrive,
+    'dropboxbusiness': _probe_dropboxbusiness,
+    'nextcloudinstitutions': _probe_nextcloudinstitutions,
+    's3compatinstitutions': _probe_s3compatinstitutions,
+}
+
+def region_provider(region):
+    return region.waterbutler_settings.get('storage', {}).get('provider')
+
+def probe_region(region, timeout=None):
+    """Probe the storage of region, returns (is_available, latency_ms, message).
+
+    The probe runs in its own thread so that a storage which does not respond
+    is reported as down after `timeout` seconds even if its client has no
+    timeout of its own.
+    """
+    timeout = timeout or osf_settings.STORAGE_HEALTH_CHECK_TIMEOUT
+    probe = PROBES[region_provider(region)]
+    result = {}
+
+    def run():
+        try:
+            result['value'] = probe(region,
+                                    region.waterbutler_credentials.get('storage', {}),
+                                    region.waterbutler_settings.get('storage', {}))
+        except Exception as e:
+            result['value'] = (False, u'{}: {}'.format(type(e).__name__, e))
+        finally:
+            connection.close()
+
+    started = time.time()
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+    latency_ms = int((time.time() - started) * 1000)
+    if 'value' not in result:
+        return False, None, u'No response in {} seconds'.format(timeout)
+    is_available, message = result['value']
+    return is_available, latency_ms, message
+
+def regions_to_check():
+    """Regions of institutional storages which can be probed."""
+    regions = Region.objects.exclude(_id=DEFAULT_REGION_ID)
+    return [region for region in regions if region_provider(region) in PROBES]
+
+def check_all_regions(regions=None, max_workers=None, timeout=None):
+    """Probe the regions concurrently and store the results.
+
+    Returns the list of the created RegionHealthCheck.
+    """
+    if regions is None:
+        regions = regions_to_check()
+    results = []
+
+    def check(region):
+        is_available, latency_ms, message = probe_region(region, timeout=timeout)
+        if not is_available:
+            logger.warning(u'Storage of region {} ({}) is down: {}'.format(
+                region._id, region_provider(region), message))
+        results.append(RegionHealthCheck.objects.create(
+            region=region, is_available=is_available,
+            latency_ms=latency_ms, message=message))
+
+    run_in_threads(check, list(regions),
+                   max_workers or osf_settings.STORAGE_HEALTH_CHECK_MAX_WORKERS)
+
+    expired = timezone.now() - datetime.timedelta(days=osf_settings.STORAGE_HEALTH_CHECK_HISTORY_DAYS)
+    RegionHealthCheck.objects.filter(checked_at__lt=expired).delete()
+    return results
+
+def serialize_history(region, limit=100):
+    checks = list(region.health_checks.order_by('-checked_at', '-id')[:limit])
+    available = [c for c in checks if c.is_available]
+    latencies = [c.latency_ms for c in available if c.latency_ms is not None]
+    return {
+        'region': region._id,
+        'provider': region_provider(region),
+        'is_known_down': region.is_known_down,
+        'availability': float(len(available)) / len(checks) if checks else None,
+        'average_latency_ms': sum(latencies) / len(latencies) if latencies else None,
+        'history': [{
+            'checked_at': c.checked_at.isoformat(),
+            'is_available': c.is_available,
+            'latency_ms': c.latency_ms,
+            'message': c.message,
+        } for c in checks],
+    }
@@ -12,4 +12,7 @@ urlpatterns = [
     url(r'^fetch_temporary_token/$', views.FetchTemporaryTokenView.as_view(), name='fetch_temporary_token'),
     url(r'^remove_auth_data_temporary/$', views.RemoveTemporaryAuthData.as_view(), name='remove_auth_data_temporary'),
     url(r'^usermap/$', views.UserMapView.as_view(), name='usermap'),
+    url(r'^sync_status/$', views.SyncStatusView.as_view(), name='sync_status'),
+    url(r'^storage_health/$', views.StorageHealthView.as_view(), name='storage_health'),
+    url(r'^storage_health_check/(?P<access_token>-?\w+)/$', views.storage_health_check, name='storage_health_check'),
 ]
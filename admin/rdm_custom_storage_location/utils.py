@@ -31,6 +31,7 @@ from addons.s3compatinstitutions import settings as s3compatinstitutions_setting
 from addons.base.institutions_utils import (KEYNAME_BASE_FOLDER,
                                             KEYNAME_USERMAP,
                                             KEYNAME_USERMAP_TMP,
+                                            KEYNAME_SYNC_STATUS,
                                             sync_all)
 from framework.exceptions import HTTPError
 from website import settings as osf_settings
@@ -768,7 +769,7 @@ def save_basic_storage_institutions_credentials_common(
     external_util.remove_region_external_account(region)
 
     save_usermap_from_tmp(provider_name, institution)
-    sync_all(institution._id, target_addons=[provider_name])
+    sync_all(institution._id, target_addons=[provider_name], force=True)
 
     return ({
         'message': 'Saved credentials successfully!!'
@@ -895,6 +896,13 @@ def get_usermap(provider_name, institution):
         return None
     return rdm_addon_option.extended.get(KEYNAME_USERMAP)
 
+def get_sync_status(institution, provider_name):
+    rdm_addon_option = get_rdm_addon_option(institution.id, provider_name,
+                                            create=False)
+    if not rdm_addon_option or not rdm_addon_option.extended:
+        return {}
+    return rdm_addon_option.extended.get(KEYNAME_SYNC_STATUS) or {}
+
 def save_usermap_to_tmp(provider_name, institution, usermap):
     rdm_addon_option = get_rdm_addon_option(institution.id, provider_name)
     rdm_addon_option.extended[KEYNAME_USERMAP_TMP] = usermap
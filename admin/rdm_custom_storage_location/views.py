@@ -14,7 +14,7 @@ import logging
 
 from addons.osfstorage.models import Region
 from admin.rdm.utils import RdmPermissionMixin
-from admin.rdm_custom_storage_location import utils
+from admin.rdm_custom_storage_location import health, utils
 from osf.models import Institution, OSFUser
 from osf.models.external import ExternalAccountTemporary
 from scripts import refresh_addon_tokens
@@ -317,6 +317,21 @@ class FetchCredentialsView(InstitutionalStorageBaseView, View):
         return self._common(request, request.GET)
 
 
+class SyncStatusView(InstitutionalStorageBaseView, View):
+    """ Progress of the synchronization of projects to the institutional storage """
+    def get(self, request):
+        provider_short_name = request.GET.get('provider_short_name')
+        if not provider_short_name:
+            return JsonResponse({
+                'message': 'Provider is missing.'
+            }, status=httplib.BAD_REQUEST)
+
+        institution = request.user.affiliated_institutions.first()
+        return JsonResponse(
+            utils.get_sync_status(institution, provider_short_name),
+            status=httplib.OK)
+
+
 class FetchTemporaryTokenView(InstitutionalStorageBaseView, View):
     def post(self, request):
         data = json.loads(request.body)
@@ -362,6 +377,39 @@ def external_acc_update(request, access_token):
     return HttpResponse('Done')
 
 
+def storage_health_check(request, access_token):
+    if hashlib.sha512(SITE_KEY).hexdigest() != access_token.lower():
+        return HttpResponse(
+            json.dumps({'state': 'fail', 'error': 'access forbidden'}),
+            content_type='application/json',
+        )
+
+    results = health.check_all_regions()
+    return JsonResponse({
+        'checked': len(results),
+        'down': [check.region._id for check in results if not check.is_available],
+    }, status=httplib.OK)
+
+
+class StorageHealthView(InstitutionalStorageBaseView, View):
+    """ Availability and latency history of the institutional storage """
+    def _region(self, request):
+        institution = request.user.affiliated_institutions.first()
+        region = Region.objects.filter(_id=institution._id).first()
+        if region is None or health.region_provider(region) not in health.PROBES:
+            raise Http404
+        return region
+
+    def get(self, request):
+        return JsonResponse(health.serialize_history(self._region(request)),
+                            status=httplib.OK)
+
+    def post(self, request):
+        region = self._region(request)
+        health.check_all_regions(regions=[region])
+        return JsonResponse(health.serialize_history(region), status=httplib.OK)
+
+
 def to_bool(val):
     return val.lower() in ['true']
 
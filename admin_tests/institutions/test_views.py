@@ -445,6 +445,35 @@ class TestGetUserListWithQuotaSorted(AdminTestCase):
         result = map(itemgetter('ratio'), response.context_data['users'])
         nt.assert_equal(result, expected)
 
+    def test_paginated_by_database(self):
+        request = RequestFactory().get('/fake_path?order_by=quota&status=asc&page=2')
+        view = setup_user_view(
+            views.UserListByInstitutionID(),
+            request,
+            user=self.users[0],
+            institution_id=self.institution.id
+        )
+        view.paginate_by = 2
+        response = view.get(request)
+        nt.assert_equal(map(itemgetter('quota'), response.context_data['users']), [200])
+        nt.assert_equal(response.context_data['page'].paginator.count, 3)
+
+    def test_export_csv(self):
+        request = RequestFactory().get('/fake_path?order_by=quota&status=desc')
+        view = setup_user_view(
+            views.UserListByInstitutionIDCSV(),
+            request,
+            user=self.users[0],
+            institution_id=self.institution.id
+        )
+        response = view.get(request)
+        nt.assert_equal(response['Content-Type'], 'text/csv')
+        rows = ''.join(response.streaming_content).splitlines()
+        nt.assert_equal(rows[0], 'id,fullname,username,ratio,usage,remaining,quota')
+        nt.assert_equal(len(rows), 4)
+        nt.assert_equal([row.split(',')[-1] for row in rows[1:]], ['200', '100', '10'])
+        nt.assert_equal(rows[1].split(',')[0], self.users[1]._id)
+
 class TestStatisticalStatusDefaultStorage(AdminTestCase):
     def setUp(self):
         self.institution = InstitutionFactory()
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import mock
 from nose import tools as nt
 
 from django.test import RequestFactory
@@ -6,9 +7,9 @@ from tests.base import AdminTestCase
 from osf_tests.factories import AuthUserFactory
 
 
-from admin.rdm_announcement.forms import PreviewForm, SettingsForm
-from osf.models.rdm_announcement import RdmAnnouncementOption
-from admin.rdm_announcement import views
+from admin.rdm_announcement.forms import PreviewForm, SendForm, SettingsForm
+from osf.models.rdm_announcement import RdmAnnouncement, RdmAnnouncementOption
+from admin.rdm_announcement import tasks, views
 from admin_tests.utilities import setup_user_view
 from admin_tests.rdm_announcement.test_forms import data
 
@@ -371,3 +372,65 @@ class TestSendView(AdminTestCase):
         self.request.user.is_superuser = True
         self.request.user.is_staff = True
         nt.assert_equal(self.view.test_func(), False)
+
+    @mock.patch('admin.rdm_announcement.views.transaction.on_commit', side_effect=lambda func: func())
+    @mock.patch('admin.rdm_announcement.tasks.deliver_announcement.delay')
+    def test_queue_delivery(self, mock_delay, mock_on_commit):
+        self.request.user.is_superuser = True
+        form = SendForm(data)
+        nt.assert_true(form.is_valid())
+        ret = self.view.queue_delivery(form)
+        nt.assert_true(ret['is_success'])
+        announcement = RdmAnnouncement.objects.get(user_id=self.user.id)
+        nt.assert_equal(announcement.status, RdmAnnouncement.STATUS_QUEUED)
+        nt.assert_is_none(announcement.recipient_institutions)
+        mock_delay.assert_called_once_with(announcement.id)
+
+
+@mock.patch('admin.rdm_announcement.tasks.time.sleep')
+class TestDeliverAnnouncement(AdminTestCase):
+    def setUp(self):
+        super(TestDeliverAnnouncement, self).setUp()
+        self.sender = AuthUserFactory()
+        self.recipients = [AuthUserFactory() for _ in range(5)]
+        self.announcement = RdmAnnouncement.objects.create(
+            user=self.sender, title='title', body='body', announcement_type='Email')
+
+    def _bcc(self, mock_connection):
+        return [sorted(call[0][0][0].bcc) for call in mock_connection.return_value.send_messages.call_args_list]
+
+    @mock.patch('admin.rdm_announcement.tasks.admin_settings.ANNOUNCEMENT_EMAIL_BATCH_SIZE', 2)
+    @mock.patch('admin.rdm_announcement.tasks.get_connection')
+    def test_deliver_email_in_batches(self, mock_connection, mock_sleep):
+        mock_connection.return_value.send_messages.return_value = 1
+        tasks.deliver_announcement(self.announcement.id)
+        self.announcement.reload()
+        nt.assert_equal(self.announcement.status, RdmAnnouncement.STATUS_SENT)
+        nt.assert_true(self.announcement.is_success)
+        bcc = self._bcc(mock_connection)
+        nt.assert_true(all(len(b) <= 2 for b in bcc))
+        for user in self.recipients:
+            nt.assert_true(any(user.username in b for b in bcc))
+        nt.assert_equal(self.announcement.sent_count, sum(len(b) for b in bcc))
+        # one SMTP session for all batches
+        nt.assert_equal(mock_connection.return_value.open.call_count, 1)
+
+    @mock.patch('admin.rdm_announcement.tasks.admin_settings.ANNOUNCEMENT_EMAIL_BATCH_SIZE', 2)
+    @mock.patch('admin.rdm_announcement.tasks.get_connection')
+    def test_resume_failed_delivery(self, mock_connection, mock_sleep):
+        send_messages = mock_connection.return_value.send_messages
+        send_messages.side_effect = [1, Exception('SMTP error'), Exception('SMTP error'), Exception('SMTP error')]
+        tasks.deliver_announcement(self.announcement.id)
+        self.announcement.reload()
+        nt.assert_equal(self.announcement.status, RdmAnnouncement.STATUS_FAILED)
+        nt.assert_equal(self.announcement.sent_count, 2)
+        first = self._bcc(mock_connection)[0]
+
+        send_messages.reset_mock()
+        send_messages.side_effect = None
+        send_messages.return_value = 1
+        tasks.deliver_announcement(self.announcement.id)
+        self.announcement.reload()
+        nt.assert_equal(self.announcement.status, RdmAnnouncement.STATUS_SENT)
+        for bcc in self._bcc(mock_connection):
+            nt.assert_false(set(first) & set(bcc))
@@ -0,0 +1,74 @@
+from django.test import RequestFactory
+import httplib
+import json
+import mock
+import time
+from nose import tools as nt
+
+from admin.rdm_custom_storage_location import health, views
+from osf_tests.factories import (
+    AuthUserFactory,
+    InstitutionFactory,
+    RegionFactory,
+)
+from tests.base import AdminTestCase
+
+
+class TestStorageHealth(AdminTestCase):
+
+    def setUp(self):
+        super(TestStorageHealth, self).setUp()
+        self.institution = InstitutionFactory()
+        self.region = RegionFactory(
+            _id=self.institution._id,
+            waterbutler_credentials={'storage': {'access_key': 'a', 'secret_key': 's'}},
+            waterbutler_settings={'storage': {'provider': 's3', 'bucket': 'b'}},
+        )
+        self.user = AuthUserFactory()
+        self.user.affiliated_institutions.add(self.institution)
+        self.user.is_staff = True
+        self.user.save()
+
+    @mock.patch('admin.rdm_custom_storage_location.utils.test_s3_connection')
+    def test_check_available(self, mock_test):
+        mock_test.return_value = ({'message': 'Credentials are valid'}, httplib.OK)
+        checks = health.check_all_regions(regions=[self.region])
+        nt.assert_equal(len(checks), 1)
+        nt.assert_true(checks[0].is_available)
+        nt.assert_is_not_none(checks[0].latency_ms)
+        nt.assert_false(self.region.is_known_down)
+
+    @mock.patch('admin.rdm_custom_storage_location.utils.test_s3_connection')
+    def test_check_down(self, mock_test):
+        mock_test.return_value = ({'message': 'Invalid bucket.'}, httplib.BAD_REQUEST)
+        checks = health.check_all_regions(regions=[self.region])
+        nt.assert_false(checks[0].is_available)
+        nt.assert_equal(checks[0].message, 'Invalid bucket.')
+        nt.assert_true(self.region.is_known_down)
+
+    def test_probe_timeout(self):
+        with mock.patch.dict(health.PROBES, {'s3': lambda *args: time.sleep(5)}):
+            started = time.time()
+            is_available, latency_ms, message = health.probe_region(self.region, timeout=0.1)
+        nt.assert_less(time.time() - started, 2)
+        nt.assert_false(is_available)
+        nt.assert_in('No response', message)
+
+    @mock.patch('admin.rdm_custom_storage_location.utils.test_s3_connection')
+    def test_history_view(self, mock_test):
+        mock_test.side_effect = [
+            ({'message': 'Credentials are valid'}, httplib.OK),
+            ({'message': 'Invalid bucket.'}, httplib.BAD_REQUEST),
+        ]
+        health.check_all_regions(regions=[self.region])
+        health.check_all_regions(regions=[self.region])
+
+        request = RequestFactory().get('fake_path')
+        request.user = self.user
+        response = views.StorageHealthView.as_view()(request)
+        nt.assert_equal(response.status_code, httplib.OK)
+        data = json.loads(response.content)
+        nt.assert_equal(data['provider'], 's3')
+        nt.assert_true(data['is_known_down'])
+        nt.assert_equal(data['availability'], 0.5)
+        nt.assert_equal(len(data['history']), 2)
@@ -246,3 +246,38 @@ class TestPermissionFetchTemporaryToken(AdminTestCase):
         response = self.view_post({})
         self.assertEquals(response.status_code, 302)
         self.assertEquals(response._headers['location'][1], '/accounts/login/?next=/fake_path')
+
+
+class TestSyncStatusView(AdminTestCase):
+
+    def setUp(self):
+        super(TestSyncStatusView, self).setUp()
+        self.institution = InstitutionFactory()
+        self.user = AuthUserFactory()
+        self.user.is_staff = True
+        self.user.affiliated_institutions.add(self.institution)
+        self.user.save()
+
+    def view_get(self, params):
+        request = RequestFactory().get('fake_path', params)
+        request.user = self.user
+        return views.SyncStatusView.as_view()(request)
+
+    def test_provider_missing(self):
+        response = self.view_get({})
+        nt.assert_equal(response.status_code, 400)
+
+    def test_no_status(self):
+        response = self.view_get({'provider_short_name': 'nextcloudinstitutions'})
+        nt.assert_equal(response.status_code, 200)
+        nt.assert_equal(json.loads(response.content), {})
+
+    def test_status(self):
+        from admin.rdm_addons.utils import get_rdm_addon_option
+        from addons.base.institutions_utils import KEYNAME_SYNC_STATUS
+        opt = get_rdm_addon_option(self.institution.id, 'nextcloudinstitutions')
+        opt.extended[KEYNAME_SYNC_STATUS] = {'state': 'running', 'total': 10, 'processed': 3}
+        opt.save()
+        response = self.view_get({'provider_short_name': 'nextcloudinstitutions'})
+        nt.assert_equal(response.status_code, 200)
+        nt.assert_equal(json.loads(response.content)['processed'], 3)
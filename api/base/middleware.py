@@ -5,6 +5,7 @@ import pstats
 import threading
 
 from django.conf import settings
+from django.db import connection
 from django.utils.deprecation import MiddlewareMixin
 from raven.contrib.django.raven_compat.models import sentry_exception_handler
 import corsheaders.middleware
@@ -13,6 +14,7 @@ from framework.postcommit_tasks.handlers import (
     postcommit_after_request,
     postcommit_before_request,
 )
+from framework.django.handlers import QUERY_COUNT_HEADER, query_count_before_request
 from framework.celery_tasks.handlers import (
     celery_before_request,
     celery_after_request,
@@ -108,6 +110,20 @@ class PostcommitTaskMiddleware(MiddlewareMixin):
         return response
 
 
+class QueryCountMiddleware(MiddlewareMixin):
+    """Add the number of SQL queries of the request in a X-Query-Count header.
+
+    Enabled by QUERY_COUNT_HEADER, for scripts/loadtest. Do not enable in production.
+    """
+    def process_request(self, request):
+        query_count_before_request()
+
+    def process_response(self, request, response):
+        response[QUERY_COUNT_HEADER] = str(len(connection.queries))
+        connection.force_debug_cursor = False
+        return response
+
+
 # Adapted from http://www.djangosnippets.org/snippets/186/
 # Original author: udfalkso
 # Modified by: Shwagroo Team and Gun.io
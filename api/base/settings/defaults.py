@@ -232,6 +232,9 @@ MIDDLEWARE = (
     'waffle.middleware.WaffleMiddleware',
 )
 
+if osf_settings.QUERY_COUNT_HEADER:
+    MIDDLEWARE = ('api.base.middleware.QueryCountMiddleware',) + MIDDLEWARE
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -320,6 +323,10 @@ ELASTICSEARCH_METRICS_DATE_FORMAT = '%Y'
 
 WAFFLE_CACHE_NAME = 'waffle_cache'
 STORAGE_USAGE_CACHE_NAME = 'storage_usage'
+MAPCORE_SYNC_CACHE_NAME = 'mapcore_sync'
+IQBRIMS_USER_SETTINGS_CACHE_NAME = 'iqbrims_user_settings'
+WEKO_CACHE_NAME = 'weko'
+WATERBUTLER_AUTH_CACHE_NAME = 'waterbutler_auth'
 
 
 CACHES = {
@@ -333,6 +340,42 @@ CACHES = {
     WAFFLE_CACHE_NAME: {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     },
+    # culled apart from the other caches
+    MAPCORE_SYNC_CACHE_NAME: {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'osf_mapcore_sync_cache_table',
+        'KEY_PREFIX': MAPCORE_SYNC_CACHE_NAME,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    # culled apart from the other caches
+    IQBRIMS_USER_SETTINGS_CACHE_NAME: {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'osf_iqbrims_user_settings_cache_table',
+        'KEY_PREFIX': IQBRIMS_USER_SETTINGS_CACHE_NAME,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # culled apart from the other caches
+    WEKO_CACHE_NAME: {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'osf_weko_cache_table',
+        'KEY_PREFIX': WEKO_CACHE_NAME,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # written on most file operations, culled apart from the other caches
+    WATERBUTLER_AUTH_CACHE_NAME: {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'osf_waterbutler_auth_cache_table',
+        'KEY_PREFIX': WATERBUTLER_AUTH_CACHE_NAME,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
 }
 
 ### NII extensions
@@ -1,7 +1,8 @@
 from datetime import datetime
-from collections import OrderedDict
+from collections import Mapping, OrderedDict
 
 from django.core.urlresolvers import resolve, reverse
+from django.db.models import Manager
 import furl
 import pytz
 import jsonschema
@@ -14,12 +15,14 @@ from website import settings
 from website.util import api_v2_url
 
 from addons.base.utils import get_mfr_url
+from addons.osfstorage.models import OsfStorageFileNode
 
 from api.base.serializers import (
     FileRelationshipField,
     format_relationship_links,
     IDField,
     JSONAPIListField,
+    JSONAPIListSerializer,
     JSONAPISerializer,
     Link,
     LinksField,
@@ -146,6 +149,16 @@ class FileNodeRelationshipField(RelationshipField):
         return super(FileNodeRelationshipField, self).to_representation(value)
 
 
+class FileListSerializer(JSONAPIListSerializer):
+    """Resolves the materialized paths of the listed osfstorage files in one query."""
+
+    def to_representation(self, data):
+        if not isinstance(data, Mapping):
+            data = list(data.all() if isinstance(data, Manager) else data)
+            OsfStorageFileNode.resolve_materialized_paths(data)
+        return super(FileListSerializer, self).to_representation(data)
+
+
 class BaseFileSerializer(JSONAPISerializer):
     filterable_fields = frozenset([
         'id',
@@ -234,6 +247,12 @@ class BaseFileSerializer(JSONAPISerializer):
     class Meta:
         type_ = 'files'
 
+    # overrides JSONAPISerializer
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        kwargs['child'] = cls(*args, **kwargs)
+        return FileListSerializer(*args, **kwargs)
+
     def get_size(self, obj):
         if obj.versions.exists():
             self.size = obj.versions.first().size
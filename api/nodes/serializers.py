@@ -8,7 +8,7 @@ from api.base.exceptions import (
 )
 from api.base.serializers import (
     VersionedDateTimeField, HideIfRegistration, IDField,
-    JSONAPIRelationshipSerializer,
+    JSONAPIListSerializer, JSONAPIRelationshipSerializer,
     JSONAPISerializer, LinksField,
     NodeFileHyperLinkField, RelationshipField,
     ShowIfVersion, TargetTypeField, TypeField,
@@ -25,6 +25,7 @@ from api.taxonomies.serializers import TaxonomizableSerializerMixin
 from django.apps import apps
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from framework.auth.core import Auth
 from framework.exceptions import PermissionsError
 from osf.models import Tag
@@ -36,7 +37,7 @@ from osf.exceptions import NodeStateError
 from osf.models import (
     Comment, DraftRegistration, Institution,
     RegistrationSchema, AbstractNode, PrivateLink,
-    RegistrationProvider, OSFGroup,
+    RegistrationProvider, OSFGroup, OSFUser,
 )
 from osf.models.external import ExternalAccount
 from osf.models.licenses import NodeLicense
@@ -1183,6 +1184,63 @@ class NodeContributorsSerializer(JSONAPISerializer):
             return unclaimed_records.get('name', None)
 
 
+class NodeContributorsBulkCreateSerializer(JSONAPIListSerializer):
+    """
+    Adds the registered users of a bulk request to a node with a single AbstractNode.bulk_add_contributors,
+    the other requests (unregistered contributors, emails, indices) are created one by one.
+    """
+
+    def can_bulk_create(self, node, validated_data):
+        if not isinstance(node, AbstractNode):
+            return False
+        user_ids = [item.get('_id') for item in validated_data]
+        if len(set(user_ids)) != len(user_ids):
+            return False
+        return all(
+            item.get('_id') and not item.get('user', {}).get('email') and '_order' not in item
+            for item in validated_data
+        )
+
+    # overrides ListSerializer
+    def create(self, validated_data):
+        node = self.context['resource']
+        if not self.can_bulk_create(node, validated_data):
+            return super(NodeContributorsBulkCreateSerializer, self).create(validated_data)
+
+        auth = Auth(self.context['request'].user)
+        send_email = self.context['request'].GET.get('send_email') or self.context['default_email']
+        if send_email not in self.child.email_preferences:
+            raise exceptions.ValidationError(detail='{} is not a valid email preference.'.format(send_email))
+
+        user_ids = [item['_id'] for item in validated_data]
+        users = {user._id: user for user in OSFUser.objects.filter(guids___id__in=user_ids)}
+        for user_id in user_ids:
+            if user_id not in users:
+                raise exceptions.NotFound(detail='User with id {} was not found.'.format(user_id))
+        if not all(user.is_registered for user in users.values()):
+            return super(NodeContributorsBulkCreateSerializer, self).create(validated_data)
+        existing = node.contributor_set.filter(user__in=users.values()).select_related('user').first()
+        if existing:
+            raise exceptions.ValidationError(detail='{} is already a contributor.'.format(existing.user.fullname))
+
+        try:
+            node.bulk_add_contributors([{
+                'user': users[item['_id']],
+                'permissions': self.child.get_proposed_permissions(item),
+                'visible': item.get('bibliographic'),
+            } for item in validated_data], auth=auth, send_email=send_email, save=True)
+        except ValidationError as e:
+            raise exceptions.ValidationError(detail=e.messages[0])
+
+        auth.user.email_last_sent = timezone.now()
+        auth.user.save()
+        contributors = {
+            contributor.user._id: contributor
+            for contributor in node.contributor_set.filter(user__in=users.values()).select_related('user')
+        }
+        return [contributors[user_id] for user_id in user_ids]
+
+
 class NodeContributorsCreateSerializer(NodeContributorsSerializer):
     """
     Overrides NodeContributorsSerializer to add email, full_name, send_email, and non-required index and users field.
@@ -1202,6 +1260,12 @@ class NodeContributorsCreateSerializer(NodeContributorsSerializer):
 
     email_preferences = ['default', 'false']
 
+    # overrides JSONAPISerializer
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        kwargs['child'] = cls(*args, **kwargs)
+        return NodeContributorsBulkCreateSerializer(*args, **kwargs)
+
     def get_proposed_permissions(self, validated_data):
         return validated_data.get('permission') or osf_permissions.DEFAULT_CONTRIBUTOR_PERMISSIONS
 
@@ -119,6 +119,7 @@ from api.users.serializers import UserSerializer
 from api.wikis.serializers import NodeWikiSerializer
 from framework.exceptions import HTTPError, PermissionsError
 from framework.auth.oauth_scopes import CoreScopes
+from osf.exceptions import NodeStateError
 from osf.features import OSF_GROUPS
 from osf.models import AbstractNode
 from osf.models import (Node, PrivateLink, Institution, Comment, DraftRegistration, Registration, )
@@ -463,6 +464,17 @@ class NodeContributorsList(BaseContributorList, bulk_views.BulkUpdateJSONAPIView
             queryset = queryset.filter(user__guids___id__in=contrib_ids)
         return queryset
 
+    # Overrides BulkDestroyJSONAPIView
+    def perform_bulk_destroy(self, resource_object_list):
+        auth = get_user_auth(self.request)
+        node = self.get_resource()
+        if node.contributor_set.filter(user__in=resource_object_list).count() != len(resource_object_list):
+            raise NotFound('User cannot be found in the list of contributors.')
+        try:
+            node.bulk_remove_contributors(resource_object_list, auth, save=True)
+        except NodeStateError as e:
+            raise ValidationError(e.args[0])
+
     # Overrides BulkDestroyJSONAPIView
     def perform_destroy(self, instance):
         auth = get_user_auth(self.request)
@@ -0,0 +1,81 @@
+import contextlib
+import warnings
+
+import pytest
+
+from api_tests.benchmarks import utils
+
+recorder = utils.BenchmarkRecorder()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks')
+    group.addoption('--benchmark-update', action='store_true', dest='benchmark_update', default=False,
+                    help='Store the results as the new baselines instead of checking them')
+    group.addoption('--benchmark-threshold', type=int, dest='benchmark_threshold',
+                    default=utils.DEFAULT_THRESHOLD,
+                    help='Growth of the query counts allowed over the baselines, in percent')
+    group.addoption('--benchmark-history', dest='benchmark_history', default=utils.HISTORY_PATH,
+                    help='File the results of the runs are appended to, for the trend report')
+
+
+def _is_worker(config):
+    # pytest-xdist workers; wall times are only meaningful when run serially
+    return hasattr(config, 'slaveinput')
+
+
+@pytest.fixture(scope='session')
+def baselines():
+    return utils.load_baselines()
+
+
+@pytest.fixture()
+def benchmark(request, baselines):
+    """Measure the SQL queries and the wall time of a block::
+
+        with benchmark('nodes.list'):
+            app.get(url, auth=user.auth)
+
+    Fails when the query count grows beyond the threshold over the baseline,
+    warns when the benchmark has no baseline.
+    """
+    config = request.config
+    update = config.getoption('benchmark_update', default=False)
+    threshold = config.getoption('benchmark_threshold', default=utils.DEFAULT_THRESHOLD)
+
+    @contextlib.contextmanager
+    def measure(name):
+        with recorder.measure(name):
+            yield
+        if update:
+            return
+        if name not in baselines:
+            warnings.warn(utils.missing_baseline(name))
+            return
+        message = utils.check(name, recorder.results[name], baselines, threshold)
+        if message:
+            pytest.fail(message)
+    return measure
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    if not recorder.results or _is_worker(config):
+        return
+    if config.getoption('benchmark_update', default=False):
+        utils.save_baselines(recorder.results)
+    history_path = config.getoption('benchmark_history', default=utils.HISTORY_PATH)
+    config._benchmark_history = utils.load_history(history_path)
+    utils.append_history(recorder.results, history_path)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not recorder.results:
+        return
+    terminalreporter.section('benchmarks')
+    lines = utils.trend_report(
+        recorder.results, utils.load_baselines(),
+        getattr(terminalreporter.config, '_benchmark_history', []),
+    )
+    for line in lines:
+        terminalreporter.write_line(line)
@@ -0,0 +1,70 @@
+import pytest
+
+from api.base.settings.defaults import API_BASE
+from framework.auth.core import Auth
+from osf.utils import permissions
+from osf_tests.factories import AuthUserFactory, NodeFactory, ProjectFactory
+
+NODES = 10
+CONTRIBUTORS = 10
+
+
+@pytest.fixture()
+def user():
+    return AuthUserFactory()
+
+@pytest.fixture()
+def projects(user):
+    projects = [ProjectFactory(creator=user, is_public=True) for _ in range(NODES)]
+    for project in projects:
+        NodeFactory(creator=user, parent=project)
+    return projects
+
+@pytest.fixture()
+def project_with_contributors(user):
+    project = ProjectFactory(creator=user)
+    for _ in range(CONTRIBUTORS):
+        project.add_contributor(AuthUserFactory(), permissions=permissions.WRITE, auth=Auth(user), save=False)
+    project.save()
+    return project
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('projects')
+class TestNodeEndpoints:
+
+    def test_node_list(self, app, user, benchmark):
+        with benchmark('nodes.list'):
+            res = app.get('/{}nodes/?page[size]={}'.format(API_BASE, NODES * 2), auth=user.auth)
+        assert len(res.json['data']) == NODES * 2
+
+    def test_node_list_embed_contributors(self, app, user, benchmark):
+        with benchmark('nodes.list.embed_contributors'):
+            res = app.get('/{}nodes/?embed=contributors&page[size]={}'.format(API_BASE, NODES * 2), auth=user.auth)
+        assert len(res.json['data']) == NODES * 2
+
+    def test_node_detail(self, app, user, projects, benchmark):
+        with benchmark('nodes.detail'):
+            app.get('/{}nodes/{}/'.format(API_BASE, projects[0]._id), auth=user.auth)
+
+    def test_node_children(self, app, user, projects, benchmark):
+        with benchmark('nodes.children'):
+            app.get('/{}nodes/{}/children/'.format(API_BASE, projects[0]._id), auth=user.auth)
+
+    def test_user_nodes(self, app, user, benchmark):
+        with benchmark('users.nodes'):
+            app.get('/{}users/me/nodes/'.format(API_BASE), auth=user.auth)
+
+
+@pytest.mark.django_db
+class TestContributorEndpoints:
+
+    def test_node_contributors_list(self, app, user, project_with_contributors, benchmark):
+        with benchmark('nodes.contributors.list'):
+            res = app.get('/{}nodes/{}/contributors/?page[size]={}'.format(
+                API_BASE, project_with_contributors._id, CONTRIBUTORS + 1), auth=user.auth)
+        assert len(res.json['data']) == CONTRIBUTORS + 1
+
+    def test_node_contributors_list_embed_users(self, app, user, project_with_contributors, benchmark):
+        with benchmark('nodes.contributors.list.embed_users'):
+            app.get('/{}nodes/{}/contributors/?embed=users'.format(API_BASE, project_with_contributors._id), auth=user.auth)
@@ -0,0 +1,110 @@
+import time
+
+import mock
+import pytest
+from webtest_plus import TestApp
+
+from framework.auth import signing
+from framework.auth.core import Auth
+from osf.models import NodeLog
+from osf.utils import permissions
+from osf_tests.factories import AuthUserFactory, NodeFactory, ProjectFactory
+from tests.base import get_default_metaschema, test_app
+from api_tests.utils import disconnected_from_listeners
+from website.project.signals import after_create_registration
+
+CONTRIBUTORS = 10
+COMPONENTS = 20
+LOGS_PER_NODE = 200
+
+
+@pytest.fixture()
+def user():
+    return AuthUserFactory()
+
+@pytest.fixture()
+def project(user):
+    project = ProjectFactory(creator=user)
+    NodeFactory(creator=user, parent=project)
+    return project
+
+
+@pytest.mark.django_db
+class TestNodeOperations:
+
+    def test_fork(self, user, project, benchmark):
+        with benchmark('node.fork'):
+            project.fork_node(auth=Auth(user))
+
+    def test_fork_tree(self, user, benchmark):
+        project = ProjectFactory(creator=user)
+        nodes = [project] + [NodeFactory(creator=user, parent=project) for _ in range(COMPONENTS)]
+        for node in nodes:
+            for _ in range(LOGS_PER_NODE):
+                node.add_log(NodeLog.EDITED_DESCRIPTION, params={'node': node._id}, auth=Auth(user), save=False)
+        with benchmark('node.fork_tree'):
+            project.fork_node(auth=Auth(user))
+
+    def test_add_log(self, user, benchmark):
+        project = ProjectFactory(creator=user)
+        for _ in range(LOGS_PER_NODE):
+            project.add_log(NodeLog.EDITED_DESCRIPTION, params={'node': project._id}, auth=Auth(user), save=False)
+        with benchmark('node.add_log'):
+            project.add_log(NodeLog.EDITED_DESCRIPTION, params={'node': project._id}, auth=Auth(user))
+
+    def test_register(self, user, project, benchmark):
+        schema = get_default_metaschema()
+        with disconnected_from_listeners(after_create_registration):
+            with benchmark('node.register'):
+                project.register_node(schema, Auth(user), '', None)
+
+    def test_add_contributor(self, user, project, benchmark):
+        contributor = AuthUserFactory()
+        with benchmark('node.add_contributor'):
+            project.add_contributor(contributor, permissions=permissions.WRITE, auth=Auth(user), save=True)
+
+    def test_add_contributors(self, user, project, benchmark):
+        contributors = [{
+            'user': AuthUserFactory(),
+            'permissions': permissions.WRITE,
+            'visible': True,
+        } for _ in range(CONTRIBUTORS)]
+        with benchmark('node.add_contributors'):
+            project.add_contributors(contributors, auth=Auth(user), save=True)
+
+
+@pytest.mark.django_db
+class TestFileUploadCallback:
+
+    @pytest.fixture()
+    def flask_app(self):
+        return TestApp(test_app)
+
+    def build_payload(self, user, path):
+        message, signature = signing.default_signer.sign_payload({
+            'auth': {'id': user._id},
+            'action': 'create',
+            'provider': 'osfstorage',
+            'metadata': {
+                'provider': 'osfstorage',
+                'name': path,
+                'materialized': '/' + path,
+                'path': '/' + path,
+                'kind': 'file',
+                'size': 2345,
+                'created_utc': '',
+                'modified_utc': '',
+                'extra': {'version': '1'},
+            },
+            'time': time.time() + 1000,
+        })
+        return {'payload': message, 'signature': signature}
+
+    @mock.patch('addons.base.views.timestamp')
+    @mock.patch('website.notifications.events.files.FileAdded.perform')
+    def test_create_waterbutler_log(self, mock_perform, mock_timestamp, flask_app, user, project, benchmark):
+        url = '/api/v1/project/{}/waterbutler/logs/'.format(project._id)
+        payload = self.build_payload(user, 'benchmark.txt')
+        with benchmark('files.upload_callback'):
+            flask_app.put_json(url, payload, headers={'Content-Type': 'application/json'})
+        assert project.logs.count() > 1
@@ -0,0 +1,43 @@
+from api_tests.benchmarks import utils
+
+
+class TestBenchmarkUtils:
+
+    def test_check(self):
+        baselines = {'nodes.list': {'queries': 20, 'time': 50.0}}
+        assert utils.check('nodes.list', {'queries': 22, 'time': 500.0}, baselines) is None
+        assert utils.check('nodes.list', {'queries': 23, 'time': 50.0}, baselines)
+        assert utils.check('nodes.list', {'queries': 23, 'time': 50.0}, baselines, threshold=20) is None
+        # no baseline yet
+        assert utils.check('nodes.detail', {'queries': 1, 'time': 50.0}, baselines) is None
+        assert 'invoke test_benchmarks --update' in utils.missing_baseline('nodes.detail')
+
+    def test_allowed_queries(self):
+        assert utils.allowed_queries(0) == 0
+        assert utils.allowed_queries(5) == 6
+        assert utils.allowed_queries(30, threshold=0) == 30
+
+    def test_baselines_and_history(self, tmpdir):
+        baselines_path = str(tmpdir.join('baselines.json'))
+        history_path = str(tmpdir.join('history.jsonl'))
+        assert utils.load_baselines(baselines_path) == {}
+        assert utils.load_history(history_path) == []
+
+        utils.save_baselines({'a': {'queries': 1, 'time': 1.0}, 'b': {'queries': 2, 'time': 1.0}}, baselines_path)
+        utils.save_baselines({'a': {'queries': 3, 'time': 1.0}}, baselines_path)
+        assert utils.load_baselines(baselines_path) == {
+            'a': {'queries': 3, 'time': 1.0},
+            'b': {'queries': 2, 'time': 1.0},
+        }
+
+        for queries in range(7):
+            utils.append_history({'a': {'queries': queries, 'time': 1.0}}, history_path)
+        history = utils.load_history(history_path, limit=3)
+        assert [run['a']['queries'] for run in history] == [4, 5, 6]
+
+    def test_trend_report(self):
+        history = [{'a': {'queries': 3, 'time': 1.0}}, {}]
+        lines = utils.trend_report({'a': {'queries': 4, 'time': 2.0}}, {'a': {'queries': 3, 'time': 1.0}}, history)
+        assert len(lines) == 2
+        assert lines[1].startswith('a ')
+        assert lines[1].endswith('3 > - > 4')
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Query count and wall time benchmarks of the endpoints and of the model operations.
+
+A benchmark records the number of SQL queries and the wall time of a block of
+code (see the `benchmark` fixture of conftest.py). The query counts are
+compared with the baselines of baselines.json: a benchmark fails when its
+count grows by more than the threshold. A benchmark without a baseline only
+warns. Wall times depend on the machine, they are only reported. Each run is
+appended to the history, from which the trend report is made.
+"""
+import os
+import json
+import math
+import time
+import contextlib
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+HERE = os.path.dirname(__file__)
+BASELINES_PATH = os.path.join(HERE, 'baselines.json')
+HISTORY_PATH = os.path.join(HERE, 'history.jsonl')
+
+# Growth of the query counts allowed over the baselines, in percent
+DEFAULT_THRESHOLD = 10
+# Number of previous runs shown in the trend report
+TREND_LENGTH = 5
+
+
+class BenchmarkRecorder(object):
+    """Results of the benchmarks of a test session, name -> {'queries', 'time'}."""
+
+    def __init__(self):
+        self.results = {}
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        with CaptureQueriesContext(connection) as context:
+            start = time.time()
+            yield
+            elapsed = time.time() - start
+        self.results[name] = {
+            'queries': len(context),
+            'time': round(elapsed * 1000, 1),
+        }
+
+
+def load_baselines(path=BASELINES_PATH):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except IOError:
+        return {}
+
+def save_baselines(results, path=BASELINES_PATH):
+    """Replace the baselines of the benchmarks which ran, keep the others."""
+    baselines = load_baselines(path)
+    baselines.update(results)
+    with open(path, 'w') as fp:
+        json.dump(baselines, fp, indent=2, sort_keys=True)
+        fp.write('\n')
+
+def allowed_queries(baseline, threshold=DEFAULT_THRESHOLD):
+    return baseline + int(math.ceil(baseline * threshold / 100.0))
+
+def missing_baseline(name):
+    return '{}: no baseline, record it with `invoke test_benchmarks --update`'.format(name)
+
+def check(name, result, baselines, threshold=DEFAULT_THRESHOLD):
+    """:return str: why the benchmark regressed, None if it did not or if it has no baseline"""
+    baseline = baselines.get(name)
+    if baseline is None:
+        return None
+    if result['queries'] > allowed_queries(baseline['queries'], threshold):
+        return '{}: {} queries, the baseline is {} (+{}% allowed)'.format(
+            name, result['queries'], baseline['queries'], threshold)
+    return None
+
+
+def append_history(results, path=HISTORY_PATH):
+    with open(path, 'a') as fp:
+        fp.write(json.dumps({'date': timezone.now().isoformat(), 'results': results}, sort_keys=True))
+        fp.write('\n')
+
+def load_history(path=HISTORY_PATH, limit=TREND_LENGTH):
+    """:return list: the results of the last `limit` runs, oldest first"""
+    try:
+        with open(path) as fp:
+            lines = [line for line in fp if line.strip()]
+    except IOError:
+        return []
+    return [json.loads(line)['results'] for line in lines[-limit:]]
+
+
+def trend_report(results, baselines, history):
+    """:return list: lines of the report of the results of this run"""
+    row = u'{:<45} {:>8} {:>9} {:>10} {:>12}  {}'
+    lines = [row.format('benchmark', 'queries', 'baseline', 'time (ms)', 'base. (ms)', 'trend (queries)')]
+    for name in sorted(results):
+        result = results[name]
+        baseline = baselines.get(name, {})
+        trend = [str(run[name]['queries']) if name in run else '-' for run in history]
+        lines.append(row.format(
+            name, result['queries'], baseline.get('queries', '-'),
+            result['time'], baseline.get('time', '-'), ' > '.join(trend + [str(result['queries'])]),
+        ))
+    return lines
@@ -1607,6 +1607,23 @@ class TestNodeContributorBulkCreate(NodeCRUDTestCase):
         res = app.get(url_public, auth=user.auth)
         assert len(res.json['data']) == 2
 
+    def test_node_contributor_bulk_create_single_log(
+            self, app, user, user_two, user_three, project_public,
+            payload_one, payload_two, url_public, make_contrib_id):
+        res = app.post_json_api(
+            url_public,
+            {'data': [payload_one, payload_two]},
+            auth=user.auth, bulk=True)
+        assert res.status_code == 201
+        assert [each['id'] for each in res.json['data']] == [
+            make_contrib_id(project_public._id, user_two._id),
+            make_contrib_id(project_public._id, user_three._id)]
+
+        project_public.reload()
+        assert project_public.get_permissions(user_two) == [permissions.READ, permissions.WRITE, permissions.ADMIN]
+        assert project_public.get_permissions(user_three) == [permissions.READ]
+        assert project_public.logs.filter(action=NodeLog.CONTRIB_ADDED).count() == 1
+
     def test_node_contributor_bulk_create_errors(
             self, app, user, user_two, project_private,
             payload_one, payload_two, url_public, url_private):
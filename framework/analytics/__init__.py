@@ -1,7 +1,10 @@
 # encoding: utf-8
 
+import datetime
 import logging
 
+from django.utils import timezone
+
 from framework.celery_tasks import app
 from framework.postcommit_tasks.handlers import run_postcommit
 
@@ -15,6 +18,17 @@ def increment_user_activity_counters(user_id, action, date_string):
     return UserActivityCounter.increment(user_id, action, date_string)
 
 
+@app.task(ignore_result=True)
+def rollup_user_activity_counters():
+    """Merge the daily activity buckets older than ACTIVITY_DAILY_BUCKET_DAYS into months."""
+    from osf.models import UserActivityCounter
+    from website import settings
+    before = timezone.now().date() - datetime.timedelta(days=settings.ACTIVITY_DAILY_BUCKET_DAYS)
+    # whole months only, so a month is either in days or in one bucket
+    rolled_up = UserActivityCounter.rollup(before.replace(day=1))
+    logger.info('Rolled up {} monthly activity buckets'.format(rolled_up))
+
+
 def get_total_activity_count(user_id):
     from osf.models import UserActivityCounter
     return UserActivityCounter.get_total_activity_count(user_id)
@@ -29,6 +43,23 @@ def update_counter(page, node_info=None):
     return PageCounter.update_counter(page, node_info)
 
 
+@app.task(ignore_result=True)
+def rollup_page_counters(batch_size=None):
+    """Roll the buffered views and downloads up into the page counters."""
+    from osf.models import PageCounter
+    from website import settings
+    batch_size = batch_size or settings.PAGE_COUNTER_ROLLUP_BATCH_SIZE
+    count = batch_size
+    # stop at a partial batch so that a busy site does not keep the task running
+    while count >= batch_size:
+        count = PageCounter.rollup(batch_size)
+
+
+def get_activity_count(user_id, start=None, end=None, action=None):
+    from osf.models import UserActivityCounter
+    return UserActivityCounter.get_activity_count(user_id, start=start, end=end, action=action)
+
+
 def get_basic_counters(page):
     from osf.models import PageCounter
     return PageCounter.get_basic_counters(page)
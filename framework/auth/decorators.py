@@ -75,7 +75,9 @@ def mapcore_check_token(auth, node, use_mapcore=True):
                              mapcore_log_error,
                              mapcore_url_is_my_projects,
                              mapcore_sync_rdm_my_projects,
-                             mapcore_sync_rdm_project_or_map_group)
+                             mapcore_enqueue_sync_rdm_my_projects,
+                             mapcore_sync_rdm_project_or_map_group,
+                             mapcore_enqueue_sync_rdm_project_or_map_group)
 
     # from framework import status
     # msg = 'test mapcore message'
@@ -87,14 +89,22 @@ def mapcore_check_token(auth, node, use_mapcore=True):
         try:
             try:
                 if mapcore_url_is_my_projects(request.url):
-                    # include MAPCore.get_my_groups() to check my token
-                    mapcore_sync_rdm_my_projects(auth.user, use_raise=True)
+                    if settings.MAPCORE_SYNC_MY_PROJECTS_IN_BACKGROUND:
+                        mapcore_api_is_available(auth.user)  # to check my token
+                        mapcore_enqueue_sync_rdm_my_projects(auth.user)
+                    else:
+                        # include MAPCore.get_my_groups() to check my token
+                        mapcore_sync_rdm_my_projects(auth.user, use_raise=True)
                 elif node:
                     node_page = True
                     mapcore_api_is_available(auth.user)  # to check my token
-                    mapcore_sync_rdm_project_or_map_group(
-                        auth.user, node,
-                        use_raise=True)  # cannot check my token
+                    if settings.MAPCORE_SYNC_PROJECT_IN_BACKGROUND:
+                        mapcore_enqueue_sync_rdm_project_or_map_group(
+                            auth.user, node)
+                    else:
+                        mapcore_sync_rdm_project_or_map_group(
+                            auth.user, node,
+                            use_raise=True)  # cannot check my token
                 else:
                     # check available token only
                     mapcore_api_is_available(auth.user)
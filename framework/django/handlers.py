@@ -1,7 +1,7 @@
 from __future__ import unicode_literals
 import logging
 
-from django.db import close_old_connections, reset_queries
+from django.db import close_old_connections, connection, reset_queries
 
 logger = logging.getLogger(__name__)
 
@@ -20,3 +20,22 @@ handlers = {
     'after_request': close_old_django_db_connections,
     'teardown_request': close_old_django_db_connections,
 }
+
+
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+def query_count_before_request():
+    # record the queries even when DEBUG is off
+    connection.force_debug_cursor = True
+    reset_queries()
+
+def query_count_after_request(resp):
+    resp.headers[QUERY_COUNT_HEADER] = str(len(connection.queries))
+    connection.force_debug_cursor = False
+    return resp
+
+# Reports the number of SQL queries of each request, for load tests
+query_count_handlers = {
+    'before_request': query_count_before_request,
+    'after_request': query_count_after_request,
+}
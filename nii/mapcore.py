@@ -14,6 +14,8 @@ from operator import attrgetter
 from pprint import pformat as pp
 from urlparse import urlparse
 
+from django.conf import settings as django_settings
+from django.core.cache import caches
 from django.utils import timezone
 from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
@@ -32,6 +34,9 @@ from osf.models.node import Node
 from osf.models.mapcore import MAPSync, MAPProfile
 from osf.models.nodelog import NodeLog
 from framework.auth import Auth
+from framework.celery_tasks import app as celery_app
+from framework.celery_tasks.handlers import enqueue_task
+from addons.base.utils import run_in_threads
 from website.util import web_url_for
 from website.settings import (MAPCORE_HOSTNAME,
                               MAPCORE_AUTHCODE_PATH,
@@ -39,6 +44,10 @@ from website.settings import (MAPCORE_HOSTNAME,
                               MAPCORE_CLIENTID,
                               MAPCORE_SECRET,
                               MAPCORE_AUTHCODE_MAGIC,
+                              MAPCORE_SYNC_MY_PROJECTS_INTERVAL,
+                              MAPCORE_SYNC_PROJECT_INTERVAL,
+                              MAPCORE_SYNC_MAX_WORKERS,
+                              MAPCORE_GROUP_MEMBERS_CACHE_TIMEOUT,
                               DOMAIN)
 from nii.mapcore_api import (MAPCore, MAPCoreException, VERIFY,
                              mapcore_logger,
@@ -536,6 +545,36 @@ def _mapcore_api_with_switching_token(access_user, node, group_key, func, **kwar
         raise Exception('No user have mAP access token')
     raise first_e.__class__, first_e, first_tb[2]
 
+GROUP_MEMBERS_KEY = 'group_members:{group_key}'
+
+def _get_cached_group_members(group, access_user, node):
+    '''
+    mAPグループのメンバー一覧を返す。
+    グループのmodified_atが前回取得時と同じ場合はキャッシュを使う。
+
+    :param group: group info Dict (group_key, modified_at)
+    :return: member list (result.accounts)
+    '''
+    group_key = group['group_key']
+    modified_at = group.get('modified_at')
+    sync_cache = caches[django_settings.MAPCORE_SYNC_CACHE_NAME]
+    key = GROUP_MEMBERS_KEY.format(group_key=group_key)
+    if modified_at is not None:
+        cached = sync_cache.get(key)
+        if cached is not None and cached['modified_at'] == modified_at:
+            logger.debug('mAP group members (group_key={}) are not modified'.format(group_key))
+            return cached['accounts']
+    result = mapcore_get_group_members(access_user, node, group_key)
+    accounts = result['result']['accounts']
+    if modified_at is not None:
+        sync_cache.set(key, {'modified_at': modified_at, 'accounts': accounts},
+                       MAPCORE_GROUP_MEMBERS_CACHE_TIMEOUT)
+    return accounts
+
+def _clear_cached_group_members(group_key):
+    caches[django_settings.MAPCORE_SYNC_CACHE_NAME].delete(
+        GROUP_MEMBERS_KEY.format(group_key=group_key))
+
 def _get_group_by_key(mapcore, node, group_key, **kwargs):
     return mapcore.get_group_by_key(group_key)
 
@@ -570,12 +609,14 @@ def mapcore_add_to_group(access_user, node, group_key, eppn, admin):
     kwargs = {}
     kwargs['eppn'] = eppn
     kwargs['admin'] = admin
+    _clear_cached_group_members(group_key)
     return _mapcore_api_with_switching_token(
         access_user, node, group_key, _add_to_group, **kwargs)
 
 def mapcore_remove_from_group(access_user, node, group_key, eppn):
     kwargs = {}
     kwargs['eppn'] = eppn
+    _clear_cached_group_members(group_key)
     return _mapcore_api_with_switching_token(
         access_user, node, group_key, _remove_from_group, **kwargs)
 
@@ -583,6 +624,7 @@ def mapcore_edit_member(access_user, node, group_key, eppn, admin):
     kwargs = {}
     kwargs['eppn'] = eppn
     kwargs['admin'] = admin
+    _clear_cached_group_members(group_key)
     return _mapcore_api_with_switching_token(
         access_user, node, group_key, _edit_member, **kwargs)
 
@@ -641,9 +683,8 @@ def mapcore_get_extended_group_info(access_user, node, group_key, base_grp=None,
             group_ext = result['result']['groups'][0]
             #logger.debug('Group info:\n' + pp(group_ext))
 
-        # get member list
-        result = mapcore_get_group_members(access_user, node, group_ext['group_key'])
-        member_list = result['result']['accounts']
+        # get member list (not modified since the last time -> cached)
+        member_list = _get_cached_group_members(group_ext, access_user, node)
         admins = []
         members = []
         for usr in member_list:
@@ -1022,6 +1063,7 @@ def mapcore_sync_rdm_my_projects0(user):
 
         my_rdm_projects = {}
         sync_id_list = []
+        sync_nodes = []
         for project in Node.objects.filter(contributor__user__id=user.id):
             if project.map_group_key:
                 my_rdm_projects[project.map_group_key] = project
@@ -1075,12 +1117,12 @@ def mapcore_sync_rdm_my_projects0(user):
                 # different contributors or title
                 if my_rdm_projects.get(group_key) is None:
                     logger.debug('different contributors: group_key={}'.format(node.map_group_key))
-                    mapcore_sync_rdm_project_or_map_group(user, node)
+                    sync_nodes.append(node)
                     sync_id_list.append(node._id)
                 elif node.title != utf8dec(grp['group_name']):
                     #logger.debug('node.title={}, grp[group_name]={}'.format(utf8(node.title), grp['group_name']))
                     logger.debug('different title: group_key={}'.format(node.map_group_key))
-                    mapcore_sync_rdm_project_or_map_group(user, node)
+                    sync_nodes.append(node)
                     sync_id_list.append(node._id)
 
         for group_key, project in my_rdm_projects.items():
@@ -1097,10 +1139,14 @@ def mapcore_sync_rdm_my_projects0(user):
                     continue
                 else:
                     logger.debug('different title')
-                    mapcore_sync_rdm_project_or_map_group(user, project)
+                    sync_nodes.append(project)
             else:
                 # Project contributors is different from mAP group members.
-                mapcore_sync_rdm_project_or_map_group(user, project)
+                sync_nodes.append(project)
+
+        # each project is locked by itself
+        run_in_threads(lambda node: mapcore_sync_rdm_project_or_map_group(user, node),
+                       sync_nodes, MAPCORE_SYNC_MAX_WORKERS)
 
         ### to create new mAP groups at /myprojects/
         # for project in Node.objects.filter(contributor__user__id=user.id):
@@ -1120,6 +1166,63 @@ def mapcore_sync_rdm_my_projects(user, use_raise=False):
         if use_raise:
             raise
 
+MY_PROJECTS_SYNC_KEY = 'my_projects:{user_id}'
+
+@celery_app.task(name='nii.mapcore.mapcore_sync_rdm_my_projects_task')
+def mapcore_sync_rdm_my_projects_task(user_id):
+    user = OSFUser.load(user_id)
+    if user is None:
+        return
+    mapcore_sync_rdm_my_projects(user)
+
+def mapcore_enqueue_sync_rdm_my_projects(user):
+    '''
+    「My Projects」の同期をバックグラウンドタスクとして登録する。
+    同じユーザーの同期はMAPCORE_SYNC_MY_PROJECTS_INTERVAL秒に1回まで。
+
+    :param user: OSFUser
+    :return: 登録した場合はTrue
+    '''
+    sync_cache = caches[django_settings.MAPCORE_SYNC_CACHE_NAME]
+    # cache.add() is atomic: only one request per interval wins.
+    if not sync_cache.add(MY_PROJECTS_SYNC_KEY.format(user_id=user._id), True,
+                          MAPCORE_SYNC_MY_PROJECTS_INTERVAL):
+        logger.debug('mapcore_enqueue_sync_rdm_my_projects: skip (synchronized recently)')
+        return False
+    enqueue_task(mapcore_sync_rdm_my_projects_task.s(user._id))
+    return True
+
+PROJECT_SYNC_KEY = 'project:{node_id}'
+
+@celery_app.task(name='nii.mapcore.mapcore_sync_rdm_project_or_map_group_task')
+def mapcore_sync_rdm_project_or_map_group_task(user_id, node_id):
+    node = Node.load(node_id)
+    if node is None:
+        return
+    user = OSFUser.load(user_id) if user_id else None
+    mapcore_sync_rdm_project_or_map_group(user, node)
+
+def mapcore_enqueue_sync_rdm_project_or_map_group(user, node):
+    '''
+    プロジェクトとmAPグループの同期をバックグラウンドタスクとして登録する。
+    同じプロジェクトの同期はMAPCORE_SYNC_PROJECT_INTERVAL秒に1回まで。
+
+    :param user: OSFUser (Noneの場合はプロジェクトのメンバーのトークンを使う)
+    :param node: Node
+    :return: 登録した場合はTrue
+    '''
+    if node.is_deleted:
+        return False
+    sync_cache = caches[django_settings.MAPCORE_SYNC_CACHE_NAME]
+    # cache.add() is atomic: only one request per interval wins.
+    if not sync_cache.add(PROJECT_SYNC_KEY.format(node_id=node._id), True,
+                          MAPCORE_SYNC_PROJECT_INTERVAL):
+        logger.debug('mapcore_enqueue_sync_rdm_project_or_map_group: skip (synchronized recently)')
+        return False
+    enqueue_task(mapcore_sync_rdm_project_or_map_group_task.s(
+        user._id if user else None, node._id))
+    return True
+
 
 def mapcore_set_standby_to_upload(node, log=True):
     with transaction.atomic():
@@ -0,0 +1,132 @@
+from __future__ import unicode_literals
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from addons.osfstorage.models import OsfStorageFileNode, OsfStorageFolder
+from scripts import utils as script_utils
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_materialized_paths(batch_size=1000, verify=False):
+    """Fill OsfStorageFileNode._cached_materialized_path for every live osfstorage node.
+
+    With `verify`, already cached paths are recomputed too and mismatches are fixed.
+    Returns a tuple of (number of nodes filled, number of stale paths fixed).
+    """
+    queryset = OsfStorageFileNode.objects.only('id', 'type', 'name', 'parent_id', '_cached_materialized_path')
+    if not verify:
+        queryset = queryset.filter(_cached_materialized_path__isnull=True)
+
+    filled = fixed = 0
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        previous = {}
+        for file_node in batch:
+            previous[file_node.pk] = file_node._cached_materialized_path
+            file_node._cached_materialized_path = None
+        paths = OsfStorageFileNode.resolve_materialized_paths(batch, save=True)
+
+        for pk, path in paths.items():
+            if previous[pk] is None:
+                filled += 1
+            elif previous[pk] != path:
+                fixed += 1
+                logger.warn('Fixed stale materialized path of file node {}: {!r} -> {!r}'.format(pk, previous[pk], path))
+        logger.info('Processed file nodes up to id {}'.format(last_id))
+
+    return filled, fixed
+
+
+UNCHECKED_TARGETS_SQL = """
+    UPDATE osf_basefilenode AS F SET _subtree_checked_out = FALSE
+    WHERE F.type = %s AND F._subtree_checked_out IS NULL
+      AND NOT EXISTS (
+        SELECT 1 FROM osf_basefilenode AS C
+        WHERE C.target_object_id = F.target_object_id
+          AND C.target_content_type_id = F.target_content_type_id
+          AND C.checkout_id IS NOT NULL
+      );
+"""
+
+def backfill_subtree_checkout_flags(verify=False):
+    """Fill OsfStorageFolder._subtree_checked_out for every live osfstorage folder.
+
+    Folders of targets with nothing checked out are filled with a single query,
+    the others are searched one by one. With `verify`, already filled flags are
+    searched too and wrong ones are fixed.
+    Returns a tuple of (number of folders filled, number of wrong flags fixed).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(UNCHECKED_TARGETS_SQL, [OsfStorageFolder._typedmodels_type])
+        filled = cursor.rowcount
+
+    queryset = OsfStorageFolder.objects.only('id', 'type', 'target_object_id', 'target_content_type_id', '_subtree_checked_out')
+    if not verify:
+        queryset = queryset.filter(_subtree_checked_out__isnull=True)
+    fixed = 0
+    for folder in queryset.iterator():
+        checked_out = folder._search_checked_out()
+        if folder._subtree_checked_out is None:
+            filled += 1
+        elif folder._subtree_checked_out is False and checked_out:
+            fixed += 1
+            logger.warn('Fixed the subtree checkout flag of folder {}'.format(folder.pk))
+        else:
+            continue
+        OsfStorageFolder.objects.filter(id=folder.id).update(_subtree_checked_out=checked_out)
+    return filled, fixed
+
+
+class Command(BaseCommand):
+    """Backfill and verify the cached materialized paths of osfstorage file nodes,
+    and the subtree checkout flags of osfstorage folders.
+
+    Examples:
+
+        python manage.py backfill_osfstorage_materialized_paths
+        python manage.py backfill_osfstorage_materialized_paths --verify --dry
+    """
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            dest='batch_size',
+            help='Number of file nodes to resolve per query',
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            dest='verify',
+            help='Also recompute already cached paths and fix the stale ones',
+        )
+        parser.add_argument(
+            '--dry',
+            action='store_true',
+            dest='dry_run',
+            help='Run backfill and roll back changes to db',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options.get('dry_run', False)
+        if not dry_run:
+            script_utils.add_file_logger(logger, __file__)
+        with transaction.atomic():
+            filled, fixed = backfill_materialized_paths(
+                batch_size=options['batch_size'],
+                verify=options.get('verify', False),
+            )
+            logger.info('Filled {} materialized paths, fixed {} stale ones.'.format(filled, fixed))
+            filled, fixed = backfill_subtree_checkout_flags(verify=options.get('verify', False))
+            logger.info('Filled {} subtree checkout flags, fixed {} wrong ones.'.format(filled, fixed))
+            if dry_run:
+                raise RuntimeError('Dry run, transaction rolled back.')
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.15 on 2026-10-19 11:40
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    atomic = False  # CREATE INDEX CONCURRENTLY cannot be run in a txn
+
+    dependencies = [
+        ('osf', '0178_basefilenode_cached_materialized_path'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL([
+                    'CREATE INDEX CONCURRENTLY IF NOT EXISTS osf_nodelog_node_id_date ON osf_nodelog (node_id, date);',
+                ], [
+                    'DROP INDEX IF EXISTS osf_nodelog_node_id_date, RESTRICT;'
+                ]),
+            ],
+            state_operations=[
+                migrations.AlterIndexTogether(
+                    name='nodelog',
+                    index_together=set([('node', 'date')]),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import osf.utils.datetime_aware_jsonfield
+import osf.utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0179_nodelog_node_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rdmannouncement',
+            name='status',
+            # announcements sent before this migration were delivered synchronously
+            field=models.CharField(choices=[('queued', 'queued'), ('sending', 'sending'), ('sent', 'sent'), ('failed', 'failed')], default='sent', max_length=16),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='rdmannouncement',
+            name='status',
+            field=models.CharField(choices=[('queued', 'queued'), ('sending', 'sending'), ('sent', 'sent'), ('failed', 'failed')], default='queued', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='rdmannouncement',
+            name='recipient_institutions',
+            field=osf.utils.datetime_aware_jsonfield.DateTimeAwareJSONField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='rdmannouncement',
+            name='last_recipient_id',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rdmannouncement',
+            name='sent_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rdmannouncement',
+            name='error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rdmannouncement',
+            name='date_completed',
+            field=osf.utils.fields.NonNaiveDateTimeField(blank=True, null=True),
+        ),
+    ]
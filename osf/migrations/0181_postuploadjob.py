@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+import osf.utils.datetime_aware_jsonfield
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0180_rdmannouncement_delivery_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostUploadJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('kind', models.CharField(choices=[('created_or_updated', 'created_or_updated'), ('moved', 'moved'), ('signals', 'signals')], max_length=24)),
+                ('provider', models.CharField(blank=True, max_length=25, null=True)),
+                ('path', models.TextField(blank=True, null=True)),
+                ('metadata', osf.utils.datetime_aware_jsonfield.DateTimeAwareJSONField(blank=True, default=None, null=True)),
+                ('created_flag', models.BooleanField(default=False)),
+                ('move', osf.utils.datetime_aware_jsonfield.DateTimeAwareJSONField(blank=True, default=None, null=True)),
+                ('events', osf.utils.datetime_aware_jsonfield.DateTimeAwareJSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('running', 'running'), ('failed', 'failed')], default='pending', max_length=16)),
+                ('attempts', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('node', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_upload_jobs', to='osf.AbstractNode')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='postuploadjob',
+            index_together=set([('status', 'node')]),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0181_postuploadjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageCounterEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.CharField(db_index=True, max_length=300)),
+                ('date', models.DateField()),
+                ('visitor', models.CharField(max_length=255)),
+                ('counted', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PageCounterDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.CharField(max_length=300)),
+                ('date', models.DateField(db_index=True)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('unique', models.PositiveIntegerField(default=0)),
+                ('sketch', models.BinaryField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='pagecounterday',
+            unique_together=set([('page', 'date')]),
+        ),
+        migrations.AddField(
+            model_name='pagecounter',
+            name='sketch',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
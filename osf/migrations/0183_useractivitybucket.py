@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0182_pagecounter_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivityBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(max_length=24)),
+                ('action', models.CharField(max_length=255)),
+                ('granularity', models.CharField(choices=[('d', 'day'), ('m', 'month')], default='d', max_length=1)),
+                ('period', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='useractivitybucket',
+            unique_together=set([('user_id', 'action', 'granularity', 'period')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='useractivitybucket',
+            index_together=set([('user_id', 'period')]),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('osf', '0183_useractivitybucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageUsageSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('date', models.DateField()),
+                ('used', models.BigIntegerField(default=0)),
+                ('deleted', models.BigIntegerField(default=0)),
+                ('last_version_id', models.IntegerField(default=0)),
+                ('scanned_at', models.DateTimeField()),
+                ('node', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_snapshots', to='osf.AbstractNode')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='storageusagesnapshot',
+            unique_together=set([('node', 'date')]),
+        ),
+    ]
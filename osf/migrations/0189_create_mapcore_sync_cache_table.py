@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from django.db import migrations
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('osf', '0188_create_iqbrims_user_settings_cache_table'),
+    ]
+    operations = [
+        migrations.RunSQL([
+            """
+            CREATE TABLE "{0}" (
+                "cache_key" varchar(255) NOT NULL PRIMARY KEY,
+                "value" text NOT NULL,
+                "expires" timestamp with time zone NOT NULL
+            );
+            CREATE INDEX "{0}_expires" ON "{0}" ("expires");
+            """.format(settings.CACHES[settings.MAPCORE_SYNC_CACHE_NAME]['LOCATION'])
+        ], [
+            """DROP TABLE "{}"; """.format(settings.CACHES[settings.MAPCORE_SYNC_CACHE_NAME]['LOCATION'])
+        ])
+    ]
@@ -37,7 +37,7 @@ from osf.models.files import (  # noqa
 )  # noqa
 from osf.models.metadata import FileMetadataRecord  # noqa
 from osf.models.node_relation import NodeRelation  # noqa
-from osf.models.analytics import UserActivityCounter, PageCounter  # noqa
+from osf.models.analytics import UserActivityBucket, UserActivityCounter, PageCounter, PageCounterDay, PageCounterEvent  # noqa
 from osf.models.admin_profile import AdminProfile  # noqa
 from osf.models.admin_log_entry import AdminLogEntry  # noqa
 from osf.models.maintenance_state import MaintenanceState  # noqa
@@ -60,3 +60,5 @@ from osf.models.fileinfo import FileInfo  # noqa
 from osf.models.user_quota import UserQuota  # noqa
 from osf.models.project_storage_type import ProjectStorageType  # noqa
 from osf.models.region_external_account import RegionExternalAccount  # noqa
+from osf.models.post_upload_job import PostUploadJob  # noqa
+from osf.models.storage_usage_snapshot import StorageUsageSnapshot, StorageUsageFileRoot  # noqa
@@ -1,19 +1,62 @@
+import datetime
 import logging
+from collections import defaultdict
 
 from dateutil import parser
-from django.db import models, transaction
-from django.db.models import Sum
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
 from django.db.models.expressions import RawSQL
 from django.utils import timezone
 
 from framework.sessions import session
 from osf.models.base import BaseModel
 from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
+from osf.utils.hyperloglog import HyperLogLog
 
 logger = logging.getLogger(__name__)
 
 
+class UserActivityBucket(models.Model):
+    """Number of the logged actions of a user in a day or a month.
+
+    Days older than ACTIVITY_DAILY_BUCKET_DAYS are rolled up into months
+    by UserActivityCounter.rollup().
+    """
+    DAY = 'd'
+    MONTH = 'm'
+    GRANULARITY_CHOICES = (
+        (DAY, 'day'),
+        (MONTH, 'month'),
+    )
+
+    user_id = models.CharField(max_length=24)
+    action = models.CharField(max_length=255)
+    granularity = models.CharField(max_length=1, choices=GRANULARITY_CHOICES, default=DAY)
+    # first day of the bucket
+    period = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (('user_id', 'action', 'granularity', 'period'),)
+        index_together = (('user_id', 'period'),)
+
+    @classmethod
+    def add(cls, user_id, action, granularity, period, count=1):
+        """Atomically add `count` to the bucket, creating it if needed."""
+        key = dict(user_id=user_id, action=action, granularity=granularity, period=period)
+        if cls.objects.filter(**key).update(count=F('count') + count):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(count=count, **key)
+        except IntegrityError:
+            # created concurrently
+            cls.objects.filter(**key).update(count=F('count') + count)
+
+
 class UserActivityCounter(BaseModel):
+    """Activity of a user before UserActivityBucket, not updated anymore."""
     primary_identifier_name = '_id'
 
     _id = models.CharField(max_length=5, null=False, blank=False, db_index=True,
@@ -24,46 +67,120 @@ class UserActivityCounter(BaseModel):
 
     @classmethod
     def get_total_activity_count(cls, user_id):
+        return cls.get_activity_count(user_id)
+
+    @classmethod
+    def get_activity_count(cls, user_id, start=None, end=None, action=None):
+        """Number of the actions of the user from `start` to `end` (dates, inclusive).
+
+        Monthly buckets count when their first day is in the range.
+        """
+        buckets = UserActivityBucket.objects.filter(user_id=user_id)
+        if start is not None:
+            buckets = buckets.filter(period__gte=start)
+        if end is not None:
+            buckets = buckets.filter(period__lte=end)
+        if action is not None:
+            buckets = buckets.filter(action=action)
+        count = buckets.aggregate(sum=Sum('count'))['sum'] or 0
+        return count + cls._legacy_count(user_id, start, end, action)
+
+    @classmethod
+    def get_activity_by_period(cls, user_id, start=None, end=None, action=None):
+        """(period, granularity, count) of the buckets of the user, oldest first."""
+        buckets = UserActivityBucket.objects.filter(user_id=user_id)
+        if start is not None:
+            buckets = buckets.filter(period__gte=start)
+        if end is not None:
+            buckets = buckets.filter(period__lte=end)
+        if action is not None:
+            buckets = buckets.filter(action=action)
+        return list(buckets.values('period', 'granularity').annotate(
+            count=Sum('count')).order_by('period', 'granularity').values_list(
+            'period', 'granularity', 'count'))
+
+    @classmethod
+    def _legacy_count(cls, user_id, start, end, action):
         try:
-            return cls.objects.get(_id=user_id).total
+            legacy = cls.objects.get(_id=user_id)
         except cls.DoesNotExist:
             return 0
+        if start is None and end is None and action is None:
+            return legacy.total
+        if action is not None:
+            dates = legacy.action.get(action, {}).get('date', {})
+        else:
+            dates = dict((date, value['total']) for date, value in legacy.date.items())
+        start_key = start.strftime('%Y/%m/%d') if start is not None else None
+        end_key = end.strftime('%Y/%m/%d') if end is not None else None
+        return sum(count for date, count in dates.items()
+                   if (start_key is None or date >= start_key) and (end_key is None or date <= end_key))
 
     @classmethod
     def increment(cls, user_id, action, date_string):
-        date = parser.parse(date_string).strftime('%Y/%m/%d')
-        with transaction.atomic():
-            # select_for_update locks the row but only inside a transaction
-            uac, created = cls.objects.select_for_update().get_or_create(_id=user_id)
-            if uac.total > 0:
-                uac.total += 1
-            else:
-                uac.total = 1
-            if action in uac.action:
-                uac.action[action]['total'] += 1
-                if date in uac.action[action]['date']:
-                    uac.action[action]['date'][date] += 1
-                else:
-                    uac.action[action]['date'][date] = 1
-            else:
-                uac.action[action] = dict(total=1, date={date: 1})
-            if date in uac.date:
-                uac.date[date]['total'] += 1
-            else:
-                uac.date[date] = dict(total=1)
-            uac.save()
+        date = parser.parse(date_string).date()
+        UserActivityBucket.add(user_id, action, UserActivityBucket.DAY, date)
         return True
 
+    @classmethod
+    def rollup(cls, before):
+        """Merge the daily buckets of the days before `before` into monthly buckets."""
+        days = UserActivityBucket.objects.filter(granularity=UserActivityBucket.DAY, period__lt=before)
+        with transaction.atomic():
+            months = days.annotate(month=TruncMonth('period')).values(
+                'user_id', 'action', 'month').annotate(count=Sum('count'))
+            rolled_up = 0
+            for month in months.iterator():
+                UserActivityBucket.add(month['user_id'], month['action'], UserActivityBucket.MONTH,
+                                       month['month'], count=month['count'])
+                rolled_up += 1
+            days.delete()
+        return rolled_up
+
+
+def _visitor_key():
+    """Identifies the visitor for the unique counts, the user or the session."""
+    return session.data.get('auth_user_id') or session._id
+
+
+class PageCounterEvent(models.Model):
+    """A view or download not rolled up into the counters yet.
+
+    Rows are only appended while serving files, so counting takes no lock;
+    PageCounter.rollup() moves them into PageCounter and PageCounterDay.
+    """
+    page = models.CharField(max_length=300, db_index=True)
+    date = models.DateField()
+    visitor = models.CharField(max_length=255)
+    # False for downloads by contributors, which only count per day
+    counted = models.BooleanField(default=True)
+
+
+class PageCounterDay(models.Model):
+    """Views or downloads of a page on a day."""
+    page = models.CharField(max_length=300)
+    date = models.DateField(db_index=True)
+    total = models.PositiveIntegerField(default=0)
+    unique = models.PositiveIntegerField(default=0)
+    # HyperLogLog of the visitors of the day
+    sketch = models.BinaryField(null=True, blank=True)
+
+    class Meta:
+        unique_together = (('page', 'date'),)
+
 
 class PageCounter(BaseModel):
     primary_identifier_name = '_id'
 
     _id = models.CharField(max_length=300, null=False, blank=False, db_index=True,
                            unique=True)  # 272 in prod
+    # counts per day before PageCounterDay, not updated anymore
     date = DateTimeAwareJSONField(default=dict)
 
     total = models.PositiveIntegerField(default=0)
     unique = models.PositiveIntegerField(default=0)
+    # HyperLogLog of the visitors counted in `unique` since the rollups
+    sketch = models.BinaryField(null=True, blank=True)
 
     DOWNLOAD_ALL_VERSIONS_ID_PATTERN = r'^download:[^:]*:{1}[^:]*$'
 
@@ -81,9 +198,17 @@ class PageCounter(BaseModel):
 
         # Get the total download numbers from the nested dict on the PageCounter by annotating it as daily_total then
         # aggregating the sum.
-        daily_total = page_counters.annotate(daily_total=RawSQL("((date->%s->>'total')::int)", (formatted_date,))).aggregate(sum=Sum('daily_total'))['sum']
+        legacy_total = page_counters.annotate(daily_total=RawSQL("((date->%s->>'total')::int)", (formatted_date,))).aggregate(sum=Sum('daily_total'))['sum']
+
+        if isinstance(date, datetime.datetime):
+            date = date.date()
+        daily_total = PageCounterDay.objects.filter(
+            date=date, page__regex=cls.DOWNLOAD_ALL_VERSIONS_ID_PATTERN,
+        ).aggregate(sum=Sum('total'))['sum']
 
-        return daily_total
+        if legacy_total is None and daily_total is None:
+            return None
+        return (legacy_total or 0) + (daily_total or 0)
 
     @staticmethod
     def clean_page(page):
@@ -96,71 +221,67 @@ class PageCounter(BaseModel):
     @classmethod
     def update_counter(cls, page, node_info):
         cleaned_page = cls.clean_page(page)
-        date = timezone.now()
-        date_string = date.strftime('%Y/%m/%d')
-        visited_by_date = session.data.get('visited_by_date', {'date': date_string, 'pages': []})
+        counted = True
+        # if a download counter is being updated, only count the download
+        # if the user who is downloading isn't a contributor to the project
+        page_type = cleaned_page.split(':')[0]
+        if page_type in ('download', 'view') and node_info:
+            if node_info['contributors'].filter(guids___id__isnull=False, guids___id=session.data.get('auth_user_id')).exists():
+                counted = False
+        PageCounterEvent.objects.create(page=cleaned_page, date=timezone.now().date(),
+                                        visitor=_visitor_key(), counted=counted)
 
+    @classmethod
+    def rollup(cls, batch_size=10000):
+        """Move the pending events into the counters, returns the number of events.
+
+        Each counter row is locked once per batch instead of once per view.
+        """
         with transaction.atomic():
-            model_instance, created = cls.objects.select_for_update().get_or_create(_id=cleaned_page)
-
-            # if they visited something today
-            if date_string == visited_by_date['date']:
-                # if they haven't visited this page today
-                if cleaned_page not in visited_by_date['pages']:
-                    # if the model_instance has today in it
-                    if date_string in model_instance.date.keys():
-                        # increment the number of unique visitors for today
-                        model_instance.date[date_string]['unique'] += 1
-                    else:
-                        # set the number of unique visitors for today to 1
-                        model_instance.date[date_string] = dict(unique=1)
-            # if they haven't visited something today
-            else:
-                # set their visited by date to blank
-                visited_by_date['date'] = date_string
-                visited_by_date['pages'] = []
-                # if the model_instance has today in it
-                if date_string in model_instance.date.keys():
-                    # increment the number of unique visitors for today
-                    model_instance.date[date_string]['unique'] += 1
-                else:
-                    # set the number of unique visitors to 1
-                    model_instance.date[date_string] = dict(unique=1)
-
-            # update their sessions
-            visited_by_date['pages'].append(cleaned_page)
-            session.data['visited_by_date'] = visited_by_date
-
-            if date_string in model_instance.date.keys():
-                if 'total' not in model_instance.date[date_string].keys():
-                    model_instance.date[date_string].update(total=0)
-                model_instance.date[date_string]['total'] += 1
-            else:
-                model_instance.date[date_string] = dict(total=1)
-
-            # if a download counter is being updated, only perform the update
-            # if the user who is downloading isn't a contributor to the project
-            page_type = cleaned_page.split(':')[0]
-            if page_type in ('download', 'view') and node_info:
-                if node_info['contributors'].filter(guids___id__isnull=False, guids___id=session.data.get('auth_user_id')).exists():
-                    model_instance.save()
-                    return
-
-            visited = session.data.get('visited', [])
-            if page not in visited:
-                model_instance.unique += 1
-                visited.append(page)
-                session.data['visited'] = visited
-
-            session.save()
-            model_instance.total += 1
-
-            model_instance.save()
+            events = list(PageCounterEvent.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size])
+            if not events:
+                return 0
+            by_page = defaultdict(list)
+            by_day = defaultdict(list)
+            for event in events:
+                by_page[event.page].append(event)
+                by_day[(event.page, event.date)].append(event)
+
+            for (page, date), day_events in by_day.items():
+                day, _ = PageCounterDay.objects.select_for_update().get_or_create(page=page, date=date)
+                sketch = HyperLogLog(day.sketch)
+                sketch.update(event.visitor for event in day_events)
+                day.total += len(day_events)
+                day.unique = sketch.count()
+                day.sketch = sketch.to_bytes()
+                day.save()
+
+            for page, page_events in by_page.items():
+                counter, _ = cls.objects.select_for_update().get_or_create(_id=page)
+                counted = [event for event in page_events if event.counted]
+                if not counted:
+                    continue
+                sketch = HyperLogLog(counter.sketch)
+                before = sketch.count()
+                sketch.update(event.visitor for event in counted)
+                counter.total += len(counted)
+                counter.unique += max(sketch.count() - before, 0)
+                counter.sketch = sketch.to_bytes()
+                counter.save()
+
+            PageCounterEvent.objects.filter(id__in=[event.id for event in events]).delete()
+        return len(events)
 
     @classmethod
     def get_basic_counters(cls, page):
+        cleaned_page = cls.clean_page(page)
+        # include the events not rolled up yet
+        pending = PageCounterEvent.objects.filter(page=cleaned_page, counted=True).aggregate(
+            total=Count('id'), unique=Count('visitor', distinct=True))
         try:
-            counter = cls.objects.get(_id=cls.clean_page(page))
-            return (counter.unique, counter.total)
+            counter = cls.objects.get(_id=cleaned_page)
+            return (counter.unique + pending['unique'], counter.total + pending['total'])
         except cls.DoesNotExist:
+            if pending['total']:
+                return (pending['unique'], pending['total'])
             return (None, None)
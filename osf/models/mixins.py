@@ -146,13 +146,11 @@ class Loggable(models.Model):
         return log
 
     def _complete_add_log(self, log, action, user=None, save=True):
-        if self.logs.count() == 1:
-            log_date = log.date if hasattr(log, 'date') else log.created
-            self.last_logged = log_date.replace(tzinfo=pytz.utc)
-        else:
-            recent_log = self.logs.first()
-            log_date = recent_log.date if hasattr(log, 'date') else recent_log.created
-            self.last_logged = log_date
+        # The most recent log is served by the (node, date) index, unlike counting
+        # all logs of the node to detect the first one.
+        recent_log = self.logs.first() or log
+        log_date = recent_log.date if hasattr(log, 'date') else recent_log.created
+        self.last_logged = log_date.replace(tzinfo=pytz.utc)
 
         if save:
             self.save()
@@ -5,18 +5,17 @@ import re
 import urlparse
 import warnings
 import httplib
+from collections import OrderedDict
 
-import bson
-from django.db.models import Q
+from django.db.models import Max, Q
 from dirtyfields import DirtyFieldsMixin
 from django.apps import apps
 from django_bulk_update.helper import bulk_update
 from django.contrib.auth.models import AnonymousUser, Permission
 from django.contrib.contenttypes.fields import GenericRelation
-from django.core.paginator import Paginator
 from django.core.urlresolvers import reverse
-from django.db import models, connection
-from django.db.models.signals import post_save
+from django.db import models, connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.functional import cached_property
@@ -34,9 +33,11 @@ from framework import status
 from framework.auth import oauth_scopes
 from framework.celery_tasks.handlers import enqueue_task, get_task_from_queue
 from framework.exceptions import PermissionsError, HTTPError
+from framework.postcommit_tasks.handlers import enqueue_postcommit_task
 from framework.sentry import log_exception
 from osf.exceptions import (InvalidTagError, NodeStateError,
-                            TagNotFoundError, UserNotAffiliatedError)
+                            TagNotFoundError, UserNotAffiliatedError,
+                            UserStateError, ValidationValueError)
 from osf.models.contributor import Contributor
 from osf.models.collection import CollectionSubmission
 
@@ -56,7 +57,7 @@ from osf.models.validators import validate_title
 from framework.auth.core import Auth
 from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
 from osf.utils.fields import NonNaiveDateTimeField
-from osf.utils.requests import get_request_and_user_id, string_type_request_headers
+from osf.utils.requests import dummy_request, get_current_request, get_request_and_user_id, string_type_request_headers
 from osf.utils import sanitize
 from api.base import settings as api_settings
 from website import language, settings
@@ -77,7 +78,7 @@ from osf.utils.permissions import (
     READ_NODE,
     WRITE
 )
-from website.util import api_url_for, api_v2_url, web_url_for
+from website.util import api_url_for, api_v2_url, web_url_for, waterbutler_auth
 from .base import BaseModel, GuidMixin, GuidMixinQuerySet
 from api.caching.tasks import update_storage_usage
 from api.caching import settings as cache_settings
@@ -1452,6 +1453,146 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             self.add_permission(contrib.user, permission, save=True)
         Contributor.objects.bulk_create(contribs)
 
+    def bulk_add_contributors(self, contributors, auth=None, send_email=None, notify_unregistered=True, log=True, save=False):
+        """Add many contributors at once.
+
+        Unlike add_contributors, the memberships and the permissions are written
+        with a few queries whatever the number of contributors, and the side
+        effects (notifications, search, institutional storages, mAP core) run
+        in a single task for the node, see enqueue_contributors_changed.
+
+        :param list contributors: A list of dictionaries of the form:
+            {
+                'user': <User object>,
+                'permissions': <String highest permission, 'admin', for example>
+                'visible': <Boolean indicating whether or not user is a bibliographic contributor>
+            }
+        :param auth: All the auth information including user, API key.
+        :param str send_email: Email preference for notifying added contributors
+        :param bool notify_unregistered: Send the invitations to the unregistered contributors
+        :param log: Add log to self
+        :param save: Save after adding contributors
+        :returns: The users who were added
+        """
+        to_add = OrderedDict()
+        for contrib in contributors:
+            user = contrib['user'].merged_by if contrib['user'].is_merged else contrib['user']
+            if user.is_disabled:
+                raise ValidationValueError('Deactivated users cannot be added as contributors.')
+            if not user.is_registered and not user.unclaimed_records:
+                raise UserStateError('This contributor cannot be added. If the problem persists please report it '
+                                     'to ' + language.SUPPORT_LINK)
+            to_add[user.id] = (user, contrib.get('permissions'), contrib.get('visible', True))
+
+        existing = set(self.contributor_set.filter(user_id__in=to_add.keys()).values_list('user_id', flat=True))
+        for user_id in existing:
+            # Permissions are overridden, as by add_contributor
+            user, permission, visible = to_add.pop(user_id)
+            if permission is not None:
+                self.set_permissions(user, permission)
+
+        if not to_add:
+            if save:
+                self.save()
+            return []
+
+        order = self.contributor_set.aggregate(order=Max('_order'))['order']
+        order = 0 if order is None else order + 1
+        Contributor.objects.bulk_create([
+            Contributor(node=self, user=new_user, visible=new_visible, _order=order + i)
+            for i, (new_user, _, new_visible) in enumerate(to_add.values())
+        ])
+        by_permission = {}
+        for user, permission, visible in to_add.values():
+            by_permission.setdefault(permission or self.DEFAULT_CONTRIBUTOR_PERMISSIONS, []).append(user)
+        for permission, users in by_permission.items():
+            self.get_group(permission).user_set.add(*users)
+
+        added = [new_user for new_user, _, _ in to_add.values()]
+        if log:
+            params = self.log_params
+            params['contributors'] = [new_user._id for new_user in added]
+            self.add_log(
+                action=self.log_class.CONTRIB_ADDED,
+                params=params,
+                auth=auth,
+                save=False,
+            )
+        if save:
+            self.save()
+
+        self.enqueue_contributors_changed(
+            auth,
+            added={user._id: permission or self.DEFAULT_CONTRIBUTOR_PERMISSIONS for user, permission, visible in to_add.values()},
+            email_template=send_email or self.contributor_email_template,
+            notify_unregistered=notify_unregistered,
+        )
+        if self.get_identifier_value('doi'):
+            request, user_id = get_request_and_user_id()
+            self.update_or_enqueue_on_node_updated(user_id, first_save=False, saved_fields=['contributors'])
+        return added
+
+    def bulk_remove_contributors(self, users, auth=None, log=True, save=False):
+        """Remove many contributors at once, the counterpart of bulk_add_contributors.
+
+        All or none of the users are removed.
+
+        :param list users: The users to remove
+        :param auth: All the auth information including user, API key.
+        :raises: NodeStateError if no visible contributor or no registered admin would remain
+        """
+        users = [user.user if isinstance(user, self.contributor_class) else user for user in users]
+        user_ids = [user.id for user in users]
+        if not self.contributor_set.exclude(user_id__in=user_ids).filter(visible=True).exists():
+            raise self.state_error('Must have at least one visible contributor')
+        if not self._get_admin_contributors_query(self._contributors.all()).exclude(user_id__in=user_ids).exists():
+            raise self.state_error('Must have at least one registered admin contributor')
+
+        for user in users:
+            if self._id in user.unclaimed_records:
+                del user.unclaimed_records[self._id]
+                user.save()
+
+        self.contributor_set.filter(user_id__in=user_ids).delete()
+        for group in self.group_objects:
+            group.user_set.remove(*users)
+        for user in users:
+            self.disconnect_addons(user, auth)
+
+        if log:
+            params = self.log_params
+            params['contributors'] = [user._id for user in users]
+            self.add_log(
+                action=self.log_class.CONTRIB_REMOVED,
+                params=params,
+                auth=auth,
+                save=False,
+            )
+        if save:
+            self.save()
+
+        for user in users:
+            # remove the user from the subscriptions, check the files in
+            project_signals.contributor_removed.send(self, user=user)
+        self.enqueue_contributors_changed(auth)
+        if self.get_identifier_value('doi'):
+            request, user_id = get_request_and_user_id()
+            self.update_or_enqueue_on_node_updated(user_id, first_save=False, saved_fields=['contributors'])
+
+    def enqueue_contributors_changed(self, auth, added=None, email_template=None, notify_unregistered=True):
+        """Run node_tasks.on_contributors_changed after the request, or now outside of a request."""
+        args = (
+            self._id,
+            auth.user._id if auth and auth.user else None,
+            added or {},
+            email_template or self.contributor_email_template,
+            notify_unregistered,
+        )
+        if get_current_request() is dummy_request:
+            node_tasks.on_contributors_changed(*args)
+        else:
+            enqueue_postcommit_task(node_tasks.on_contributors_changed, args, {}, celery=True, once_per_request=False)
+
     def register_node(self, schema, auth, data, parent=None, child_ids=None, provider=None):
         """Make a frozen copy of a node.
 
@@ -1667,7 +1808,11 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         for affiliation in user.affiliated_institutions.all():
             new.affiliated_institutions.add(affiliation)
 
-    # TODO: Optimize me (e.g. use bulk create)
+    # Nodes are cloned one by one: saving a node creates its guid and its
+    # permission groups, and the addon after_fork hooks create the addon
+    # settings (osfstorage included) the fork needs before it is returned.
+    # Logs and node links are copied with set-based statements.
+    @transaction.atomic
     def fork_node(self, auth, title=None, parent=None):
         """Recursively fork a node.
 
@@ -1718,25 +1863,19 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
             node_relation = NodeRelation.objects.get(parent=parent.forked_from, child=original)
             NodeRelation.objects.get_or_create(_order=node_relation._order, parent=parent, child=forked)
 
-        for node_relation in original.node_relations.filter(child__is_deleted=False):
-            node_contained = node_relation.child
+        for node_relation in original.node_relations.select_related('child').filter(child__is_deleted=False, is_node_link=False):
             # Fork child nodes
-            if not node_relation.is_node_link:
-                try:  # Catch the potential PermissionsError above
-                    node_contained.fork_node(
-                        auth=auth,
-                        title='',
-                        parent=forked,
-                    )
-                except PermissionsError:
-                    pass  # If this exception is thrown omit the node from the result set
-            else:
-                # Copy linked nodes
-                NodeRelation.objects.get_or_create(
-                    is_node_link=True,
+            try:  # Catch the potential PermissionsError above
+                node_relation.child.fork_node(
+                    auth=auth,
+                    title='',
                     parent=forked,
-                    child=node_contained
                 )
+            except PermissionsError:
+                pass  # If this exception is thrown omit the node from the result set
+
+        # Copy linked nodes
+        self.clone_node_links(forked)
 
         if title is None:
             forked.title = PREFIX + original.title
@@ -1785,30 +1924,60 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
 
         return forked
 
-    def clone_logs(self, node, page_size=100):
-        paginator = Paginator(self.logs.order_by('pk').all(), page_size)
-        for page_num in paginator.page_range:
-            page = paginator.page(page_num)
-            # Instantiate NodeLogs "manually"
-            # because BaseModel#clone() is too slow for large projects
-            logs_to_create = [
-                NodeLog(
-                    _id=bson.ObjectId(),
-                    action=log.action,
-                    date=log.date,
-                    params=log.params,
-                    should_hide=log.should_hide,
-                    foreign_user=log.foreign_user,
-                    # Set foreign keys, not their objects
-                    # to speed things up
-                    node_id=node.pk,
-                    user_id=log.user_id,
-                    original_node_id=log.original_node_id
-                )
-                for log in page
-            ]
-            NodeLog.objects.bulk_create(logs_to_create)
+    def clone_logs(self, node, page_size=10000):
+        """Copy every log of this node to `node` with set-based INSERT ... SELECT statements.
+
+        Logs are copied in chunks of `page_size` rows using keyset pagination on the
+        primary key, so that the cost of each chunk does not grow with the offset
+        and no NodeLog instances have to be built in Python.
+        """
+        sql = """
+            WITH source AS (
+              SELECT id, action, date, params, should_hide, foreign_user, user_id, original_node_id
+              FROM %s
+              WHERE node_id = %s AND id > %s
+              ORDER BY id
+              LIMIT %s
+            ), inserted AS (
+              INSERT INTO %s (_id, created, modified, action, date, params, should_hide, foreign_user, node_id, user_id, original_node_id)
+              SELECT
+                -- ObjectId-compatible identifier: 4 bytes of timestamp followed by 8 random bytes
+                lpad(to_hex(extract(epoch FROM now())::bigint), 8, '0') || substr(md5(random()::text || source.id::text), 1, 16),
+                now(), now(), action, date, params, should_hide, foreign_user, %s, user_id, original_node_id
+              FROM source
+              ORDER BY id
+            )
+            SELECT max(id) FROM source;
+        """
+        nodelog_table = AsIs(NodeLog._meta.db_table)
+        last_id = 0
+        with connection.cursor() as cursor:
+            while last_id is not None:
+                cursor.execute(sql, [nodelog_table, self.pk, last_id, page_size, nodelog_table, node.pk])
+                last_id = cursor.fetchone()[0]
+
+    def clone_node_links(self, node):
+        """Link `node` to every node this node links to, with a single INSERT ... SELECT.
 
+        Links to deleted nodes are skipped, as are links `node` already has.
+        """
+        sql = """
+            INSERT INTO %s (_id, created, modified, is_node_link, _order, parent_id, child_id)
+            SELECT
+              -- ObjectId-compatible identifier: 4 bytes of timestamp followed by 8 random bytes
+              lpad(to_hex(extract(epoch FROM now())::bigint), 8, '0') || substr(md5(random()::text || R.id::text), 1, 16),
+              now(), now(), TRUE, R._order, %s, R.child_id
+            FROM %s AS R
+              JOIN %s AS C ON C.id = R.child_id
+            WHERE R.parent_id = %s AND R.is_node_link AND NOT C.is_deleted
+            ORDER BY R._order
+            ON CONFLICT (parent_id, child_id) DO NOTHING;
+        """
+        relation_table = AsIs(NodeRelation._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [relation_table, node.pk, relation_table, AsIs(AbstractNode._meta.db_table), self.pk])
+
+    @transaction.atomic
     def use_as_template(self, auth, changes=None, top_level=True, parent=None):
         """Create a new project, using an existing project as a template.
 
@@ -2029,6 +2198,8 @@ class AbstractNode(DirtyFieldsMixin, TypedModel, AddonModelMixin, IdentifierMixi
         ret = super(AbstractNode, self).save(*args, **kwargs)
         if saved_fields:
             self.on_update(first_save, saved_fields)
+        if not first_save and {'is_public', 'is_deleted'} & set(saved_fields):
+            waterbutler_auth.invalidate(self)
 
         if 'node_license' in saved_fields:
             children = list(self.descendants.filter(node_license=None, is_public=True, is_deleted=False))
@@ -2552,3 +2723,27 @@ def set_parent_and_root(sender, instance, created, *args, **kwargs):
     if not instance.root:
         instance.root = instance.get_root()
         instance.save()
+
+
+@receiver(m2m_changed, sender=OSFUser.groups.through)
+def invalidate_waterbutler_auth_of_members(sender, instance, action, reverse, pk_set, **kwargs):
+    """The permissions of the users changed, through their permission groups."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        group_ids = [instance.id]
+    elif action == 'pre_clear':
+        group_ids = list(instance.groups.values_list('id', flat=True))
+    else:
+        group_ids = pk_set
+    node_ids = NodeGroupObjectPermission.objects.filter(
+        group_id__in=group_ids,
+    ).values_list('content_object_id', flat=True).distinct()
+    waterbutler_auth.invalidate_nodes(node_ids)
+
+
+@receiver(post_save, sender=NodeGroupObjectPermission)
+@receiver(post_delete, sender=NodeGroupObjectPermission)
+def invalidate_waterbutler_auth_of_groups(sender, instance, **kwargs):
+    """The permissions of a group, e.g. of an OSF group, on a node changed."""
+    waterbutler_auth.invalidate_nodes([instance.content_object_id])
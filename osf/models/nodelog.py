@@ -183,6 +183,9 @@ class NodeLog(ObjectIDMixin, BaseModel):
     class Meta:
         ordering = ['-date']
         get_latest_by = 'date'
+        index_together = (
+            ('node', 'date'),
+        )
 
     @property
     def absolute_api_v2_url(self):
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+from django.db import models
+from osf.models.base import BaseModel
+from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
+
+
+class PostUploadJob(BaseModel):
+    """Work left to do after WaterButler reported a file operation of a node.
+
+    The file_updated signals of the operations (`events`) are sent in order,
+    then the hashes of the file are refreshed and its timestamp is updated.
+    Repeated operations on the same file are coalesced into one job.
+    See website/util/post_upload.py.
+    """
+    KIND_CREATED_OR_UPDATED = 'created_or_updated'
+    KIND_MOVED = 'moved'
+    # only file_updated signals, no timestamp
+    KIND_SIGNALS = 'signals'
+    KIND_CHOICES = (
+        (KIND_CREATED_OR_UPDATED, KIND_CREATED_OR_UPDATED),
+        (KIND_MOVED, KIND_MOVED),
+        (KIND_SIGNALS, KIND_SIGNALS),
+    )
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, STATUS_PENDING),
+        (STATUS_RUNNING, STATUS_RUNNING),
+        (STATUS_FAILED, STATUS_FAILED),
+    )
+
+    node = models.ForeignKey('AbstractNode', related_name='post_upload_jobs', on_delete=models.CASCADE)
+    user = models.ForeignKey('OSFUser', null=True, on_delete=models.SET_NULL)
+    kind = models.CharField(max_length=24, choices=KIND_CHOICES)
+    provider = models.CharField(max_length=25, null=True, blank=True)
+    path = models.TextField(null=True, blank=True)
+    # metadata of the file from WaterButler, the latest one when coalesced
+    metadata = DateTimeAwareJSONField(default=None, null=True, blank=True)
+    created_flag = models.BooleanField(default=False)
+    # src_provider, dest_provider, src_path, dest_path and src_metadata of a move
+    move = DateTimeAwareJSONField(default=None, null=True, blank=True)
+    # file_updated signals not sent yet: [{'user', 'event_type', 'payload'}]
+    events = DateTimeAwareJSONField(default=list, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        index_together = (('status', 'node'),)
@@ -2,15 +2,36 @@
 
 from django.db import models
 from osf.models.base import BaseModel
+from osf.utils.datetime_aware_jsonfield import DateTimeAwareJSONField
 from osf.utils.fields import NonNaiveDateTimeField, EncryptedTextField
 
 class RdmAnnouncement(BaseModel):
+    STATUS_QUEUED = 'queued'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, STATUS_QUEUED),
+        (STATUS_SENDING, STATUS_SENDING),
+        (STATUS_SENT, STATUS_SENT),
+        (STATUS_FAILED, STATUS_FAILED),
+    )
+
     user = models.ForeignKey('OSFUser', null=True)
     title = models.CharField(max_length=256, blank=True, null=False)
     body = models.TextField(max_length=63206, null=False)
     announcement_type = models.CharField(max_length=256, null=False)
     date_sent = NonNaiveDateTimeField(auto_now_add=True)
     is_success = models.BooleanField(default=False)
+    # delivery progress of the background job
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    # ids of the institutions of the recipients, None for all users
+    recipient_institutions = DateTimeAwareJSONField(default=None, null=True, blank=True)
+    # OSFUser.id of the last recipient delivered, to resume from
+    last_recipient_id = models.IntegerField(default=0)
+    sent_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    date_completed = NonNaiveDateTimeField(blank=True, null=True)
 
 class RdmAnnouncementOption(BaseModel):
     user = models.ForeignKey('OSFUser', null=True)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+from django.db import models
+from osf.models.base import BaseModel
+
+
+class StorageUsageSnapshot(BaseModel):
+    """OsfStorage usage of a top-level project and its components on a day.
+
+    Written by scripts/osfstorage/usage_audit.py for the projects whose files
+    changed since the previous audit; the usage of a project is its latest
+    snapshot.
+    """
+    node = models.ForeignKey('AbstractNode', related_name='usage_snapshots', on_delete=models.CASCADE)
+    date = models.DateField()
+    # bytes of the versions of the current and of the trashed files
+    used = models.BigIntegerField(default=0)
+    deleted = models.BigIntegerField(default=0)
+    # watermark of the audit: versions and files changes it has seen
+    last_version_id = models.IntegerField(default=0)
+    scanned_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('node', 'date')
+
+
+class StorageUsageFileRoot(models.Model):
+    """Top-level project whose usage a file was counted in by the latest audit.
+
+    An incremental audit also recomputes these projects for the changed files,
+    so the project a file or a component was moved out of is updated too.
+    """
+    file = models.OneToOneField('BaseFileNode', primary_key=True, related_name='+', on_delete=models.CASCADE)
+    root = models.ForeignKey('AbstractNode', related_name='+', on_delete=models.CASCADE)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""HyperLogLog sketch to estimate the number of distinct values.
+
+The sketch has 2 ** precision one-byte registers and a standard error of
+about 1.04 / sqrt(2 ** precision), 3.3% with the default precision.
+"""
+import hashlib
+import math
+import struct
+
+DEFAULT_PRECISION = 10
+
+
+class HyperLogLog(object):
+
+    def __init__(self, registers=None, precision=DEFAULT_PRECISION):
+        if registers:
+            self.registers = bytearray(registers)
+            precision = int(math.log(len(self.registers), 2))
+        else:
+            self.registers = bytearray(1 << precision)
+        self.precision = precision
+
+    def add(self, value):
+        if isinstance(value, unicode):
+            value = value.encode('utf8')
+        x = struct.unpack('>Q', hashlib.sha1(value).digest()[:8])[0]
+        bits = 64 - self.precision
+        index = x >> bits
+        rest = x & ((1 << bits) - 1)
+        rank = bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        for i, rank in enumerate(other.registers):
+            if rank > self.registers[i]:
+                self.registers[i] = rank
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(b'\x00')
+        if estimate <= 2.5 * m and zeros:
+            # linear counting is more accurate for small cardinalities
+            estimate = m * math.log(float(m) / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes(self.registers)
@@ -9,11 +9,12 @@ import pytest
 from django.utils import timezone
 from nose.tools import *  # noqa: F403
 
-from datetime import datetime
+from datetime import date, datetime
 
 from addons.osfstorage.models import OsfStorageFile
 from framework import analytics
-from osf.models import PageCounter
+from osf.models import PageCounter, PageCounterDay, PageCounterEvent, UserActivityBucket, UserActivityCounter
+from osf.utils.hyperloglog import HyperLogLog
 
 from tests.base import OsfTestCase
 from osf_tests.factories import UserFactory, ProjectFactory
@@ -41,6 +42,47 @@ class TestAnalytics(OsfTestCase):
         analytics.increment_user_activity_counters(user._id, 'project_created', date.isoformat())
         assert_equal(user.get_activity_points(), 1)
 
+    def test_activity_buckets(self):
+        user = UserFactory()
+        analytics.increment_user_activity_counters(user._id, 'project_created', '2020-01-30T10:00:00+00:00')
+        analytics.increment_user_activity_counters(user._id, 'project_created', '2020-01-30T11:00:00+00:00')
+        analytics.increment_user_activity_counters(user._id, 'file_added', '2020-02-01T10:00:00+00:00')
+
+        assert_equal(UserActivityBucket.objects.filter(user_id=user._id).count(), 2)
+        assert_equal(analytics.get_total_activity_count(user._id), 3)
+        assert_equal(analytics.get_activity_count(user._id, start=date(2020, 2, 1)), 1)
+        assert_equal(analytics.get_activity_count(user._id, action='project_created'), 2)
+        assert_equal(UserActivityCounter.get_activity_by_period(user._id), [
+            (date(2020, 1, 30), UserActivityBucket.DAY, 2),
+            (date(2020, 2, 1), UserActivityBucket.DAY, 1),
+        ])
+
+    def test_activity_rollup(self):
+        user = UserFactory()
+        analytics.increment_user_activity_counters(user._id, 'project_created', '2020-01-02T10:00:00+00:00')
+        analytics.increment_user_activity_counters(user._id, 'project_created', '2020-01-30T10:00:00+00:00')
+        analytics.increment_user_activity_counters(user._id, 'project_created', '2020-02-01T10:00:00+00:00')
+
+        UserActivityCounter.rollup(date(2020, 2, 1))
+
+        assert_equal(UserActivityCounter.get_activity_by_period(user._id), [
+            (date(2020, 1, 1), UserActivityBucket.MONTH, 2),
+            (date(2020, 2, 1), UserActivityBucket.DAY, 1),
+        ])
+        assert_equal(user.get_activity_points(), 3)
+
+    def test_legacy_activity(self):
+        user = UserFactory()
+        UserActivityCounter.objects.create(
+            _id=user._id, total=2,
+            action={'project_created': {'total': 2, 'date': {'2019/12/31': 2}}},
+            date={'2019/12/31': {'total': 2}},
+        )
+        analytics.increment_user_activity_counters(user._id, 'project_created', '2020-01-02T10:00:00+00:00')
+        assert_equal(user.get_activity_points(), 3)
+        assert_equal(analytics.get_activity_count(user._id, end=date(2019, 12, 31)), 2)
+        assert_equal(analytics.get_activity_count(user._id, start=date(2020, 1, 1), action='project_created'), 1)
+
 
 @pytest.fixture()
 def user():
@@ -96,16 +138,21 @@ class TestPageCounter:
         page_counter_id = 'download:{}:{}'.format(project._id, file_node.id)
 
         PageCounter.update_counter(page_counter_id, {})
+        # buffered until rolled up
+        assert PageCounter.get_basic_counters(page_counter_id) == (1, 1)
+        PageCounter.rollup()
 
         page_counter = PageCounter.objects.get(_id=page_counter_id)
         assert page_counter.total == 1
         assert page_counter.unique == 1
 
         PageCounter.update_counter(page_counter_id, {})
+        PageCounter.rollup()
 
         page_counter.refresh_from_db()
         assert page_counter.total == 2
         assert page_counter.unique == 1
+        assert not PageCounterEvent.objects.exists()
 
     @mock.patch('osf.models.analytics.session')
     def test_download_update_counter_contributor(self, mock_session, user, project, file_node):
@@ -113,11 +160,13 @@ class TestPageCounter:
         page_counter_id = 'download:{}:{}'.format(project._id, file_node.id)
 
         PageCounter.update_counter(page_counter_id, {'contributors': project.contributors})
+        PageCounter.rollup()
         page_counter = PageCounter.objects.get(_id=page_counter_id)
         assert page_counter.total == 0
         assert page_counter.unique == 0
 
         PageCounter.update_counter(page_counter_id, {'contributors': project.contributors})
+        PageCounter.rollup()
 
         page_counter.refresh_from_db()
         assert page_counter.total == 0
@@ -151,6 +200,59 @@ class TestPageCounter:
 
         assert total_downloads == 45
 
+    @mock.patch('osf.models.analytics.session')
+    def test_rollup_per_day(self, mock_session, project, file_node):
+        page_counter_id = 'download:{}:{}'.format(project._id, file_node.id)
+        for visitor in ('a', 'b', 'a'):
+            mock_session.data = {'auth_user_id': visitor}
+            PageCounter.update_counter(page_counter_id, {})
+        assert PageCounter.rollup() == 3
+
+        today = timezone.now().date()
+        day = PageCounterDay.objects.get(page=page_counter_id, date=today)
+        assert day.total == 3
+        assert day.unique == 2
+        assert PageCounter.get_all_downloads_on_date(timezone.now()) == 3
+
+        mock_session.data = {'auth_user_id': 'c'}
+        PageCounter.update_counter(page_counter_id, {})
+        PageCounter.rollup()
+        day.refresh_from_db()
+        assert day.total == 4
+        assert day.unique == 3
+        assert PageCounter.get_basic_counters(page_counter_id) == (3, 4)
+
+    @mock.patch('osf.models.analytics.session')
+    def test_update_counter_does_not_save_session(self, mock_session, project, file_node):
+        mock_session.data = {}
+        PageCounter.update_counter('download:{}:{}'.format(project._id, file_node.id), {})
+        assert not mock_session.save.called
+        assert 'visited' not in mock_session.data
+
+
+class TestHyperLogLog:
+
+    def test_count(self):
+        sketch = HyperLogLog()
+        assert sketch.count() == 0
+        sketch.update(str(i) for i in range(10000))
+        assert abs(sketch.count() - 10000) < 1000
+
+    def test_duplicates(self):
+        sketch = HyperLogLog()
+        sketch.update(['a', u'a', 'b', 'a'])
+        assert sketch.count() == 2
+
+    def test_serialize_and_merge(self):
+        first = HyperLogLog()
+        first.update(str(i) for i in range(100))
+        second = HyperLogLog(first.to_bytes())
+        assert second.count() == first.count()
+        other = HyperLogLog()
+        other.update(str(i) for i in range(50, 150))
+        second.merge(other)
+        assert abs(second.count() - 150) < 15
+
 
 class TestPageCounterRegex:
 
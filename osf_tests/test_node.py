@@ -1,5 +1,7 @@
 import datetime
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 import mock
 import pytest
@@ -789,6 +791,15 @@ class TestLogging:
         # updates node.modified
         assert_datetime_equal(node.modified, last_log.date)
 
+    def test_add_log_sets_last_logged_to_most_recent_log(self, node, auth):
+        latest = node.add_log(NodeLog.EMBARGO_INITIATED, params={'node': node._id}, auth=auth)
+        node.add_log(
+            NodeLog.PROJECT_CREATED, params={'node': node._id}, auth=auth,
+            log_date=latest.date - datetime.timedelta(days=1),
+        )
+
+        assert_datetime_equal(node.last_logged, latest.date)
+
 
 class TestTagging:
 
@@ -1181,6 +1192,82 @@ class TestContributorMethods:
         assert node.get_permissions(user2) == []
         assert node.logs.latest().action == 'contributor_removed'
 
+    @mock.patch('website.project.tasks.on_contributors_changed')
+    def test_bulk_add_contributors(self, mock_changed, node, user, auth):
+        users = [UserFactory() for _ in range(5)]
+        n_logs = node.logs.count()
+        added = node.bulk_add_contributors(
+            [{'user': each, 'permissions': WRITE, 'visible': True} for each in users[:4]] +
+            [{'user': users[4], 'permissions': ADMIN, 'visible': False}],
+            auth=auth, save=True,
+        )
+        assert added == users
+        assert list(node.contributors) == [user] + users
+        assert set(node.get_permissions(users[0])) == set([permissions.READ, permissions.WRITE])
+        assert set(node.get_permissions(users[4])) == set([permissions.READ, permissions.WRITE, permissions.ADMIN])
+        assert users[4]._id not in node.visible_contributor_ids
+
+        assert node.logs.count() == n_logs + 1
+        assert node.logs.latest().action == NodeLog.CONTRIB_ADDED
+        assert node.logs.latest().params['contributors'] == [each._id for each in users]
+        # a single task for the side effects of all the contributors
+        assert mock_changed.call_count == 1
+        assert mock_changed.call_args[0][2] == dict(
+            [(each._id, WRITE) for each in users[:4]] + [(users[4]._id, ADMIN)]
+        )
+
+    @mock.patch('website.project.tasks.on_contributors_changed')
+    def test_bulk_add_contributors_existing_contributor(self, mock_changed, node, auth):
+        user1, user2 = UserFactory(), UserFactory()
+        node.add_contributor(user1, permissions=WRITE, auth=auth, save=True)
+        added = node.bulk_add_contributors([
+            {'user': user1, 'permissions': ADMIN, 'visible': True},
+            {'user': user2, 'permissions': WRITE, 'visible': True},
+        ], auth=auth, save=True)
+        assert added == [user2]
+        assert node.has_permission(user1, ADMIN)
+        assert node.contributor_set.filter(user=user1).count() == 1
+
+    def test_bulk_add_contributors_sends_contributor_added_signal(self, node, auth):
+        with capture_signals() as mock_signals:
+            node.bulk_add_contributors([{'user': UserFactory(), 'permissions': WRITE, 'visible': True}], auth=auth)
+        assert mock_signals.signals_sent() == set([contributor_added])
+
+    def test_bulk_add_contributors_side_effects(self, node, user, auth):
+        user1 = UserFactory()
+        with mock.patch('nii.mapcore.mapcore_sync_is_enabled', return_value=True), \
+                mock.patch('nii.mapcore.mapcore_sync_map_group') as mock_sync_map_group:
+            node.bulk_add_contributors([{'user': user1, 'permissions': WRITE, 'visible': True}], auth=auth)
+        assert user1 in user.recently_added.all()
+        mock_sync_map_group.assert_called_once_with(user, node)
+
+    def test_bulk_add_contributors_unreg_user_without_unclaimed_records(self, node, auth):
+        with pytest.raises(UserStateError):
+            node.bulk_add_contributors([{'user': UnregUserFactory(), 'permissions': WRITE, 'visible': True}], auth=auth)
+
+    def test_bulk_remove_contributors(self, node, user, auth):
+        users = [UserFactory() for _ in range(3)]
+        node.bulk_add_contributors(
+            [{'user': each, 'permissions': WRITE, 'visible': True} for each in users], auth=auth, save=True,
+        )
+        with disconnected_from_listeners(contributor_removed):
+            node.bulk_remove_contributors(users[:2], auth=auth, save=True)
+        node.reload()
+        assert list(node.contributors) == [user, users[2]]
+        assert node.get_permissions(users[0]) == []
+        assert node.logs.latest().action == NodeLog.CONTRIB_REMOVED
+        assert node.logs.latest().params['contributors'] == [users[0]._id, users[1]._id]
+
+    def test_bulk_remove_contributors_keeps_an_admin(self, node, user, auth):
+        user1 = UserFactory()
+        node.bulk_add_contributors([{'user': user1, 'permissions': WRITE, 'visible': True}], auth=auth, save=True)
+        with pytest.raises(NodeStateError):
+            node.bulk_remove_contributors([user, user1], auth=auth)
+        with pytest.raises(NodeStateError):
+            node.bulk_remove_contributors([user], auth=auth)
+        assert node.is_contributor(user)
+        assert node.is_contributor(user1)
+
     def test_replace_contributor(self, node):
         contrib = UserFactory()
         node.add_contributor(contrib, auth=Auth(node.creator))
@@ -3082,6 +3169,57 @@ class TestForkNode:
         # 'node' param is the original node's ID
         assert last_log.params['node'] == node._id
 
+    def test_clone_logs_copies_every_log_in_chunks(self, node, auth):
+        for i in range(5):
+            node.add_tag('tag-{}'.format(i), auth=auth, save=False)
+        node.save()
+        target = ProjectFactory(creator=auth.user)
+        original_logs = list(node.logs.order_by('pk').values_list('action', 'date', 'user_id', 'original_node_id'))
+        existing_pks = list(target.logs.values_list('pk', flat=True))
+
+        node.clone_logs(target, page_size=2)
+
+        cloned_logs = target.logs.exclude(pk__in=existing_pks).order_by('pk').values_list('action', 'date', 'user_id', 'original_node_id')
+        assert list(cloned_logs) == original_logs
+        _ids = list(target.logs.values_list('_id', flat=True))
+        assert len(set(_ids)) == len(_ids)
+        assert all(len(_id) == 24 for _id in _ids)
+
+    def test_fork_with_components_query_count_does_not_grow_with_logs(self, user, auth):
+        project = ProjectFactory(creator=user)
+        NodeFactory(creator=user, parent=project)
+        NodeFactory(creator=user, parent=project)
+        with mock.patch.object(Node, 'bulk_update_search'):
+            # Warm up the per-process caches (content types, permissions)
+            project.fork_node(auth=auth)
+            with CaptureQueriesContext(connection) as ctx:
+                project.fork_node(auth=auth)
+            queries = len(ctx.captured_queries)
+
+            for node in project.node_and_primary_descendants():
+                for i in range(20):
+                    node.add_log(NodeLog.EDITED_DESCRIPTION, params={'node': node._id}, auth=auth, save=False)
+            with CaptureQueriesContext(connection) as ctx:
+                fork = project.fork_node(auth=auth)
+
+        assert len(ctx.captured_queries) == queries
+        assert fork.logs.count() == project.logs.count() + 1
+        for child in fork.nodes:
+            assert child.logs.count() == child.forked_from.logs.count() + 1
+
+    def test_fork_copies_node_links(self, project, user, auth):
+        pointees = [ProjectFactory(), ProjectFactory(), ProjectFactory()]
+        for pointee in pointees:
+            project.add_pointer(pointee, auth=auth)
+        pointees[1].is_deleted = True
+        pointees[1].save()
+
+        with mock.patch.object(Node, 'bulk_update_search'):
+            fork = project.fork_node(auth=auth)
+
+        assert set(fork.nodes_pointer.all()) == {pointees[0], pointees[2]}
+        assert all(len(relation._id) == 24 for relation in fork.node_relations.filter(is_node_link=True))
+
     def test_not_fork_private_link(self, node, auth):
         link = PrivateLinkFactory()
         link.nodes.add(node)
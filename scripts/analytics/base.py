@@ -1,11 +1,16 @@
+import os
+import csv
+import json
 import time
 import logging
 import argparse
 import importlib
 from datetime import datetime, timedelta
 from dateutil.parser import parse
+from django.db.models import Case, Count, IntegerField, Sum, Value, When
 from django.utils import timezone
 
+from addons.base.utils import run_in_threads
 from website.app import init_app
 from website.settings import KEEN as keen_settings
 from keen.client import KeenClient
@@ -15,8 +20,88 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
+def _count_aggregates(conditions):
+    aggregates = {}
+    for name, condition in conditions.items():
+        if condition is None:
+            aggregates[name] = Count('pk')
+        else:
+            aggregates[name] = Sum(Case(When(condition, then=Value(1)), default=Value(0), output_field=IntegerField()))
+    return aggregates
+
+
+def count_where(queryset, conditions):
+    """Count the rows of the queryset matching each condition, in one query.
+
+    :param dict conditions: name -> Q of the rows to count, None for all rows
+    :return dict: name -> count
+    """
+    counts = queryset.aggregate(**_count_aggregates(conditions))
+    return {name: counts[name] or 0 for name in conditions}
+
+
+def count_where_by(queryset, field, conditions):
+    """Same as count_where for each value of `field`, in one query.
+
+    :return dict: value of field -> name -> count
+    """
+    rows = queryset.order_by().values(field).annotate(**_count_aggregates(conditions))
+    return {row[field]: {name: row[name] or 0 for name in conditions} for row in rows}
+
+
+def scoped(prefix, conditions, scope=None):
+    """Prefix the names of the conditions and restrict them to the `scope` Q."""
+    result = {}
+    for name, condition in conditions.items():
+        if scope is not None:
+            condition = scope if condition is None else scope & condition
+        result['{}_{}'.format(prefix, name)] = condition
+    return result
+
+
+def unscoped(prefix, counts):
+    """The counts of `prefix` from the result of the scoped conditions."""
+    prefix += '_'
+    return {name[len(prefix):]: count for name, count in counts.items() if name.startswith(prefix)}
+
+
+def _flatten(event, prefix=''):
+    row = {}
+    for key, value in event.items():
+        if isinstance(value, dict):
+            row.update(_flatten(value, prefix + key + '.'))
+        else:
+            row[prefix + key] = value
+    return row
+
+
+def write_events(directory, output_format, collection_name, events):
+    """Append the events to <directory>/<collection_name>.jsonl or .csv."""
+    if not events:
+        return
+    if output_format == 'csv':
+        path = os.path.join(directory, collection_name + '.csv')
+        rows = [_flatten(event) for event in events]
+        is_new = not os.path.exists(path)
+        with open(path, 'ab') as f:
+            writer = csv.DictWriter(f, fieldnames=sorted(rows[0].keys()), extrasaction='ignore')
+            if is_new:
+                writer.writeheader()
+            for row in rows:
+                writer.writerow({key: unicode(value).encode('utf-8') for key, value in row.items()})
+    else:
+        path = os.path.join(directory, collection_name + '.jsonl')
+        with open(path, 'a') as f:
+            for event in events:
+                f.write(json.dumps(event, sort_keys=True) + '\n')
+    logger.info('Wrote {} events to {}'.format(len(events), path))
+
+
 class BaseAnalytics(object):
 
+    # (directory, format) of a local copy of the events, see write_events
+    output = None
+
     @property
     def collection_name(self):
         raise NotImplementedError('Must specify a Keen event collection name')
@@ -29,6 +114,8 @@ class BaseAnalytics(object):
         raise NotImplementedError('You must define a get_events method to gather analytic events')
 
     def send_events(self, events):
+        if self.output is not None:
+            write_events(self.output[0], self.output[1], self.collection_name, events)
         keen_project = keen_settings['private']['project_id']
         write_key = keen_settings['private']['write_key']
         if keen_project and write_key:
@@ -38,7 +125,7 @@ class BaseAnalytics(object):
             )
             logger.info('Adding {} events to the {} collection'.format(len(events), self.collection_name))
             client.add_events({self.collection_name: events})
-        else:
+        elif self.output is None:
             logger.info('Keen not enabled - would otherwise be adding the following {} events to the {} collection'.format(len(events), self.collection_name))
             print(events)
 
@@ -105,6 +192,8 @@ class EventAnalytics(SummaryAnalytics):
             yield events[i:i + 5000]
 
     def send_events(self, events):
+        if self.output is not None:
+            write_events(self.output[0], self.output[1], self.collection_name, events)
         keen_project = keen_settings['private']['project_id']
         write_key = keen_settings['private']['write_key']
         if keen_project and write_key:
@@ -118,7 +207,7 @@ class EventAnalytics(SummaryAnalytics):
                 client.add_events({self.collection_name: chunk})
                 time.sleep(1)
 
-        else:
+        elif self.output is None:
             logger.info(
                 'Keen not enabled - would otherwise be adding the following {} events to the {} collection'.format(
                     len(events), self.collection_name
@@ -183,9 +272,16 @@ class DateAnalyticsHarness(BaseAnalyticsHarness):
         )
         parser.add_argument('-d', '--date', dest='date', required=False)
         parser.add_argument('-y', '--yesterday', dest='yesterday', action='store_true')
+        parser.add_argument('-e', '--end-date', dest='end_date', required=False,
+                            help='Backfill every date from --date to this date, inclusive')
+        parser.add_argument('-o', '--output', dest='output', required=False,
+                            help='Also write the events to files in this directory')
+        parser.add_argument('-f', '--format', dest='output_format', choices=['json', 'csv'], default='json')
+        parser.add_argument('-p', '--parallel', dest='parallel', type=int, default=1,
+                            help='Number of analytics classes run at a time')
         return parser.parse_args()
 
-    def main(self, date=None, yesterday=False, command_line=True):
+    def main(self, date=None, yesterday=False, command_line=True, end_date=None, output=None, parallel=1):
         analytics_classes = self.analytics_classes
         if yesterday:
             date = (timezone.now() - timedelta(days=1)).date()
@@ -201,8 +297,22 @@ class DateAnalyticsHarness(BaseAnalyticsHarness):
                     raise AttributeError('You must either specify a date or use the yesterday argument to gather analytics for yesterday.')
             if args.analytics_scripts:
                 analytics_classes = self.try_to_import_from_args(args.analytics_scripts)
+            if args.end_date:
+                end_date = parse(args.end_date).date()
+            if args.output:
+                output = (args.output, args.output_format)
+            parallel = args.parallel
 
-        for analytics_class in analytics_classes:
+        dates = [date]
+        while end_date and dates[-1] < end_date:
+            dates.append(dates[-1] + timedelta(days=1))
+
+        def run(analytics_class):
             class_instance = analytics_class()
-            events = class_instance.get_events(date)
-            class_instance.send_events(events)
+            class_instance.output = output
+            for day in dates:
+                events = class_instance.get_events(day)
+                class_instance.send_events(events)
+
+        # the summaries are independent of each other
+        run_in_threads(run, list(analytics_classes), parallel)
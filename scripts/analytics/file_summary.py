@@ -10,7 +10,7 @@ from django.utils import timezone
 
 from osf.models import AbstractNode, Preprint
 from website.app import init_app
-from scripts.analytics.base import SummaryAnalytics
+from scripts.analytics.base import SummaryAnalytics, count_where
 
 
 logger = logging.getLogger(__name__)
@@ -46,19 +46,21 @@ class FileSummary(SummaryAnalytics):
 
         daily_query = Q(created__gte=timestamp_datetime)
 
+        counts = count_where(file_qs.all(), {
+            'total': None,
+            'public': public_query,
+            'private': private_query,
+            'total_daily': daily_query,
+            'public_daily': public_query & daily_query,
+            'private_daily': private_query & daily_query,
+        })
+
         totals = {
             'keen': {
                 'timestamp': timestamp_datetime.isoformat()
             },
             # OsfStorageFiles - the number of files on OsfStorage
-            'osfstorage_files_including_quickfiles': {
-                'total': file_qs.count(),
-                'public': file_qs.filter(public_query).count(),
-                'private': file_qs.filter(private_query).count(),
-                'total_daily': file_qs.filter(daily_query).count(),
-                'public_daily': file_qs.filter(public_query & daily_query).count(),
-                'private_daily': file_qs.filter(private_query & daily_query).count(),
-            },
+            'osfstorage_files_including_quickfiles': counts,
         }
 
         logger.info(
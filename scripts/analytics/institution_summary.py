@@ -6,13 +6,13 @@ import logging
 from dateutil.parser import parse
 from datetime import datetime, timedelta
 
-from django.db.models import Q
+from django.db.models import F, Q
 from django.utils import timezone
 
 from framework.encryption import ensure_bytes
-from osf.models import Institution
+from osf.models import AbstractNode, Institution, OSFUser
 from website.app import init_app
-from scripts.analytics.base import SummaryAnalytics
+from scripts.analytics.base import SummaryAnalytics, count_where_by, scoped, unscoped
 
 
 logger = logging.getLogger(__name__)
@@ -42,60 +42,64 @@ class InstitutionSummary(SummaryAnalytics):
         # `embargoed_v2` uses future embargo end dates on root
         embargo_v2_query = Q(root__embargo__end_date__gt=query_datetime)
 
-        for institution in institutions:
-            node_qs = institution.nodes.filter(is_deleted=False, created__lt=query_datetime).exclude(type='osf.registration')
-            registration_qs = institution.nodes.filter(is_deleted=False, created__lt=query_datetime, type='osf.registration')
+        # Same rows as get_roots(), as a condition of the rows to count
+        root_query = Q(id=F('root_id')) & ~Q(type__in=['osf.collection', 'osf.quickfilesnode'])
+        registration_query = Q(type='osf.registration')
+
+        node_conditions = {
+            'total': None,
+            'public': public_query,
+            'private': private_query,
+
+            'total_daily': daily_query,
+            'public_daily': public_query & daily_query,
+            'private_daily': private_query & daily_query,
+        }
+        registration_conditions = {
+            'total': None,
+            'public': public_query,
+            'embargoed': private_query,
+            'embargoed_v2': private_query & embargo_v2_query,
+
+            'total_daily': daily_query,
+            'public_daily': public_query & daily_query,
+            'embargoed_daily': private_query & daily_query,
+            'embargoed_v2_daily': private_query & daily_query & embargo_v2_query,
+        }
+        conditions = {}
+        conditions.update(scoped('nodes', node_conditions, ~registration_query))
+        # Projects are the root nodes, as with get_roots
+        conditions.update(scoped('projects', node_conditions, ~registration_query & root_query))
+        conditions.update(scoped('registered_nodes', registration_conditions, registration_query))
+        conditions.update(scoped('registered_projects', registration_conditions, registration_query & root_query))
+
+        # The counts of all the institutions, in one query for the nodes and one for the users
+        node_counts = count_where_by(
+            AbstractNode.objects.filter(affiliated_institutions__isnull=False, is_deleted=False, created__lt=query_datetime),
+            'affiliated_institutions', conditions,
+        )
+        user_counts = count_where_by(
+            OSFUser.objects.filter(affiliated_institutions__isnull=False),
+            'affiliated_institutions', {
+                'total': Q(is_active=True),
+                'total_daily': Q(date_confirmed__gte=timestamp_datetime, date_confirmed__lt=query_datetime),
+            },
+        )
+        no_nodes = dict.fromkeys(conditions, 0)
+        no_users = {'total': 0, 'total_daily': 0}
 
+        for institution in institutions:
+            institution_counts = node_counts.get(institution.id, no_nodes)
             count = {
                 'institution': {
                     'id': institution._id,
                     'name': institution.name,
                 },
-                'users': {
-                    'total': institution.osfuser_set.filter(is_active=True).count(),
-                    'total_daily': institution.osfuser_set.filter(date_confirmed__gte=timestamp_datetime, date_confirmed__lt=query_datetime).count(),
-                },
-                'nodes': {
-                    'total': node_qs.count(),
-                    'public': node_qs.filter(public_query).count(),
-                    'private': node_qs.filter(private_query).count(),
-
-                    'total_daily': node_qs.filter(daily_query).count(),
-                    'public_daily': node_qs.filter(public_query & daily_query).count(),
-                    'private_daily': node_qs.filter(private_query & daily_query).count(),
-                },
-                # Projects use get_roots to remove children
-                'projects': {
-                    'total': node_qs.get_roots().count(),
-                    'public': node_qs.filter(public_query).get_roots().count(),
-                    'private': node_qs.filter(private_query).get_roots().count(),
-
-                    'total_daily': node_qs.filter(daily_query).get_roots().count(),
-                    'public_daily': node_qs.filter(public_query & daily_query).get_roots().count(),
-                    'private_daily': node_qs.filter(private_query & daily_query).get_roots().count(),
-                },
-                'registered_nodes': {
-                    'total': registration_qs.count(),
-                    'public': registration_qs.filter(public_query).count(),
-                    'embargoed': registration_qs.filter(private_query).count(),
-                    'embargoed_v2': registration_qs.filter(private_query & embargo_v2_query).count(),
-
-                    'total_daily': registration_qs.filter(daily_query).count(),
-                    'public_daily': registration_qs.filter(public_query & daily_query).count(),
-                    'embargoed_daily': registration_qs.filter(private_query & daily_query).count(),
-                    'embargoed_v2_daily': registration_qs.filter(private_query & daily_query & embargo_v2_query).count(),
-                },
-                'registered_projects': {
-                    'total': registration_qs.get_roots().count(),
-                    'public': registration_qs.filter(public_query).get_roots().count(),
-                    'embargoed': registration_qs.filter(private_query).get_roots().count(),
-                    'embargoed_v2': registration_qs.filter(private_query & embargo_v2_query).get_roots().count(),
-
-                    'total_daily': registration_qs.filter(daily_query).get_roots().count(),
-                    'public_daily': registration_qs.filter(public_query & daily_query).get_roots().count(),
-                    'embargoed_daily': registration_qs.filter(private_query & daily_query).get_roots().count(),
-                    'embargoed_v2_daily': registration_qs.filter(private_query & daily_query & embargo_v2_query).get_roots().count(),
-                },
+                'users': user_counts.get(institution.id, no_users),
+                'nodes': unscoped('nodes', institution_counts),
+                'projects': unscoped('projects', institution_counts),
+                'registered_nodes': unscoped('registered_nodes', institution_counts),
+                'registered_projects': unscoped('registered_projects', institution_counts),
                 'keen': {
                     'timestamp': timestamp_datetime.isoformat()
                 }
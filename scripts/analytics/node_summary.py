@@ -1,7 +1,7 @@
 import django
 django.setup()
 
-from django.db.models import Q
+from django.db.models import F, Q
 import pytz
 import logging
 from dateutil.parser import parse
@@ -9,7 +9,7 @@ from datetime import datetime, timedelta
 from django.utils import timezone
 
 from website.app import init_app
-from scripts.analytics.base import SummaryAnalytics
+from scripts.analytics.base import SummaryAnalytics, count_where, scoped, unscoped
 
 
 logger = logging.getLogger(__name__)
@@ -47,59 +47,54 @@ class NodeSummary(SummaryAnalytics):
 
         exclude_spam = ~Q(spam_status__in=[SpamStatus.SPAM, SpamStatus.FLAGGED])
 
+        # Same rows as get_roots(), as a condition of the rows to count
+        root_query = Q(id=F('root_id')) & ~Q(type__in=['osf.collection', 'osf.quickfilesnode'])
+
+        node_conditions = {
+            'total': None,
+            'total_excluding_spam': exclude_spam,
+            'public': public_query,
+            'private': private_query,
+            'total_daily': daily_query,
+            'total_daily_excluding_spam': daily_query & exclude_spam,
+            'public_daily': public_query & daily_query,
+            'private_daily': private_query & daily_query,
+        }
+        registration_conditions = {
+            'total': None,
+            'public': public_query,
+            'embargoed': private_query,
+            'embargoed_v2': private_query & embargo_v2_query,
+            'withdrawn': retracted_query,
+            'total_daily': daily_query,
+            'public_daily': public_query & daily_query,
+            'embargoed_daily': private_query & daily_query,
+            'embargoed_v2_daily': private_query & daily_query & embargo_v2_query,
+            'withdrawn_daily': retracted_query & daily_query,
+        }
+
+        # One query for the nodes and projects, one for the registrations
+        node_counts = count_where(node_qs, dict(
+            scoped('nodes', node_conditions),
+            **scoped('projects', node_conditions, root_query)
+        ))
+        registration_counts = count_where(registration_qs, dict(
+            scoped('registered_nodes', registration_conditions),
+            **scoped('registered_projects', registration_conditions, root_query)
+        ))
+
         totals = {
             'keen': {
                 'timestamp': timestamp_datetime.isoformat()
             },
             # Nodes - the number of projects and components
-            'nodes': {
-                'total': node_qs.count(),
-                'total_excluding_spam': node_qs.filter(exclude_spam).count(),
-                'public': node_qs.filter(public_query).count(),
-                'private': node_qs.filter(private_query).count(),
-                'total_daily': node_qs.filter(daily_query).count(),
-                'total_daily_excluding_spam': node_qs.filter(daily_query).filter(exclude_spam).count(),
-                'public_daily': node_qs.filter(public_query & daily_query).count(),
-                'private_daily': node_qs.filter(private_query & daily_query).count(),
-            },
+            'nodes': unscoped('nodes', node_counts),
             # Projects - the number of top-level only projects
-            'projects': {
-                'total': node_qs.get_roots().count(),
-                'total_excluding_spam': node_qs.get_roots().filter(exclude_spam).count(),
-                'public': node_qs.filter(public_query).get_roots().count(),
-                'private': node_qs.filter(private_query).get_roots().count(),
-                'total_daily': node_qs.filter(daily_query).get_roots().count(),
-                'total_daily_excluding_spam': node_qs.filter(daily_query).get_roots().filter(exclude_spam).count(),
-                'public_daily': node_qs.filter(public_query & daily_query).get_roots().count(),
-                'private_daily': node_qs.filter(private_query & daily_query).get_roots().count(),
-            },
+            'projects': unscoped('projects', node_counts),
             # Registered Nodes - the number of registered projects and components
-            'registered_nodes': {
-                'total': registration_qs.count(),
-                'public': registration_qs.filter(public_query).count(),
-                'embargoed': registration_qs.filter(private_query).count(),
-                'embargoed_v2': registration_qs.filter(private_query & embargo_v2_query).count(),
-                'withdrawn': registration_qs.filter(retracted_query).count(),
-                'total_daily': registration_qs.filter(daily_query).count(),
-                'public_daily': registration_qs.filter(public_query & daily_query).count(),
-                'embargoed_daily': registration_qs.filter(private_query & daily_query).count(),
-                'embargoed_v2_daily': registration_qs.filter(private_query & daily_query & embargo_v2_query).count(),
-                'withdrawn_daily': registration_qs.filter(retracted_query & daily_query).count(),
-
-            },
+            'registered_nodes': unscoped('registered_nodes', registration_counts),
             # Registered Projects - the number of registered top level projects
-            'registered_projects': {
-                'total': registration_qs.get_roots().count(),
-                'public': registration_qs.filter(public_query).get_roots().count(),
-                'embargoed': registration_qs.filter(private_query).get_roots().count(),
-                'embargoed_v2': registration_qs.filter(private_query & embargo_v2_query).get_roots().count(),
-                'withdrawn': registration_qs.filter(retracted_query).get_roots().count(),
-                'total_daily': registration_qs.filter(daily_query).get_roots().count(),
-                'public_daily': registration_qs.filter(public_query & daily_query).get_roots().count(),
-                'embargoed_daily': registration_qs.filter(private_query & daily_query).get_roots().count(),
-                'embargoed_v2_daily': registration_qs.filter(private_query & daily_query & embargo_v2_query).get_roots().count(),
-                'withdrawn_daily': registration_qs.filter(retracted_query & daily_query).get_roots().count(),
-            }
+            'registered_projects': unscoped('registered_projects', registration_counts),
         }
 
         logger.info(
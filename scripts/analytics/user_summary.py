@@ -9,16 +9,15 @@ import requests
 
 from dateutil.parser import parse
 from datetime import datetime, timedelta
-from django.db.models import Q
+from django.db.models import Count, Exists, OuterRef, Q
 from django.utils import timezone
 from keen import exceptions as keen_exceptions
 
 from osf.models import OSFUser
 from website.app import init_app
 from website import settings
-from framework.database import paginated
 from framework import sentry
-from scripts.analytics.base import SummaryAnalytics
+from scripts.analytics.base import SummaryAnalytics, count_where
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -37,6 +36,20 @@ def count_user_logs(user):
     return length
 
 
+def count_depth_users(user_qs):
+    """Count the users with at least LOG_THRESHOLD logs, as count_user_logs does.
+
+    The logs are counted by the database, only the users with exactly
+    LOG_THRESHOLD logs are loaded to check their first log.
+    """
+    user_qs = user_qs.order_by().annotate(log_count=Count('logs'))
+    depth_users = user_qs.filter(log_count__gt=LOG_THRESHOLD).count()
+    for user in user_qs.filter(log_count=LOG_THRESHOLD).iterator():
+        if count_user_logs(user) >= LOG_THRESHOLD:
+            depth_users += 1
+    return depth_users
+
+
 class UserSummary(SummaryAnalytics):
 
     @property
@@ -87,32 +100,28 @@ class UserSummary(SummaryAnalytics):
             Q(date_confirmed__lt=query_datetime)
         )
 
-        active_users = 0
-        depth_users = 0
-        profile_edited = 0
-        user_pages = paginated(OSFUser, query=active_user_query)
-        for user in user_pages:
-            active_users += 1
-            log_count = count_user_logs(user)
-            if log_count >= LOG_THRESHOLD:
-                depth_users += 1
-            if user.social or user.schools or user.jobs:
-                profile_edited += 1
-        new_users = OSFUser.objects.filter(is_active=True, date_confirmed__gte=timestamp_datetime, date_confirmed__lt=query_datetime)
+        daily_query = Q(date_confirmed__gte=timestamp_datetime, date_confirmed__lt=query_datetime)
+        profile_edited_query = ~Q(social={}) | ~Q(schools=[]) | ~Q(jobs=[])
+
+        # Exists rather than a join on the institutions, which would count a user once per institution
+        users = OSFUser.objects.annotate(has_institution=Exists(
+            OSFUser.affiliated_institutions.through.objects.filter(osfuser_id=OuterRef('pk'))
+        ))
+        status = count_where(users, {
+            'active': active_user_query,
+            'new_users_daily': Q(is_active=True) & daily_query,
+            'new_users_with_institution_daily': Q(is_active=True, has_institution=True) & daily_query,
+            'unconfirmed': Q(date_registered__lt=query_datetime, date_confirmed__isnull=True),
+            'deactivated': Q(date_disabled__isnull=False, date_disabled__lt=query_datetime),
+            'merged': Q(date_registered__lt=query_datetime, merged_by__isnull=False),
+            'profile_edited': active_user_query & profile_edited_query,
+        })
+        status['depth'] = count_depth_users(OSFUser.objects.filter(active_user_query))
         counts = {
             'keen': {
                 'timestamp': timestamp_datetime.isoformat()
             },
-            'status': {
-                'active': active_users,
-                'depth': depth_users,
-                'new_users_daily': new_users.count(),
-                'new_users_with_institution_daily': new_users.filter(affiliated_institutions__isnull=False).count(),
-                'unconfirmed': OSFUser.objects.filter(date_registered__lt=query_datetime, date_confirmed__isnull=True).count(),
-                'deactivated': OSFUser.objects.filter(date_disabled__isnull=False, date_disabled__lt=query_datetime).count(),
-                'merged': OSFUser.objects.filter(date_registered__lt=query_datetime, merged_by__isnull=False).count(),
-                'profile_edited': profile_edited,
-            }
+            'status': status,
         }
 
         try:
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Measure the startup time of the application and the import cost of each add-on.
+
+Every measurement runs in a fresh Python process, so that nothing is already
+imported:
+
+* ``django.setup`` (the add-on apps and models, with the add-on routes deferred),
+* ``init_app(routes=False)`` with and without ``settings.LAZY_ADDON_LOADING``,
+  which is what the API, admin, celery workers and scripts pay,
+* ``init_app(routes=True)``, which is what the web app pays,
+* ``website.routes``, the views of the web app that several add-ons import,
+* for each add-on, importing its routes and views and adding its rules to the
+  Flask app, after ``django.setup`` and ``website.routes``.
+::
+
+    python -m scripts.benchmark_startup --repeat 5
+    python -m scripts.benchmark_startup --addon github --addon wiki
+
+The median of the runs is reported in milliseconds.
+"""
+from __future__ import print_function, absolute_import
+
+import sys
+import json
+import time
+import argparse
+import importlib
+import subprocess
+
+RESULT_PREFIX = 'STARTUP-BENCHMARK '
+STARTUP_TARGETS = ('django.setup', 'init_app.lazy', 'init_app.eager', 'init_app.routes', 'website.routes')
+
+
+def _measure(target):
+    """Run in the child process: time ``target`` and return milliseconds."""
+    from website import settings
+    from website.app import init_app, setup_django
+
+    settings.LAZY_ADDON_LOADING = target != 'init_app.eager'
+    if target.startswith('init_app.'):
+        start = time.time()
+        init_app(set_backends=False, routes=target == 'init_app.routes', attach_request_handlers=False)
+        return (time.time() - start) * 1000
+
+    start = time.time()
+    setup_django()
+    if target == 'django.setup':
+        return (time.time() - start) * 1000
+
+    start = time.time()
+    importlib.import_module('website.routes')
+    if target == 'website.routes':
+        return (time.time() - start) * 1000
+
+    from django.apps import apps
+    try:
+        addon = apps.get_app_config('addons_{}'.format(target.split(':', 1)[1]))
+    except LookupError:  # requested in addons.json but not installed
+        return None
+    start = time.time()
+    addon.load_routes()
+    return (time.time() - start) * 1000
+
+
+def run(target, repeat):
+    """Median in milliseconds of ``repeat`` fresh processes measuring ``target``."""
+    results = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-m', 'scripts.benchmark_startup', '--measure', target])
+        for line in output.splitlines():
+            if line.startswith(RESULT_PREFIX):
+                results.append(float(line[len(RESULT_PREFIX):]))
+    if not results:
+        return None
+    results.sort()
+    return results[len(results) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=3, help='processes per measurement')
+    parser.add_argument('--addon', action='append', dest='addons', help='add-ons to measure, all by default')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        elapsed = _measure(args.measure)
+        if elapsed is not None:
+            print('{}{:.1f}'.format(RESULT_PREFIX, elapsed))
+        return
+
+    results = {}
+    for target in STARTUP_TARGETS:
+        results[target] = run(target, args.repeat)
+    from website import settings
+    addons = {}
+    for name in args.addons or settings.ADDONS_REQUESTED:
+        elapsed = run('addon:{}'.format(name), args.repeat)
+        if elapsed is not None:
+            addons[name] = elapsed
+
+    if args.json:
+        print(json.dumps({'startup': results, 'addons': addons}, indent=2, sort_keys=True))
+        return
+    for target in STARTUP_TARGETS:
+        print('{:<28}{:>10.1f} ms'.format(target, results[target]))
+    print()
+    print('{:<28}{:>10}'.format('add-on routes and views', ''))
+    for name, elapsed in sorted(addons.items(), key=lambda item: -item[1]):
+        print('{:<28}{:>10.1f} ms'.format(name, elapsed))
+    print('{:<28}{:>10.1f} ms'.format('total', sum(addons.values())))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,113 +1,273 @@
 #!/usr/bin/env python
 # encoding: utf-8
-"""Load testing for file upload, listing, and download with OSF Storage.
+"""Load tests of the hot paths of RDM.
+
+Scenarios, run in parallel by locust users with different weights:
+
+* timestamps: the timestamp page of the large project, the verification of
+  all of its files and of single files
+* quota: the quota of the creator, from the browser and from WaterButler
+* search
+* API v2 lists of nodes and of contributors, with embedded contributors
+* WaterButler callbacks: the auth endpoint and the file logs
+* the notification digest, run in-process as it has no HTTP endpoint
+
+Set up::
+
+    python -m scripts.loadtest.seed            # writes scripts/loadtest/fixture.json
+    python -m scripts.loadtest.stubs           # WaterButler and TSA stand-ins
+
+and run the web and API servers with QUERY_COUNT_HEADER = True, then::
+
+    locust -f scripts/loadtest/locustfile.py
+
+LOADTEST_FIXTURE overrides the path of the fixture. When locust stops, the
+p50/p95/p99 latencies and the mean number of SQL queries of each endpoint are
+printed, and written as JSON to LOADTEST_REPORT if it is set.
 """
+from __future__ import print_function
 
+import os
 import json
+import time
 import random
-import string
-from io import StringIO
+import datetime
+import collections
 
-from locust import HttpLocust, TaskSet, task
+import django
+django.setup()
 
+import jwe
+import jwt
+from locust import HttpLocust, Locust, TaskSet, events, task
 
-HOST = 'http://localhost:5000/'
-USERNAME = 'calici@cat.com'
-PASSWORD = 'asdfasdf'
+from framework.auth import signing
+from website import settings
+
+
+HOST = settings.DOMAIN
+API_HOST = settings.API_DOMAIN
 VERIFY = False
 
-PROJECT_TITLE = 'load-test'
-FILE_NAME = 'the-miracle.mp3'
-FILE_SIZE = 1024
-CONTENT_TYPE = 'text/plain'
+FIXTURE_PATH = os.environ.get('LOADTEST_FIXTURE', os.path.join(os.path.dirname(__file__), 'fixture.json'))
+REPORT_PATH = os.environ.get('LOADTEST_REPORT')
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+with open(FIXTURE_PATH) as fp:
+    FIXTURE = json.load(fp)
+
+JWE_KEY = jwe.kdf(settings.WATERBUTLER_JWE_SECRET.encode('utf-8'), settings.WATERBUTLER_JWE_SALT.encode('utf-8'))
+
+# endpoint name -> response times (ms), numbers of SQL queries
+response_times = collections.defaultdict(list)
+query_counts = collections.defaultdict(list)
+
+
+def on_request_success(request_type, name, response_time, response_length, **kwargs):
+    response_times[name].append(response_time)
 
+events.request_success += on_request_success
 
-def random_string(nchars):
-    return ''.join([
-        random.choice(string.lowercase)
-        for _ in range(nchars)
-    ])
 
+def percentile(values, percent):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
 
-def make_file_name(nchars):
-    return random_string(nchars)
 
+def make_report():
+    report = {}
+    for name, times in sorted(response_times.items()):
+        counts = query_counts.get(name)
+        report[name] = {
+            'requests': len(times),
+            'p50': percentile(times, 50),
+            'p95': percentile(times, 95),
+            'p99': percentile(times, 99),
+            'queries': float(sum(counts)) / len(counts) if counts else None,
+        }
+    return report
 
-def make_file_like(nchars):
-    sio = StringIO(random_string(nchars))
-    return sio
 
+def on_quitting(**kwargs):
+    report = make_report()
+    print('{:<60} {:>8} {:>8} {:>8} {:>8} {:>8}'.format('Name', '# reqs', 'p50', 'p95', 'p99', 'queries'))
+    for name, row in report.items():
+        print('{:<60} {:>8} {:>8} {:>8} {:>8} {:>8}'.format(
+            name, row['requests'], row['p50'], row['p95'], row['p99'],
+            '-' if row['queries'] is None else '{:.1f}'.format(row['queries'])))
+    if REPORT_PATH:
+        with open(REPORT_PATH, 'w') as fp:
+            json.dump(report, fp, indent=2)
 
-class UserBehavior(TaskSet):
+events.quitting += on_quitting
 
-    def __init__(self, *args, **kwargs):
-        super(UserBehavior, self).__init__(*args, **kwargs)
-        self.node_id = None
 
-    def login(self):
+def signed(**options):
+    options.setdefault('time', time.time() + 1000)
+    message, signature = signing.default_signer.sign_payload(options)
+    return {'payload': message, 'signature': signature}
+
+
+class RDMBehavior(TaskSet):
+    """Logs in as the user of the fixture; records the query counts of the requests."""
+
+    def on_start(self):
         self.client.post(
             'login/',
-            {'username': USERNAME, 'password': PASSWORD},
+            {'username': FIXTURE['user']['username'], 'password': FIXTURE['user']['password']},
             verify=VERIFY,
         )
+        self.project_id = FIXTURE['large_project']['id']
 
-    def create_project(self):
-        resp = self.client.post(
-            'api/v1/project/new/',
-            data=json.dumps({'title': PROJECT_TITLE}),
-            headers={'Content-Type': 'application/json'},
-            verify=VERIFY,
-        )
-        node_url = resp.json()['projectUrl']
-        self.node_id = node_url.strip('/').split('/')[-1]
+    def request(self, method, url, name, **kwargs):
+        resp = self.client.request(method, url, name=name, verify=VERIFY, **kwargs)
+        if QUERY_COUNT_HEADER in resp.headers:
+            query_counts[name].append(int(resp.headers[QUERY_COUNT_HEADER]))
+        return resp
 
-    def on_start(self):
-        self.login()
-        self.create_project()
-        self.upload_file(name=FILE_NAME)
+    def random_path(self):
+        return random.choice(FIXTURE['large_project']['paths']).lstrip('/')
 
-    @task
-    def upload_file(self, name=None):
-        request_url = 'api/v1/project/{0}/osfstorage/files/'.format(self.node_id)
-        resp = self.client.post(
-            request_url,
-            data=json.dumps({
-                'name': name or make_file_name(16),
-                'size': FILE_SIZE,
-                'type': CONTENT_TYPE,
-            }),
-            headers={'Content-Type': 'application/json'},
-            name='/api/v1/project/[nodeId]/osfstorage/files/',
-        )
-        upload_url = resp.json()
-        self.client.put(
-            upload_url,
-            data=make_file_like(FILE_SIZE),
-            headers={'Content-Type': CONTENT_TYPE},
-            name='/files/',
-        )
 
-    @task
-    def list_files(self):
-        self.client.get(
-            'api/v1/{0}/osfstorage/files/'.format(self.node_id),
-            verify=VERIFY,
-            name='/api/v1/project/[nodeId]/osfstorage/files/',
-        )
+class TimestampBehavior(RDMBehavior):
+
+    @task(5)
+    def timestamp_page(self):
+        self.request('get', 'project/{}/timestamp/'.format(self.project_id), name='/project/[id]/timestamp/')
+
+    @task(1)
+    def verify_all(self):
+        self.request('post', 'api/v1/project/{}/timestamp/json/'.format(self.project_id),
+                     name='/api/v1/project/[id]/timestamp/json/',
+                     data=json.dumps({}), headers={'Content-Type': 'application/json'})
+
+    @task(5)
+    def verify_file(self):
+        self.request('get', 'api/v1/project/{}/files/timestamp/osfstorage/{}'.format(self.project_id, self.random_path()),
+                     name='/api/v1/project/[id]/files/timestamp/osfstorage/[path]')
+
+
+class BrowseBehavior(RDMBehavior):
+
+    @task(3)
+    def creator_quota(self):
+        self.request('get', 'api/v1/project/{}/get_creator_quota/'.format(self.project_id),
+                     name='/api/v1/project/[id]/get_creator_quota/')
+
+    @task(3)
+    def search(self):
+        self.request('get', 'api/v1/search/?q=load-test', name='/api/v1/search/')
+
+    @task(3)
+    def list_nodes(self):
+        self.request('get', API_HOST + 'v2/users/me/nodes/?embed=contributors', name='/v2/users/me/nodes/')
+
+    @task(3)
+    def list_contributors(self):
+        self.request('get', API_HOST + 'v2/nodes/{}/contributors/'.format(FIXTURE['contributors_project']['id']),
+                     name='/v2/nodes/[id]/contributors/')
+
+    @task(1)
+    def list_children(self):
+        self.request('get', API_HOST + 'v2/nodes/{}/children/?embed=contributors'.format(FIXTURE['deep_project']['id']),
+                     name='/v2/nodes/[id]/children/')
+
+
+class WaterButlerBehavior(RDMBehavior):
+    """The requests WaterButler makes for the operations of the user."""
+
+    def auth_url(self, action, path):
+        payload = jwe.encrypt(jwt.encode({
+            'data': {
+                'action': action,
+                'nid': self.project_id,
+                'provider': 'osfstorage',
+                'path': path,
+                'metrics': {'uri': settings.MFR_SERVER_URL},
+                'cookie': self.client.cookies.get(settings.COOKIE_NAME),
+            },
+            'exp': datetime.datetime.utcnow() + datetime.timedelta(seconds=settings.WATERBUTLER_JWT_EXPIRATION),
+        }, settings.WATERBUTLER_JWT_SECRET, algorithm=settings.WATERBUTLER_JWT_ALGORITHM), JWE_KEY)
+        return 'api/v1/files/auth/?payload={}'.format(payload)
+
+    @task(10)
+    def get_auth(self):
+        self.request('get', self.auth_url('download', '/' + self.random_path()), name='/api/v1/files/auth/')
+
+    @task(2)
+    def creator_quota(self):
+        self.request('get', 'api/v1/project/{}/creator_quota/'.format(self.project_id),
+                     name='/api/v1/project/[id]/creator_quota/',
+                     params=signed())
+
+    @task(2)
+    def create_log(self):
+        path = '/' + self.random_path()
+        self.request('put', 'api/v1/project/{}/waterbutler/logs/'.format(self.project_id),
+                     name='/api/v1/project/[id]/waterbutler/logs/',
+                     data=json.dumps(signed(
+                         auth={'id': FIXTURE['user']['id']},
+                         action='update',
+                         provider='osfstorage',
+                         metadata={
+                             'provider': 'osfstorage',
+                             'kind': 'file',
+                             'name': path.strip('/'),
+                             'path': path,
+                             'materialized': path,
+                             'size': 1024,
+                             'created_utc': '',
+                             'modified_utc': '',
+                             'extra': {'version': '1'},
+                         },
+                     )),
+                     headers={'Content-Type': 'application/json'})
+
+
+class DigestBehavior(TaskSet):
 
     @task
-    def download_file(self):
-        self.client.get(
-            'project/{0}/osfstorage/files/{1}/download/'.format(
-                self.node_id, FILE_NAME,
-            ),
-            verify=VERIFY,
-            name='/project/[nodeId]/osfstorage/files/[fileName]/download/',
-        )
+    def send_digest(self):
+        from website.notifications.tasks import send_users_email
+        start = time.time()
+        try:
+            send_users_email('email_digest')
+        except Exception as e:
+            events.request_failure.fire(request_type='task', name='send_users_email',
+                                        response_time=int((time.time() - start) * 1000), exception=e)
+        else:
+            events.request_success.fire(request_type='task', name='send_users_email',
+                                        response_time=int((time.time() - start) * 1000), response_length=0)
 
 
-class WebsiteUser(HttpLocust):
+class TimestampUser(HttpLocust):
     host = HOST
-    task_set = UserBehavior
-    min_wait = 5000
-    max_wait = 10000
+    task_set = TimestampBehavior
+    weight = 2
+    min_wait = 1000
+    max_wait = 3000
+
+
+class BrowsingUser(HttpLocust):
+    host = HOST
+    task_set = BrowseBehavior
+    weight = 4
+    min_wait = 1000
+    max_wait = 3000
+
+
+class WaterButler(HttpLocust):
+    host = HOST
+    task_set = WaterButlerBehavior
+    weight = 4
+    min_wait = 100
+    max_wait = 500
+
+
+class DigestWorker(Locust):
+    task_set = DigestBehavior
+    weight = 1
+    min_wait = 30000
+    max_wait = 60000
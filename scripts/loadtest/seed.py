@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Seed data for the load tests of scripts/loadtest/locustfile.py.
+
+Creates a user who can log in with a password and, as that user:
+
+* a large project with many osfstorage files,
+* a project with a deep tree of components,
+* a project with many contributors,
+
+then writes what the locustfile needs (credentials, guids, file paths) to a
+JSON fixture.
+::
+
+    python -m scripts.loadtest.seed --files 500 --depth 10 --contributors 200
+
+The files are only recorded in the database, their contents are served by the
+WaterButler stand-in of scripts/loadtest/stubs.py.
+"""
+from __future__ import print_function, absolute_import
+
+import os
+import json
+import logging
+import argparse
+
+import django
+django.setup()
+
+from django.db import transaction
+
+from addons.osfstorage import settings as osfstorage_settings
+from framework.auth import Auth
+from osf_tests.factories import AuthUserFactory, NodeFactory, ProjectFactory, UserFactory
+from osf.utils.permissions import WRITE
+from website.app import init_app
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+PASSWORD = 'loadtest-password'
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixture.json')
+
+
+def create_files(node, user, count, size=1024):
+    """osfstorage files with one version each, named file-<n>.txt."""
+    root = node.get_addon('osfstorage').get_root()
+    paths = []
+    for i in range(count):
+        file_node = root.append_file('file-{}.txt'.format(i))
+        file_node.create_version(user, {
+            'service': 'cloud',
+            osfstorage_settings.WATERBUTLER_RESOURCE: 'osf',
+            'object': '{}-{}'.format(node._id, i),
+        }, {
+            'size': size,
+            'contentType': 'text/plain',
+        })
+        paths.append(file_node.path)
+    return paths
+
+
+def create_large_project(user, n_files):
+    project = ProjectFactory(creator=user, title='load-test large project')
+    return project, create_files(project, user, n_files)
+
+
+def create_deep_project(user, depth, n_files):
+    """A project with a chain of `depth` components, each with files."""
+    project = ProjectFactory(creator=user, title='load-test deep project')
+    parent = project
+    for level in range(depth):
+        parent = NodeFactory(creator=user, parent=parent, title='load-test component {}'.format(level))
+        create_files(parent, user, n_files)
+    return project, parent
+
+
+def create_project_with_contributors(user, n_contributors):
+    project = ProjectFactory(creator=user, title='load-test contributors')
+    auth = Auth(user)
+    for _ in range(n_contributors):
+        project.add_contributor(UserFactory(), permissions=WRITE, auth=auth, log=False, send_email=False)
+    project.save()
+    return project
+
+
+def seed(n_files, depth, n_files_per_component, n_contributors):
+    with transaction.atomic():
+        user = AuthUserFactory()
+        user.set_password(PASSWORD)
+        user.save()
+        large_project, paths = create_large_project(user, n_files)
+        deep_project, deepest_component = create_deep_project(user, depth, n_files_per_component)
+        contributors_project = create_project_with_contributors(user, n_contributors)
+    return {
+        'user': {
+            'id': user._id,
+            'username': user.username,
+            'password': PASSWORD,
+        },
+        'large_project': {
+            'id': large_project._id,
+            'paths': paths,
+        },
+        'deep_project': {
+            'id': deep_project._id,
+            'deepest_component': deepest_component._id,
+        },
+        'contributors_project': {
+            'id': contributors_project._id,
+        },
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Create the data of the load tests.')
+    parser.add_argument('--files', dest='n_files', type=int, default=200,
+                        help='Number of files of the large project')
+    parser.add_argument('--depth', dest='depth', type=int, default=10,
+                        help='Number of levels of components of the deep project')
+    parser.add_argument('--component-files', dest='n_files_per_component', type=int, default=5,
+                        help='Number of files of each component of the deep project')
+    parser.add_argument('--contributors', dest='n_contributors', type=int, default=100,
+                        help='Number of contributors of the contributors project')
+    parser.add_argument('-o', '--output', dest='output', default=FIXTURE_PATH,
+                        help='Path of the JSON fixture for the locustfile')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    fixture = seed(args.n_files, args.depth, args.n_files_per_component, args.n_contributors)
+    with open(args.output, 'w') as fp:
+        json.dump(fixture, fp, indent=2)
+    logger.info('Load test data created for {}, fixture written to {}'.format(
+        fixture['user']['username'], args.output))
+
+
+if __name__ == '__main__':
+    init_app(set_backends=True, routes=False)
+    main()
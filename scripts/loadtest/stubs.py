@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""Local stand-ins of WaterButler and of the time stamp authority for load tests.
+
+Point the settings of the server under test at them::
+
+    WATERBUTLER_URL = WATERBUTLER_INTERNAL_URL = 'http://localhost:7777'
+    TIME_STAMP_AUTHORITY_URL = 'http://localhost:7779'  # api/base/settings
+
+    python -m scripts.loadtest.stubs --waterbutler-port 7777 --tsa-port 7779
+
+The WaterButler stand-in answers the metadata and download requests of the
+server for osfstorage from the database: folder listings, file metadata and
+generated contents of the size of the latest version. The TSA stand-in signs
+the timestamp queries with `openssl ts` and a self-signed certificate, so the
+tokens are well-formed but do not verify against a real root CA.
+"""
+from __future__ import print_function, absolute_import
+
+import os
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+import django
+django.setup()
+
+from website.app import init_app
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+TSA_CONFIG = """
+[ req ]
+distinguished_name = req_dn
+[ req_dn ]
+[ v3_tsa ]
+extendedKeyUsage = critical,timeStamping
+
+[ tsa ]
+default_tsa = tsa_config
+[ tsa_config ]
+dir = {dir}
+serial = $dir/serial
+signer_cert = $dir/tsa.crt
+signer_key = $dir/tsa.key
+signer_digest = sha256
+default_policy = 1.2.3.4.1
+digests = sha1, sha256, sha512
+accuracy = secs:1
+ordering = yes
+tsa_name = no
+ess_cert_id_chain = no
+"""
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def serialize_file(file_node):
+    version = file_node.versions.first()
+    return {
+        'type': 'files',
+        'attributes': {
+            'kind': 'file',
+            'name': file_node.name,
+            'path': file_node.path,
+            'materialized': file_node.materialized_path,
+            'provider': file_node.provider,
+            'size': version.size if version else 0,
+            'created_utc': version.created.isoformat() if version else None,
+            'modified_utc': version.created.isoformat() if version else None,
+            'extra': {
+                'version': version.identifier if version else None,
+                'hashes': {'md5': None, 'sha256': None},
+            },
+        },
+    }
+
+
+def serialize_folder(folder):
+    return {
+        'type': 'files',
+        'attributes': {
+            'kind': 'folder',
+            'name': folder.name,
+            'path': folder.path,
+            'materialized': folder.materialized_path,
+            'provider': folder.provider,
+            'extra': {},
+        },
+    }
+
+
+class WaterButlerHandler(BaseHTTPRequestHandler):
+    """GET /v1/resources/<node>/providers/<provider>/<path>"""
+
+    def do_GET(self):
+        from django.db import connection
+        from addons.osfstorage.models import OsfStorageFileNode
+        from osf.models import AbstractNode
+        try:
+            url = urlparse.urlparse(self.path)
+            parts = url.path.split('/', 6)
+            if len(parts) < 6 or parts[1:3] != ['v1', 'resources'] or parts[4] != 'providers':
+                return self.send_json(404, {'message': 'Not found'})
+            node = AbstractNode.load(parts[3])
+            provider, path = parts[5], '/' + (parts[6] if len(parts) > 6 else '')
+            if node is None:
+                return self.send_json(404, {'message': 'Not found'})
+            if provider != 'osfstorage':
+                return self.send_json(200, {'data': []})
+
+            if path == '/':
+                file_node = node.get_addon('osfstorage').get_root()
+            else:
+                file_node = OsfStorageFileNode.load(path.strip('/'))
+            if file_node is None:
+                return self.send_json(404, {'message': 'Not found'})
+            if not file_node.is_file:
+                return self.send_json(200, {'data': [
+                    serialize_file(child) if child.is_file else serialize_folder(child)
+                    for child in file_node.children
+                ]})
+            if 'meta' in urlparse.parse_qs(url.query, keep_blank_values=True):
+                return self.send_json(200, {'data': serialize_file(file_node)})
+            self.send_content(file_node)
+        finally:
+            connection.close()
+
+    def send_json(self, status, data):
+        body = json.dumps(data)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_content(self, file_node):
+        version = file_node.versions.first()
+        size = max(version.size or 0, 0) if version else 0
+        line = '{}\n'.format(file_node._id)
+        body = (line * (size // len(line) + 1))[:size]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class TSAHandler(BaseHTTPRequestHandler):
+    """POST / with a timestamp query, answers a timestamp reply."""
+
+    directory = None
+
+    def do_POST(self):
+        query = self.rfile.read(int(self.headers.getheader('Content-Length') or 0))
+        handle, query_path = tempfile.mkstemp(dir=self.directory, suffix='.tsq')
+        os.close(handle)
+        reply_path = query_path[:-4] + '.tsr'
+        try:
+            with open(query_path, 'wb') as fp:
+                fp.write(query)
+            subprocess.check_call([
+                'openssl', 'ts', '-reply', '-config', os.path.join(self.directory, 'tsa.cnf'),
+                '-queryfile', query_path, '-out', reply_path,
+            ], stderr=open(os.devnull, 'w'))
+            with open(reply_path, 'rb') as fp:
+                reply = fp.read()
+        except subprocess.CalledProcessError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        finally:
+            for path in (query_path, reply_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/timestamp-reply')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def create_tsa(directory):
+    """Self-signed certificate and configuration of `openssl ts -reply`."""
+    config = os.path.join(directory, 'tsa.cnf')
+    with open(config, 'w') as fp:
+        fp.write(TSA_CONFIG.format(dir=directory))
+    with open(os.path.join(directory, 'serial'), 'w') as fp:
+        fp.write('01\n')
+    subprocess.check_call([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '365',
+        '-subj', '/CN=loadtest-tsa', '-config', config, '-extensions', 'v3_tsa',
+        '-keyout', os.path.join(directory, 'tsa.key'), '-out', os.path.join(directory, 'tsa.crt'),
+    ])
+
+
+def serve(server):
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run the WaterButler and TSA stand-ins.')
+    parser.add_argument('--host', dest='host', default='localhost')
+    parser.add_argument('--waterbutler-port', dest='waterbutler_port', type=int, default=7777)
+    parser.add_argument('--tsa-port', dest='tsa_port', type=int, default=7779)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    directory = tempfile.mkdtemp(prefix='loadtest-tsa-')
+    try:
+        create_tsa(directory)
+        TSAHandler.directory = directory
+        waterbutler = ThreadingHTTPServer((args.host, args.waterbutler_port), WaterButlerHandler)
+        tsa = ThreadingHTTPServer((args.host, args.tsa_port), TSAHandler)
+        serve(tsa)
+        logger.info('WaterButler stand-in on http://{}:{}, TSA stand-in on http://{}:{}'.format(
+            args.host, args.waterbutler_port, args.host, args.tsa_port))
+        waterbutler.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    init_app(set_backends=True, routes=False)
+    main()
@@ -4,22 +4,28 @@ Projects or users can have their GUID whitelisted via `usage_audit whitelist [GU
 User usage is defined as the total usage of all projects they have > READ access on
 Project usage is defined as the total usage of it and all its children
 total usage is defined as the sum of the size of all verions associated with X via OsfStorageFileNode and OsfStorageTrashedFileNode
+
+The usage of the projects is computed by the database and stored as daily
+StorageUsageSnapshots. A run only computes the projects whose files changed
+since the previous run (all of them with `full`), in ranges of project ids
+which can be run in parallel. The project each file was counted in is kept as
+a StorageUsageFileRoot, so the project a file was moved out of is computed
+again too. The usage of the users is summed from the latest snapshots of the
+projects they can write to.
 """
 
 import os
-import gc
 import json
 import logging
-import functools
 
-from collections import defaultdict
+from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
 
-from tqdm import tqdm
-
-
+from addons.base.utils import run_in_threads
 from framework.celery_tasks import app as celery_app
-from osf.models import TrashedFile, Node
 
 from website import mails
 from website.app import init_app
@@ -29,7 +35,11 @@ from scripts import utils as scripts_utils
 # App must be init'd before django models are imported
 init_app(set_backends=True, routes=False)
 
-from osf.models import BaseFileNode, FileVersion, OSFUser, AbstractNode
+from osf.models import (
+    AbstractNode, BaseFileNode, Contributor, FileVersion, OSFUser, StorageUsageFileRoot, StorageUsageSnapshot,
+    TrashedFileNode
+)
+from osf.models.node import NodeGroupObjectPermission
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -39,6 +49,9 @@ GBs = 1024 ** 3.0
 USER_LIMIT = 5 * GBs
 PROJECT_LIMIT = 5 * GBs
 
+# Number of project ids computed by a query
+CHUNK_SIZE = 10000
+
 WHITE_LIST_PATH = os.path.join(os.path.dirname(__file__), 'usage_whitelist.json')
 
 
@@ -59,50 +72,252 @@ def add_to_white_list(gtg):
     logger.info('Whitelist updated to {}'.format(WHITE_LIST))
 
 
-def get_usage(node):
-    node_content_type = ContentType.objects.get_for_model(Node)
+def _tables():
+    return {
+        'basefilenode': BaseFileNode._meta.db_table,
+        'versions': BaseFileNode.versions.through._meta.db_table,
+        'fileversion': FileVersion._meta.db_table,
+        'abstractnode': AbstractNode._meta.db_table,
+        'snapshot': StorageUsageSnapshot._meta.db_table,
+        'fileroot': StorageUsageFileRoot._meta.db_table,
+        'contributor': Contributor._meta.db_table,
+        'osfuser_groups': OSFUser.groups.through._meta.db_table,
+        'nodegroupobjectpermission': NodeGroupObjectPermission._meta.db_table,
+    }
+
+# Usage of the versions of the files of each top-level project, components included
+USAGE_SQL = """
+    SELECT N.root_id,
+           COALESCE(SUM(V.size) FILTER (WHERE NOT F.type = ANY(%(trashed)s)), 0),
+           COALESCE(SUM(V.size) FILTER (WHERE F.type = ANY(%(trashed)s)), 0)
+    FROM {basefilenode} AS F
+      JOIN {versions} AS FV ON FV.basefilenode_id = F.id
+      JOIN {fileversion} AS V ON V.id = FV.fileversion_id
+      JOIN {abstractnode} AS N ON N.id = F.target_object_id
+      JOIN {abstractnode} AS R ON R.id = N.root_id
+    WHERE F.provider = 'osfstorage'
+      AND F.target_content_type_id = %(content_type)s
+      AND NOT R.type = ANY(%(excluded_types)s)
+      AND N.root_id >= %(start)s AND N.root_id < %(end)s
+      {changed}
+    GROUP BY N.root_id
+"""
+
+# The files of the top-level projects and the project they belong to
+FILES_SQL = """
+    SELECT F2.id AS file_id, N2.root_id
+    FROM {basefilenode} AS F2
+      JOIN {abstractnode} AS N2 ON N2.id = F2.target_object_id
+    WHERE F2.provider = 'osfstorage'
+      AND F2.target_content_type_id = %(content_type)s
+      {changed}
+"""
+
+# Restricts FILES_SQL to the files created, updated, moved or trashed, with
+# new versions, or of the nodes changed (e.g. moved under another project),
+# since the previous audit
+CHANGED_SQL = """
+      AND (F2.modified >= %(since)s OR N2.modified >= %(since)s OR EXISTS (
+        SELECT 1 FROM {versions} AS FV2
+        WHERE FV2.basefilenode_id = F2.id AND FV2.fileversion_id > %(last_version_id)s
+      ))
+"""
 
-    vids = [each for each in BaseFileNode.active.filter(provider='osfstorage', target_object_id=node.id, target_content_type=node_content_type).values_list('versions', flat=True) if each]
-    t_vids = [each for eac in TrashedFile.objects.filter(provider='osfstorage', target_object_id=node.id, target_content_type=node_content_type).values_list('versions', flat=True) if each]
+# The projects of the changed files, and the projects they were counted in
+CHANGED_ROOTS_SQL = """
+    WITH C AS ({files})
+    SELECT C.root_id FROM C
+    UNION
+    SELECT FR.root_id FROM C JOIN {fileroot} AS FR ON FR.file_id = C.file_id
+"""
 
-    usage = sum([v.size or 0 for v in FileVersion.objects.filter(id__in=vids)])
-    trashed_usage = sum([v.size or 0 for v in FileVersion.objects.filter(id__in=t_vids)])
+RECORD_FILE_ROOTS_SQL = """
+    INSERT INTO {fileroot} (file_id, root_id)
+    SELECT C.file_id, C.root_id FROM ({files}) AS C
+    WHERE C.root_id >= %(start)s AND C.root_id < %(end)s
+    ON CONFLICT (file_id) DO UPDATE SET root_id = EXCLUDED.root_id
+"""
 
-    return list(map(sum, zip(*([(usage, trashed_usage)] + [get_usage(child) for child in node.nodes_primary]))))  # Adds tuples together, map(sum, zip((a, b), (c, d))) -> (a+c, b+d)
+LATEST_SNAPSHOTS_SQL = """
+    SELECT DISTINCT ON (node_id) node_id, used, deleted
+    FROM {snapshot}
+    ORDER BY node_id, date DESC
+"""
 
+PROJECTS_OVER_LIMIT_SQL = """
+    SELECT S.node_id, S.used, S.deleted
+    FROM ({latest}) AS S
+    WHERE S.used + S.deleted >= %(limit)s
+"""
 
-def limit_filter(limit, (item, usage)):
-    """Note: usage is a tuple(current_usage, deleted_usage)"""
-    return item not in WHITE_LIST and sum(usage) >= limit
+# Usage of the contributors, summed over the projects they have write permission to
+USERS_OVER_LIMIT_SQL = """
+    SELECT C.user_id, SUM(S.used), SUM(S.deleted)
+    FROM ({latest}) AS S
+      JOIN {contributor} AS C ON C.node_id = S.node_id
+    WHERE NOT S.node_id = ANY(%(white_list)s)
+      AND EXISTS (
+        SELECT 1
+        FROM {osfuser_groups} AS UG
+          JOIN {nodegroupobjectpermission} AS P ON P.group_id = UG.group_id
+        WHERE UG.osfuser_id = C.user_id
+          AND P.content_object_id = S.node_id
+          AND P.permission_id = %(permission)s
+      )
+    GROUP BY C.user_id
+    HAVING SUM(S.used + S.deleted) >= %(limit)s
+"""
 
 
-def main(send_email=False):
+def _files_sql(tables, since):
+    changed = CHANGED_SQL.format(**tables) if since else ''
+    return FILES_SQL.format(changed=changed, **tables)
+
+
+def get_changed_roots(since, last_version_id):
+    """Ids of the top-level projects whose usage may have changed since `since`."""
+    tables = _tables()
+    sql = CHANGED_ROOTS_SQL.format(files=_files_sql(tables, since), **tables)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'content_type': ContentType.objects.get_for_model(AbstractNode).id,
+            'since': since,
+            'last_version_id': last_version_id,
+        })
+        return set(row[0] for row in cursor.fetchall())
+
+
+def compute_usage(start, end, roots=None):
+    """Usage of the top-level projects with ids in [start, end).
+
+    :param roots: only these projects
+    :return dict: project id -> (used, deleted)
+    """
+    tables = _tables()
+    changed = 'AND N.root_id = ANY(%(roots)s)' if roots is not None else ''
+    sql = USAGE_SQL.format(changed=changed, **tables)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'trashed': list(TrashedFileNode._typedmodels_subtypes),
+            'content_type': ContentType.objects.get_for_model(AbstractNode).id,
+            'excluded_types': ['osf.collection', 'osf.quickfilesnode'],
+            'start': start,
+            'end': end,
+            'roots': list(roots or []),
+        })
+        return {root_id: (used, deleted) for root_id, used, deleted in cursor.fetchall()}
+
+
+def record_file_roots(start, end, since=None, last_version_id=0):
+    """Remember the project of the files of the projects with ids in [start, end).
+
+    :param since: only the files changed since this time, or with versions
+        newer than `last_version_id`
+    """
+    tables = _tables()
+    sql = RECORD_FILE_ROOTS_SQL.format(files=_files_sql(tables, since), **tables)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'content_type': ContentType.objects.get_for_model(AbstractNode).id,
+            'start': start,
+            'end': end,
+            'since': since,
+            'last_version_id': last_version_id,
+        })
+
+
+def save_snapshots(usage, date, scanned_at, last_version_id):
+    with transaction.atomic():
+        StorageUsageSnapshot.objects.filter(date=date, node_id__in=usage.keys()).delete()
+        StorageUsageSnapshot.objects.bulk_create([
+            StorageUsageSnapshot(node_id=node_id, date=date, used=used, deleted=deleted,
+                                 last_version_id=last_version_id, scanned_at=scanned_at)
+            for node_id, (used, deleted) in usage.items()
+        ])
+
+
+def update_snapshots(full=False, threads=1, chunk_size=CHUNK_SIZE):
+    """Store the snapshots of today for the projects whose usage may have changed."""
+    scanned_at = timezone.now()
+    last_version_id = FileVersion.objects.aggregate(id=Max('id'))['id'] or 0
+    watermark = StorageUsageSnapshot.objects.aggregate(
+        since=Max('scanned_at'), last_version_id=Max('last_version_id'))
+    if full or watermark['since'] is None:
+        watermark = {'since': None, 'last_version_id': 0}
+    ids = AbstractNode.objects.aggregate(start=Min('id'), end=Max('id'))
+    if ids['start'] is None:
+        return 0
+    # before any range records the new projects of the files
+    roots = get_changed_roots(**watermark) if watermark['since'] is not None else None
+    ranges = [(start, start + chunk_size) for start in range(ids['start'], ids['end'] + 1, chunk_size)]
+    updated = []
+
+    def run(id_range):
+        if roots is None:
+            range_roots = None
+        else:
+            range_roots = [root_id for root_id in roots if id_range[0] <= root_id < id_range[1]]
+            if not range_roots:
+                return
+        usage = compute_usage(id_range[0], id_range[1], range_roots)
+        # projects which have no files anymore
+        empty = StorageUsageSnapshot.objects.filter(
+            node_id__gte=id_range[0], node_id__lt=id_range[1],
+        ).exclude(node_id__in=usage.keys())
+        if range_roots is not None:
+            empty = empty.filter(node_id__in=range_roots)
+        for node_id in empty.values_list('node_id', flat=True).distinct():
+            usage[node_id] = (0, 0)
+        with transaction.atomic():
+            record_file_roots(id_range[0], id_range[1], **watermark)
+            save_snapshots(usage, scanned_at.date(), scanned_at, last_version_id)
+        updated.append(len(usage))
+
+    run_in_threads(run, ranges, threads)
+    logger.info('Usage of {} project(s) updated'.format(sum(updated)))
+    return sum(updated)
+
+
+def _fetch(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def get_projects_over_limit(limit=PROJECT_LIMIT):
+    """:return list: (project, used, deleted) of the projects over the limit."""
+    tables = _tables()
+    latest = LATEST_SNAPSHOTS_SQL.format(**tables)
+    rows = _fetch(PROJECTS_OVER_LIMIT_SQL.format(latest=latest, **tables), {'limit': limit})
+    projects = AbstractNode.objects.in_bulk([row[0] for row in rows])
+    return [(projects[node_id], used, deleted) for node_id, used, deleted in rows
+            if projects[node_id]._id not in WHITE_LIST]
+
+
+def get_users_over_limit(limit=USER_LIMIT):
+    """:return list: (user, used, deleted) of the users over the limit."""
+    tables = _tables()
+    latest = LATEST_SNAPSHOTS_SQL.format(**tables)
+    white_list = list(AbstractNode.objects.filter(guids___id__in=WHITE_LIST).values_list('id', flat=True))
+    rows = _fetch(USERS_OVER_LIMIT_SQL.format(latest=latest, **tables), {
+        'limit': limit,
+        'white_list': white_list,
+        'permission': Permission.objects.get(codename='write_node').id,
+    })
+    users = OSFUser.objects.in_bulk([row[0] for row in rows])
+    return [(users[user_id], used, deleted) for user_id, used, deleted in rows
+            if users[user_id]._id not in WHITE_LIST]
+
+
+def main(send_email=False, full=False, threads=1):
     logger.info('Starting Project storage audit')
 
+    update_snapshots(full=full, threads=threads)
+
     lines = []
-    projects = {}
-    users = defaultdict(lambda: (0, 0))
-
-    top_level_nodes = AbstractNode.objects.get_roots()
-    progress_bar = tqdm(total=top_level_nodes.count())
-    top_level_nodes = top_level_nodes.iterator()
-
-    for i, node in enumerate(top_level_nodes):
-        progress_bar.update(i+1)
-        if node._id in WHITE_LIST:
-            continue  # Dont count whitelisted nodes against users
-        projects[node._id] = get_usage(node)
-        for contrib in node.contributors:
-            if node.can_edit(user=contrib):
-                users[contrib._id] = tuple(map(sum, zip(users[contrib._id], projects[node._id])))  # Adds tuples together, map(sum, zip((a, b), (c, d))) -> (a+c, b+d)
-
-        if i % 25 == 0:
-            gc.collect()
-    progress_bar.close()
-
-    for model, collection, limit in ((OSFUser, users, USER_LIMIT), (AbstractNode, projects, PROJECT_LIMIT)):
-        for item, (used, deleted) in filter(functools.partial(limit_filter, limit), collection.items()):
-            line = '{!r} has exceeded the limit {:.2f}GBs ({}b) with {:.2f}GBs ({}b) used and {:.2f}GBs ({}b) deleted.'.format(model.load(item), limit / GBs, limit, used / GBs, used, deleted / GBs, deleted)
+    for items, limit in ((get_users_over_limit(), USER_LIMIT), (get_projects_over_limit(), PROJECT_LIMIT)):
+        for item, used, deleted in items:
+            line = '{!r} has exceeded the limit {:.2f}GBs ({}b) with {:.2f}GBs ({}b) used and {:.2f}GBs ({}b) deleted.'.format(item, limit / GBs, limit, used / GBs, used, deleted / GBs, deleted)
             logger.info(line)
             lines.append(line)
 
@@ -118,9 +333,9 @@ def main(send_email=False):
 
 
 @celery_app.task(name='scripts.osfstorage.usage_audit')
-def run_main(send_mail=False, white_list=None):
+def run_main(send_mail=False, white_list=None, full=False, threads=1):
     scripts_utils.add_file_logger(logger, __file__)
     if white_list:
         add_to_white_list(white_list)
     else:
-        main(send_mail)
+        main(send_mail, full=full, threads=threads)
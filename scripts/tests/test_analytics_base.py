@@ -0,0 +1,82 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+
+from django.db.models import F, Q
+from nose.tools import *  # noqa
+
+from osf.models import Node
+from osf_tests.factories import ProjectFactory
+from tests.base import OsfTestCase
+from scripts.analytics.base import count_where, count_where_by, scoped, unscoped, write_events
+
+
+class TestCountWhere(OsfTestCase):
+
+    def setUp(self):
+        super(TestCountWhere, self).setUp()
+        self.public_project = ProjectFactory(is_public=True)
+        self.private_project = ProjectFactory(is_public=False)
+        ProjectFactory(parent=self.private_project)
+
+    def test_count_where(self):
+        counts = count_where(Node.objects.all(), {
+            'total': None,
+            'public': Q(is_public=True),
+            'private': Q(is_public=False),
+            'none': Q(title='no such title'),
+        })
+        assert_equal(counts, {'total': 3, 'public': 1, 'private': 2, 'none': 0})
+
+    def test_count_where_by(self):
+        counts = count_where_by(Node.objects.all(), 'root_id', {
+            'total': None,
+            'public': Q(is_public=True),
+        })
+        assert_equal(counts, {
+            self.public_project.id: {'total': 1, 'public': 1},
+            self.private_project.id: {'total': 2, 'public': 0},
+        })
+
+    def test_scoped(self):
+        conditions = {'total': None, 'public': Q(is_public=True)}
+        root_query = Q(id=F('root_id'))
+        counts = count_where(Node.objects.all(), dict(
+            scoped('nodes', conditions),
+            **scoped('projects', conditions, root_query)
+        ))
+        assert_equal(unscoped('nodes', counts), {'total': 3, 'public': 1})
+        assert_equal(unscoped('projects', counts), {'total': 2, 'public': 1})
+
+
+class TestWriteEvents(OsfTestCase):
+
+    def setUp(self):
+        super(TestWriteEvents, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.events = [
+            {'keen': {'timestamp': '2018-01-01T00:00:00'}, 'nodes': {'total': 1}},
+            {'keen': {'timestamp': '2018-01-02T00:00:00'}, 'nodes': {'total': 2}},
+        ]
+
+    def tearDown(self):
+        super(TestWriteEvents, self).tearDown()
+        shutil.rmtree(self.directory)
+
+    def test_json(self):
+        write_events(self.directory, 'json', 'node_summary', self.events[:1])
+        write_events(self.directory, 'json', 'node_summary', self.events[1:])
+        with open(os.path.join(self.directory, 'node_summary.jsonl')) as f:
+            assert_equal([json.loads(line) for line in f], self.events)
+
+    def test_csv(self):
+        write_events(self.directory, 'csv', 'node_summary', self.events[:1])
+        write_events(self.directory, 'csv', 'node_summary', self.events[1:])
+        with open(os.path.join(self.directory, 'node_summary.csv')) as f:
+            rows = list(csv.DictReader(f))
+        assert_equal(rows, [
+            {'keen.timestamp': '2018-01-01T00:00:00', 'nodes.total': '1'},
+            {'keen.timestamp': '2018-01-02T00:00:00', 'nodes.total': '2'},
+        ])
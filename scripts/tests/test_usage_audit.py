@@ -0,0 +1,82 @@
+from nose.tools import *  # noqa
+
+from addons.osfstorage import settings as osfstorage_settings
+from osf.models import StorageUsageSnapshot
+from osf.utils.permissions import READ
+from osf_tests.factories import AuthUserFactory, ProjectFactory
+from tests.base import OsfTestCase
+
+from scripts.osfstorage import usage_audit
+
+
+def add_file(node, user, name, size):
+    file_node = node.get_addon('osfstorage').get_root().append_file(name)
+    file_node.create_version(user, {
+        'service': 'cloud',
+        osfstorage_settings.WATERBUTLER_RESOURCE: 'osf',
+        'object': name,
+    }, {'size': size})
+    return file_node
+
+
+class TestUsageAudit(OsfTestCase):
+
+    def setUp(self):
+        super(TestUsageAudit, self).setUp()
+        self.user = AuthUserFactory()
+        self.project = ProjectFactory(creator=self.user)
+        self.component = ProjectFactory(creator=self.user, parent=self.project)
+        self.file = add_file(self.project, self.user, 'project.txt', 1000)
+        add_file(self.component, self.user, 'component.txt', 500).delete()
+
+    def test_compute_usage(self):
+        usage = usage_audit.compute_usage(self.project.id, self.component.id + 1)
+        assert_equal(usage, {self.project.id: (1000, 500)})
+
+    def test_update_snapshots_incremental(self):
+        assert_equal(usage_audit.update_snapshots(), 1)
+        snapshot = StorageUsageSnapshot.objects.get(node=self.project)
+        assert_equal((snapshot.used, snapshot.deleted), (1000, 500))
+
+        # nothing changed since the previous audit
+        assert_equal(usage_audit.update_snapshots(), 0)
+
+        self.file.create_version(self.user, {
+            'service': 'cloud',
+            osfstorage_settings.WATERBUTLER_RESOURCE: 'osf',
+            'object': 'project-2.txt',
+        }, {'size': 200})
+        assert_equal(usage_audit.update_snapshots(), 1)
+        snapshot = StorageUsageSnapshot.objects.get(node=self.project)
+        assert_equal((snapshot.used, snapshot.deleted), (1200, 500))
+
+        assert_equal(usage_audit.update_snapshots(full=True), 1)
+
+    def test_update_snapshots_file_moved(self):
+        other = ProjectFactory(creator=self.user)
+        assert_equal(usage_audit.update_snapshots(), 1)
+
+        self.file.move_under(other.get_addon('osfstorage').get_root())
+        # the project the file was moved out of is computed again
+        assert_equal(usage_audit.update_snapshots(), 2)
+        snapshot = StorageUsageSnapshot.objects.get(node=self.project)
+        assert_equal((snapshot.used, snapshot.deleted), (0, 500))
+        snapshot = StorageUsageSnapshot.objects.get(node=other)
+        assert_equal((snapshot.used, snapshot.deleted), (1000, 0))
+
+        self.file.move_under(self.project.get_addon('osfstorage').get_root())
+        assert_equal(usage_audit.update_snapshots(), 2)
+        snapshot = StorageUsageSnapshot.objects.get(node=other)
+        assert_equal((snapshot.used, snapshot.deleted), (0, 0))
+
+    def test_over_limit(self):
+        read_user = AuthUserFactory()
+        self.project.add_contributor(read_user, permissions=READ, save=True)
+        usage_audit.update_snapshots()
+
+        projects = usage_audit.get_projects_over_limit(limit=1500)
+        assert_equal(projects, [(self.project, 1000, 500)])
+        assert_equal(usage_audit.get_projects_over_limit(limit=1501), [])
+
+        users = usage_audit.get_users_over_limit(limit=1500)
+        assert_equal(users, [(self.user, 1000, 500)])
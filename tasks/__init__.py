@@ -408,6 +408,9 @@ ADDON_TESTS = [
 ADMIN_TESTS = [
     'admin_tests',
 ]
+BENCHMARK_TESTS = [
+    'api_tests/benchmarks',
+]
 
 
 @task
@@ -459,6 +462,31 @@ def test_addons(ctx, numprocesses=None, coverage=False):
     test_module(ctx, module=ADDON_TESTS, numprocesses=numprocesses, coverage=coverage)
 
 
+@task
+def test_benchmarks(ctx, update=False, threshold=None):
+    """Run the query count and wall time benchmarks, serially.
+
+    Fails when the query counts grow beyond the threshold (in percent) over
+    api_tests/benchmarks/baselines.json, warns when a benchmark has no
+    baseline; --update stores the results as the new baselines.
+    """
+    params = []
+    if update:
+        params.append('--benchmark-update')
+    if threshold:
+        params.append('--benchmark-threshold={}'.format(threshold))
+    test_module(ctx, module=BENCHMARK_TESTS, numprocesses=1, params=params)
+
+
+@task
+def benchmark_startup(ctx, repeat=3, addon=None):
+    """Measure the startup time of the application and the import cost of each add-on."""
+    cmd = 'python -m scripts.benchmark_startup --repeat {}'.format(repeat)
+    if addon:
+        cmd += ' --addon {}'.format(addon)
+    ctx.run(bin_prefix(cmd), pty=True)
+
+
 @task
 def test(ctx, all=False, lint=False):
     """
@@ -543,6 +543,47 @@ class TestFuncOfMAPCore(OsfTestCase):
         args, kwargs = mock_get.call_args_list[1]
         assert_equal(args[0].endswith('/member/' + group_key), True)
 
+    @mock.patch('nii.mapcore_api.MAPCORE_SECRET', 'fake_secret')
+    @mock.patch('nii.mapcore_api.MAPCORE_HOSTNAME', 'fake_hostname')
+    @mock.patch('nii.mapcore_api.MAPCORE_API_PATH', '/fake_api_path')
+    @mock.patch('nii.mapcore._remove_from_group')
+    @mock.patch('requests.get')
+    def test_mapcore_get_extended_group_info_not_modified(self, mock_get, mock_remove):
+        from nii.mapcore import (mapcore_get_extended_group_info,
+                                 mapcore_remove_from_group)
+
+        group_key = 'fake_group_key'
+        base_grp = {'group_key': group_key,
+                    'modified_at': '2019-04-05 12:07:09'}
+
+        def func_get(url, **kwargs):
+            res = requests.Response()
+            res.status_code = requests.codes.ok
+            res._content = '{"result": {"accounts": [{"eppn": "' + self.me.eppn + '", "admin": 1 }]}, "status": {"error_code": 0} }'
+            return res
+
+        mock_get.side_effect = func_get
+
+        group_ext = mapcore_get_extended_group_info(self.me, self.project, group_key, base_grp=dict(base_grp))
+        assert_equal(mock_get.call_count, 1)
+        assert_equal(group_ext['group_admin_eppn'], [self.me.eppn])
+
+        # same modified_at -> cached member list
+        group_ext = mapcore_get_extended_group_info(self.me, self.project, group_key, base_grp=dict(base_grp))
+        assert_equal(mock_get.call_count, 1)
+        assert_equal(group_ext['group_admin_eppn'], [self.me.eppn])
+
+        # modified -> mAP core
+        base_grp['modified_at'] = '2019-04-05 12:08:00'
+        mapcore_get_extended_group_info(self.me, self.project, group_key, base_grp=dict(base_grp))
+        assert_equal(mock_get.call_count, 2)
+
+        # changed by GRDM -> mAP core
+        mapcore_remove_from_group(self.me, self.project, group_key, 'fake_eppn')
+        assert_equal(mock_remove.call_count, 1)
+        mapcore_get_extended_group_info(self.me, self.project, group_key, base_grp=dict(base_grp))
+        assert_equal(mock_get.call_count, 3)
+
     @mock.patch('nii.mapcore_api.MAPCORE_SECRET', 'fake_secret')
     @mock.patch('nii.mapcore_api.MAPCORE_HOSTNAME', 'fake_hostname')
     @mock.patch('nii.mapcore_api.MAPCORE_API_PATH', '/fake_api_path')
@@ -1022,15 +1063,17 @@ class TestViewsWithMAPCore(OsfTestCase):
     @mock.patch('nii.mapcore.MAPCORE_CLIENTID', 'test_dashboard')
     @mock.patch('website.views.use_ember_app')
     @mock.patch('nii.mapcore.mapcore_sync_rdm_my_projects0')
+    @mock.patch('nii.mapcore.mapcore_api_is_available0')
     @mock.patch('website.mapcore.views.mapcore_request_authcode')
-    def test_dashboard_without_token(self, mock_ac, mock_sync, mock_ember):
+    def test_dashboard_without_token(self, mock_ac, mock_available, mock_sync, mock_ember):
         mapcore = MAPCore(self.me)
-        mock_sync.side_effect = MAPCoreTokenExpired(mapcore, 'test message')
+        mock_available.side_effect = MAPCoreTokenExpired(mapcore, 'test message')
 
         url = web_url_for('dashboard', _absolute=True)
         res = self.app.get(url, auth=self.me.auth)
         assert_equal(res.status_code, 302)
-        assert_equal(mock_sync.call_count, 1)
+        assert_equal(mock_available.call_count, 1)
+        assert_equal(mock_sync.call_count, 0)
         assert_equal(mock_ember.call_count, 0)
         mapcore_oauth_start_url = web_url_for('mapcore_oauth_start')
         assert_in(mapcore_oauth_start_url + '?next_url=',
@@ -1040,15 +1083,17 @@ class TestViewsWithMAPCore(OsfTestCase):
 
     @mock.patch('nii.mapcore.MAPCORE_CLIENTID', 'test_my_projects')
     @mock.patch('nii.mapcore.mapcore_sync_rdm_my_projects0')
+    @mock.patch('nii.mapcore.mapcore_api_is_available0')
     @mock.patch('website.mapcore.views.mapcore_request_authcode')
-    def test_my_projects_without_token(self, mock_ac, mock_sync):
+    def test_my_projects_without_token(self, mock_ac, mock_available, mock_sync):
         mapcore = MAPCore(self.me)
-        mock_sync.side_effect = MAPCoreTokenExpired(mapcore, 'test message')
+        mock_available.side_effect = MAPCoreTokenExpired(mapcore, 'test message')
 
         url = web_url_for('my_projects', _absolute=True)
         res = self.app.get(url, auth=self.me.auth)
         assert_equal(res.status_code, 302)
-        assert_equal(mock_sync.call_count, 1)
+        assert_equal(mock_available.call_count, 1)
+        assert_equal(mock_sync.call_count, 0)
         mapcore_oauth_start_url = web_url_for('mapcore_oauth_start')
         assert_in(mapcore_oauth_start_url + '?next_url=',
                   res.headers.get('Location'))
@@ -1076,16 +1121,40 @@ class TestViewsWithMAPCore(OsfTestCase):
     @mock.patch('nii.mapcore.MAPCORE_CLIENTID', 'test_dashboard')
     @mock.patch('website.views.use_ember_app')
     @mock.patch('nii.mapcore.mapcore_sync_rdm_my_projects0')
-    def test_dashboard(self, mock_sync, mock_ember):
+    @mock.patch('nii.mapcore.mapcore_api_is_available0')
+    def test_dashboard(self, mock_available, mock_sync, mock_ember):
         url = web_url_for('dashboard', _absolute=True)
         res = self.app.get(url, auth=self.me.auth)
         assert_equal(res.status_code, 200)
+        assert_equal(mock_available.call_count, 1)
         assert_equal(mock_sync.call_count, 1)
         assert_equal(mock_ember.call_count, 1)
 
     @mock.patch('nii.mapcore.MAPCORE_CLIENTID', 'test_my_projects')
     @mock.patch('nii.mapcore.mapcore_sync_rdm_my_projects0')
-    def test_my_projects(self, mock_sync):
+    @mock.patch('nii.mapcore.mapcore_api_is_available0')
+    def test_my_projects(self, mock_available, mock_sync):
+        url = web_url_for('my_projects', _absolute=True)
+        res = self.app.get(url, auth=self.me.auth)
+        assert_equal(res.status_code, 200)
+        assert_equal(mock_available.call_count, 1)
+        assert_equal(mock_sync.call_count, 1)
+
+    @mock.patch('nii.mapcore.MAPCORE_CLIENTID', 'test_my_projects')
+    @mock.patch('nii.mapcore.mapcore_sync_rdm_my_projects0')
+    @mock.patch('nii.mapcore.mapcore_api_is_available0')
+    def test_my_projects_synchronized_once_per_interval(self, mock_available, mock_sync):
+        url = web_url_for('my_projects', _absolute=True)
+        self.app.get(url, auth=self.me.auth)
+        res = self.app.get(url, auth=self.me.auth)
+        assert_equal(res.status_code, 200)
+        assert_equal(mock_available.call_count, 2)
+        assert_equal(mock_sync.call_count, 1)
+
+    @mock.patch('nii.mapcore.MAPCORE_CLIENTID', 'test_my_projects')
+    @mock.patch('nii.mapcore.mapcore_sync_rdm_my_projects0')
+    @mock.patch('website.settings.MAPCORE_SYNC_MY_PROJECTS_IN_BACKGROUND', False)
+    def test_my_projects_in_request(self, mock_sync):
         url = web_url_for('my_projects', _absolute=True)
         res = self.app.get(url, auth=self.me.auth)
         assert_equal(res.status_code, 200)
@@ -1096,6 +1165,26 @@ class TestViewsWithMAPCore(OsfTestCase):
     @mock.patch('nii.mapcore.mapcore_api_is_available0')
     #@mock.patch('framework.auth.decorators.mapcore_sync_rdm_project_or_map_group')  # cannot hook
     def test_view_project(self, mock_sync2, mock_sync1):
+        res = self.app.get(self.project_url, auth=self.me.auth)
+        assert_equal(res.status_code, 200)
+        assert_equal(mock_sync1.call_count, 1)  # enqueued once per interval
+        assert_equal(mock_sync2.call_count, 1)
+
+    @mock.patch('nii.mapcore.MAPCORE_CLIENTID', 'test_view_project')
+    @mock.patch('nii.mapcore.mapcore_sync_rdm_project_or_map_group0')
+    @mock.patch('nii.mapcore.mapcore_api_is_available0')
+    def test_view_project_synchronized_once_per_interval(self, mock_sync2, mock_sync1):
+        self.app.get(self.project_url, auth=self.me.auth)
+        res = self.app.get(self.project_url, auth=self.me.auth)
+        assert_equal(res.status_code, 200)
+        assert_equal(mock_sync1.call_count, 1)
+        assert_equal(mock_sync2.call_count, 2)
+
+    @mock.patch('nii.mapcore.MAPCORE_CLIENTID', 'test_view_project')
+    @mock.patch('nii.mapcore.mapcore_sync_rdm_project_or_map_group0')
+    @mock.patch('nii.mapcore.mapcore_api_is_available0')
+    @mock.patch('website.settings.MAPCORE_SYNC_PROJECT_IN_BACKGROUND', False)
+    def test_view_project_in_request(self, mock_sync2, mock_sync1):
         res = self.app.get(self.project_url, auth=self.me.auth)
         assert_equal(res.status_code, 200)
         assert_equal(mock_sync1.call_count, 2)  # at decorator.py and _view_project()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+import mock
+from nose import tools as nt
+
+from osf.models import NodeLog, PostUploadJob
+from osf_tests.factories import ProjectFactory, AuthUserFactory
+from tests.base import OsfTestCase
+from website.util import post_upload
+
+
+def file_metadata(path, provider='osfstorage', size=1234):
+    return {
+        'provider': provider,
+        'name': path.strip('/'),
+        'materialized': path,
+        'path': path,
+        'kind': 'file',
+        'size': size,
+        'created_utc': '',
+        'modified_utc': '',
+        'extra': {'version': '1'},
+    }
+
+
+@mock.patch('website.util.post_upload.enqueue_task')
+class TestPostUploadJobs(OsfTestCase):
+
+    def setUp(self):
+        super(TestPostUploadJobs, self).setUp()
+        self.user = AuthUserFactory()
+        self.node = ProjectFactory(creator=self.user)
+
+    def enqueue(self, action, path, **kwargs):
+        metadata = file_metadata(path, **kwargs)
+        return post_upload.enqueue(self.node, self.user, action,
+                                   {'provider': metadata['provider'], 'metadata': metadata},
+                                   metadata=metadata,
+                                   created_flag=action == NodeLog.FILE_ADDED)
+
+    def test_coalesce_same_file(self, mock_enqueue_task):
+        first = self.enqueue(NodeLog.FILE_ADDED, '/a.txt', size=1)
+        second = self.enqueue(NodeLog.FILE_UPDATED, '/a.txt', size=2)
+        nt.assert_equal(first.id, second.id)
+        job = PostUploadJob.objects.get(node=self.node)
+        nt.assert_true(job.created_flag)
+        nt.assert_equal(job.metadata['size'], 2)
+        nt.assert_equal([e['event_type'] for e in job.events],
+                        [NodeLog.FILE_ADDED, NodeLog.FILE_UPDATED])
+        nt.assert_equal(mock_enqueue_task.call_count, 2)
+
+    def test_no_coalesce_other_file(self, mock_enqueue_task):
+        self.enqueue(NodeLog.FILE_ADDED, '/a.txt')
+        self.enqueue(NodeLog.FILE_ADDED, '/b.txt')
+        self.enqueue(NodeLog.FILE_UPDATED, '/a.txt')
+        nt.assert_equal(PostUploadJob.objects.filter(node=self.node).count(), 3)
+
+    def test_remove_cancels_timestamp(self, mock_enqueue_task):
+        self.enqueue(NodeLog.FILE_ADDED, '/dir/a.txt')
+        post_upload.enqueue(self.node, self.user, NodeLog.FILE_REMOVED, {
+            'provider': 'osfstorage',
+            'metadata': {'provider': 'osfstorage', 'materialized': '/dir/', 'path': '/dir/'},
+        })
+        nt.assert_false(post_upload.is_timestamp_pending(self.node, 'osfstorage', '/dir/a.txt'))
+        # the signals of both operations are still sent, in order
+        job = PostUploadJob.objects.get(node=self.node)
+        nt.assert_equal(job.kind, PostUploadJob.KIND_SIGNALS)
+        nt.assert_equal([e['event_type'] for e in job.events],
+                        [NodeLog.FILE_ADDED, NodeLog.FILE_REMOVED])
+
+    def enqueue_move(self, src, dest):
+        metadata = file_metadata(dest)
+        return post_upload.enqueue(self.node, self.user, NodeLog.FILE_MOVED,
+                                   {'source': file_metadata(src), 'destination': metadata},
+                                   metadata=metadata, move={
+                                       'src_provider': 'osfstorage',
+                                       'dest_provider': 'osfstorage',
+                                       'src_path': src.lstrip('/'),
+                                       'dest_path': dest.lstrip('/'),
+                                       'src_metadata': file_metadata(src),
+                                   })
+
+    def enqueue_remove(self, path):
+        post_upload.enqueue(self.node, self.user, NodeLog.FILE_REMOVED, {
+            'provider': 'osfstorage',
+            'metadata': {'provider': 'osfstorage', 'materialized': path, 'path': path},
+        })
+
+    @mock.patch('website.util.post_upload.timestamp')
+    def test_remove_after_move_removes_source(self, mock_timestamp, mock_enqueue_task):
+        self.enqueue(NodeLog.FILE_ADDED, '/a.txt')
+        self.enqueue_move('/a.txt', '/b.txt')
+        self.enqueue_remove('/b.txt')
+        # the move is not applied later, it would bring the file back
+        nt.assert_false(PostUploadJob.objects.filter(node=self.node).exclude(
+            kind=PostUploadJob.KIND_SIGNALS).exists())
+        mock_timestamp.file_node_deleted.assert_called_once_with(self.node._id, 'osfstorage', '/a.txt')
+        event_types = [e['event_type'] for job in PostUploadJob.objects.filter(node=self.node).order_by('id')
+                       for e in job.events]
+        nt.assert_equal(event_types, [NodeLog.FILE_ADDED, NodeLog.FILE_MOVED, NodeLog.FILE_REMOVED])
+
+    @mock.patch('website.util.post_upload.timestamp')
+    def test_remove_in_moved_folder_removes_source(self, mock_timestamp, mock_enqueue_task):
+        self.enqueue_move('/a/', '/b/')
+        self.enqueue_remove('/b/x.txt')
+        mock_timestamp.file_node_deleted.assert_called_once_with(self.node._id, 'osfstorage', '/a/x.txt')
+        # the rest of the folder is still moved
+        nt.assert_true(PostUploadJob.objects.filter(node=self.node, kind=PostUploadJob.KIND_MOVED).exists())
+
+    @mock.patch('website.util.post_upload.timestamp')
+    def test_remove_after_move_keeps_newer_source(self, mock_timestamp, mock_enqueue_task):
+        self.enqueue_move('/a.txt', '/b.txt')
+        self.enqueue(NodeLog.FILE_ADDED, '/a.txt')
+        self.enqueue_remove('/b.txt')
+        # /a.txt uploaded after the move is another file
+        nt.assert_true(post_upload.is_timestamp_pending(self.node, 'osfstorage', '/a.txt'))
+
+    @mock.patch('website.util.post_upload.timestamp')
+    @mock.patch('website.util.post_upload.refresh_file_node')
+    @mock.patch('website.util.post_upload.file_signals')
+    def test_process(self, mock_signals, mock_refresh, mock_timestamp, mock_enqueue_task):
+        self.enqueue(NodeLog.FILE_ADDED, '/a.txt')
+        self.enqueue(NodeLog.FILE_UPDATED, '/a.txt')
+        self.enqueue(NodeLog.FILE_ADDED, '/b.txt')
+        nt.assert_true(post_upload.is_timestamp_pending(self.node, 'osfstorage', 'a.txt'))
+
+        post_upload.process_post_upload_jobs()
+
+        nt.assert_false(PostUploadJob.objects.filter(node=self.node).exists())
+        event_types = [c[1]['event_type'] for c in mock_signals.file_updated.send.call_args_list]
+        nt.assert_equal(event_types, [NodeLog.FILE_ADDED, NodeLog.FILE_UPDATED, NodeLog.FILE_ADDED])
+        nt.assert_equal(mock_refresh.call_count, 2)
+        nt.assert_equal(mock_timestamp.file_created_or_updated.call_count, 2)
+        nt.assert_true(mock_timestamp.file_created_or_updated.call_args_list[0][0][3])
+
+    @mock.patch('website.util.post_upload.timestamp')
+    @mock.patch('website.util.post_upload.refresh_file_node')
+    @mock.patch('website.util.post_upload.file_signals')
+    def test_failure_keeps_order(self, mock_signals, mock_refresh, mock_timestamp, mock_enqueue_task):
+        first = self.enqueue(NodeLog.FILE_ADDED, '/a.txt')
+        second = self.enqueue(NodeLog.FILE_ADDED, '/b.txt')
+        mock_refresh.side_effect = IOError('WaterButler is down')
+
+        post_upload.process_post_upload_jobs()
+
+        first.reload()
+        second.reload()
+        nt.assert_equal(first.status, PostUploadJob.STATUS_PENDING)
+        nt.assert_equal(first.attempts, 1)
+        nt.assert_in('WaterButler is down', first.error)
+        # signals are not sent again on retry
+        nt.assert_equal(first.events, [])
+        # the next job of the node waits for the failed one
+        nt.assert_equal(second.status, PostUploadJob.STATUS_PENDING)
+        nt.assert_equal(second.attempts, 0)
+        nt.assert_equal(len(second.events), 1)
+
+    @mock.patch('website.util.post_upload.timestamp')
+    @mock.patch('website.util.post_upload.refresh_file_node')
+    @mock.patch('website.util.post_upload.file_signals')
+    def test_failed_after_max_attempts(self, mock_signals, mock_refresh, mock_timestamp, mock_enqueue_task):
+        job = self.enqueue(NodeLog.FILE_ADDED, '/a.txt')
+        mock_refresh.side_effect = IOError('WaterButler is down')
+
+        with mock.patch('website.settings.POST_UPLOAD_MAX_ATTEMPTS', 2):
+            post_upload.process_post_upload_jobs()
+            post_upload.process_post_upload_jobs()
+            post_upload.process_post_upload_jobs()
+
+        job.reload()
+        nt.assert_equal(job.status, PostUploadJob.STATUS_FAILED)
+        nt.assert_equal(job.attempts, 2)
+        pending = post_upload.get_pending_timestamps(self.node)
+        nt.assert_equal(len(pending), 1)
+        nt.assert_equal(pending[0]['status'], PostUploadJob.STATUS_FAILED)
+
+    def test_pending_timestamps_view(self, mock_enqueue_task):
+        self.enqueue(NodeLog.FILE_ADDED, '/a.txt')
+        url = self.node.api_url_for('pending_timestamps')
+        res = self.app.get(url, auth=self.user.auth)
+        nt.assert_equal(res.status_code, 200)
+        nt.assert_equal(res.json['pending'][0]['path'], '/a.txt')
+        nt.assert_equal(res.json['pending'][0]['status'], PostUploadJob.STATUS_PENDING)
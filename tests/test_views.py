@@ -58,7 +58,7 @@ from website.project.views.contributor import (
     send_claim_registered_email,
 )
 from website import views as website_view
-from website.project.views.node import _should_show_wiki_widget, _view_project, abbrev_authors
+from website.project.views.node import _should_show_wiki_widget, _view_project, abbrev_authors, get_recent_logs
 from website.util import api_url_for, web_url_for
 from website.util import rubeus
 from website.util.timestamp import userkey_generation, AddTimestamp
@@ -308,6 +308,18 @@ class TestProjectViews(OsfTestCase):
         self.project2.add_contributor(self.user2, auth=Auth(self.user1))
         self.project2.save()
 
+    def test_get_recent_logs(self):
+        now = timezone.now()
+        logs = [
+            self.project.add_log(
+                NodeLog.EDITED_DESCRIPTION, params={'node': self.project._id},
+                auth=self.consolidate_auth1, log_date=now + dt.timedelta(minutes=i),
+            )
+            for i in range(4)
+        ]
+        res = get_recent_logs(node=self.project)
+        assert_equal(res['logs'], [log._id for log in reversed(logs[1:])])
+
     @mock.patch('framework.status.push_status_message')
     def test_view_project_tos_status_message(self, mock_push_status_message):
         self.app.get(
@@ -60,6 +60,8 @@ def attach_handlers(app, settings):
     add_handlers(app, transaction_handlers.handlers)
     add_handlers(app, postcommit_handlers.handlers)
     add_handlers(app, csrf_handlers.handlers)
+    if settings.QUERY_COUNT_HEADER:
+        add_handlers(app, django_handlers.query_count_handlers)
 
     # Attach handler for checking view-only link keys.
     # NOTE: This must be attached AFTER the TokuMX to avoid calling
@@ -88,7 +90,8 @@ def init_app(settings_module='website.settings', set_backends=True, routes=True,
 
     :param settings_module: A string, the settings module to use.
     :param set_backends: Deprecated.
-    :param routes: Whether to set the url map.
+    :param routes: Whether to set the url map. If False and settings.LAZY_ADDON_LOADING
+        is set, the routes of the addons are only added when one of their URLs is built.
 
     """
     # Ensure app initialization only takes place once
@@ -114,11 +117,15 @@ def init_app(settings_module='website.settings', set_backends=True, routes=True,
     app.config['SESSION_COOKIE_HTTPONLY'] = settings.SESSION_COOKIE_HTTPONLY
 
     if routes:
+        from addons.base.apps import load_addon_routes
+        load_addon_routes()
         try:
             from website.routes import make_url_map
             make_url_map(app)
         except AssertionError:  # Route map has already been created
             pass
+        # Sort the rules now rather than on the first request of each worker
+        app.url_map.update()
 
     if attach_request_handlers:
         attach_handlers(app, settings)
@@ -38,6 +38,32 @@ def on_node_updated(node_id, user_id, first_save, saved_fields, request_headers=
     if node.get_identifier_value('doi') and bool(node.IDENTIFIER_UPDATE_FIELDS.intersection(saved_fields)):
         node.request_identifier_update(category='doi')
 
+@celery_app.task(ignore_results=True)
+def on_contributors_changed(node_id, user_id, added, email_template, notify_unregistered=True):
+    """Side effects of AbstractNode.bulk_add_contributors/bulk_remove_contributors,
+    run once for all the contributors of the operation.
+
+    :param dict added: guid of each added contributor -> permission
+    """
+    from framework.auth import Auth
+    from nii.mapcore import mapcore_sync_is_enabled, mapcore_sync_map_group
+    from website.project import signals as project_signals
+    AbstractNode = apps.get_model('osf.AbstractNode')
+    OSFUser = apps.get_model('osf.OSFUser')
+    node = AbstractNode.load(node_id)
+    user = OSFUser.load(user_id) if user_id else None
+    auth = Auth(user) if user else None
+
+    for contributor in OSFUser.objects.filter(guids___id__in=added.keys()):
+        template = email_template if contributor.is_registered or notify_unregistered else 'false'
+        project_signals.contributor_added.send(node, contributor=contributor, auth=auth,
+                                               email_template=template, permissions=added[contributor._id])
+
+    project_signals.contributors_updated.send(node)
+    node.update_search()
+    if user and mapcore_sync_is_enabled():
+        mapcore_sync_map_group(user, node)
+
 def update_collecting_metadata(node, saved_fields):
     from website.search.search import update_collected_metadata
     if node.is_collected:
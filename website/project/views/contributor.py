@@ -231,21 +231,17 @@ def project_contributors_post(auth, node, **kwargs):
     except ValidationError as e:
         return {'status': 400, 'message': e.message}, 400
 
+    # Notifications, search, mAP core and institutional storages are
+    # updated by a single task per node
     try:
-        node.add_contributors(contributors=contribs, auth=auth)
+        node.bulk_add_contributors(contribs, auth=auth)
     except NodeStateError as e:
         return {'status': 400, 'message': e.args[0]}, 400
 
     node.save()
-    if mapcore_sync_is_enabled():
-        mapcore_sync_map_group(auth.user, node)
-
-    # Disconnect listener to avoid multiple invite emails
-    unreg_contributor_added.disconnect(finalize_invitation)
 
     for child_id in node_ids:
         child = AbstractNode.load(child_id)
-        # Only email unreg users once
         try:
             child_contribs = deserialize_contributors(
                 child, user_dicts, auth=auth, validate=True
@@ -253,13 +249,9 @@ def project_contributors_post(auth, node, **kwargs):
         except ValidationError as e:
             return {'status': 400, 'message': e.message}, 400
 
-        child.add_contributors(contributors=child_contribs, auth=auth)
+        # Only email unreg users once
+        child.bulk_add_contributors(child_contribs, auth=auth, notify_unregistered=False)
         child.save()
-        if mapcore_sync_is_enabled():
-            mapcore_sync_map_group(auth.user, child)
-
-    # Reconnect listeners
-    unreg_contributor_added.connect(finalize_invitation)
 
     return {
         'status': 'success',
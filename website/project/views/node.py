@@ -70,6 +70,7 @@ from nii.mapcore_api import MAPCoreException
 from nii.mapcore import (mapcore_sync_is_enabled,
                          mapcore_log_error,
                          mapcore_sync_rdm_project_or_map_group,
+                         mapcore_enqueue_sync_rdm_project_or_map_group,
                          mapcore_sync_map_group)
 
 r_strip_html = lambda collection: rapply(collection, strip_html)
@@ -772,7 +773,9 @@ def _view_project(node, auth, primary=False,
 
     user = auth.user
 
-    if mapcore_sync_is_enabled():
+    if mapcore_sync_is_enabled() and settings.MAPCORE_SYNC_PROJECT_IN_BACKGROUND:
+        mapcore_enqueue_sync_rdm_project_or_map_group(auth.user, node)
+    elif mapcore_sync_is_enabled():
         try:
             mapcore_sync_rdm_project_or_map_group(auth.user, node)
         except MAPCoreException as e:
@@ -1089,7 +1092,7 @@ def get_editable_children(auth, node, **kwargs):
 
 @must_be_valid_project
 def get_recent_logs(node, **kwargs):
-    logs = list(reversed(node.logs._to_primary_keys()))[:3]
+    logs = list(node.logs.order_by('-date').values_list('_id', flat=True)[:3])
     return {'logs': logs}
 
 
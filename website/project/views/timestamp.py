@@ -7,7 +7,7 @@ from flask import request
 from website.util import rubeus
 from website.project.decorators import must_be_contributor_or_public
 from website.project.views.node import _view_project
-from website.util import timestamp
+from website.util import post_upload, timestamp
 from website import settings
 from osf.models import TimestampTask
 
@@ -59,3 +59,8 @@ def cancel_task(auth, node, **kwargs):
 @must_be_contributor_or_public
 def task_status(auth, node, **kwargs):
     return timestamp.get_celery_task_progress(node)
+
+@must_be_contributor_or_public
+def pending_timestamps(auth, node, **kwargs):
+    """Files whose timestamp is waiting for the post-upload worker."""
+    return {'pending': post_upload.get_pending_timestamps(node)}
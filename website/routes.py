@@ -1944,6 +1944,15 @@ def make_url_map(app):
             project_views.timestamp.task_status,
             json_renderer,
         ),
+        Rule(
+            [
+                '/project/<pid>/timestamp/pending/',
+                '/project/<pid>/node/<nid>/timestamp/pending/',
+            ],
+            'get',
+            project_views.timestamp.pending_timestamps,
+            json_renderer,
+        ),
         Rule(
             [
                 '/project/<pid>/timestamp/download_errors/',
@@ -268,6 +268,22 @@ with open(os.path.join(ROOT, 'addons.json')) as fp:
     ADDONS_DEFAULT = addon_settings['addons_default']
     ADDONS_OAUTH_NO_REDIRECT = addon_settings['addons_oauth_no_redirect']
 
+# Import the routes and views of the add-ons when their URLs are first needed
+# instead of at startup. The web app (init_app(routes=True)) still loads them
+# all at startup; the API, admin, celery workers and scripts mostly never do.
+LAZY_ADDON_LOADING = True
+# Modules that connect signal receivers when imported, which used to be
+# imported as a side effect of loading the add-on routes.
+SIGNAL_RECEIVER_MODULES = (
+    'addons.base.views',
+    'addons.base.institutions_utils',
+    'website.mailchimp_utils',
+    'website.osf_groups.views',
+    'website.profile.views',
+    'website.project.views',
+    'website.util.quota',
+)
+
 SYSTEM_ADDED_ADDONS = {
     'user': [],
     'node': [],
@@ -323,6 +339,32 @@ DEFAULT_HMAC_ALGORITHM = hashlib.sha256
 WATERBUTLER_URL = 'http://localhost:7777'
 WATERBUTLER_INTERNAL_URL = WATERBUTLER_URL
 
+# Institutional storage health checks (admin/rdm_custom_storage_location/health.py)
+# Seconds a probe may take before the storage is recorded as down
+STORAGE_HEALTH_CHECK_TIMEOUT = 10
+# Number of storages probed at a time
+STORAGE_HEALTH_CHECK_MAX_WORKERS = 8
+# Seconds a result is trusted, e.g. to skip a storage known to be down
+STORAGE_HEALTH_CHECK_TTL = 15 * 60
+# Days of results kept as history
+STORAGE_HEALTH_CHECK_HISTORY_DAYS = 7
+
+# Post-processing of the file operations reported by WaterButler (website/util/post_upload.py)
+# Refresh hashes, update timestamps and send file_updated signals in a worker
+# instead of the WaterButler callback
+POST_UPLOAD_ASYNC = True
+# Number of jobs claimed by a worker at a time
+POST_UPLOAD_BATCH_SIZE = 50
+POST_UPLOAD_MAX_ATTEMPTS = 3
+# Seconds after which a running job is considered abandoned by its worker
+POST_UPLOAD_STALE_SEC = 30 * 60
+
+# Views and downloads buffered by PageCounter.update_counter which are rolled
+# up into the counters at a time (framework.analytics.rollup_page_counters)
+PAGE_COUNTER_ROLLUP_BATCH_SIZE = 10000
+# Days the user activity is kept per day before it is rolled up per month
+ACTIVITY_DAILY_BUCKET_DAYS = 90
+
 ####################
 #   Identifiers   #
 ###################
@@ -415,6 +457,7 @@ class CeleryConfig:
         'scripts.analytics.run_keen_events',
         'scripts.clear_sessions',
         'scripts.remove_after_use.end_prereg_challenge',
+        'admin.rdm_announcement.tasks',
     }
 
     med_pri_modules = {
@@ -493,6 +536,10 @@ class CeleryConfig:
         'scripts.premigrate_created_modified',
         'scripts.add_missing_identifiers_to_preprints',
         'nii.mapcore_refresh_tokens',
+        'nii.mapcore',
+        'admin.rdm_announcement.tasks',
+        'website.util.post_upload',
+        'framework.analytics',
     )
 
     # Modules that need metrics and release requirements
@@ -600,6 +647,18 @@ class CeleryConfig:
                 'task': 'scripts.generate_sitemap',
                 'schedule': crontab(minute=0, hour=5),  # Daily 12:00 a.m.
             },
+            'post_upload_jobs': {
+                'task': 'website.util.post_upload.process_post_upload_jobs',
+                'schedule': crontab(minute='*/5'),  # retry jobs left pending
+            },
+            'rollup_page_counters': {
+                'task': 'framework.analytics.rollup_page_counters',
+                'schedule': crontab(minute='*'),  # every minute
+            },
+            'rollup_user_activity_counters': {
+                'task': 'framework.analytics.rollup_user_activity_counters',
+                'schedule': crontab(minute=30, hour=5),  # Daily 12:30 a.m
+            },
             'mapcore_refresh_token': {
                 'task': 'nii.mapcore_refresh_tokens',
                 'schedule': crontab(minute=0, hour=10),  # Daily 5:00 a.m. EST (-5h)
@@ -629,6 +688,12 @@ WATERBUTLER_JWE_SECRET = 'CirclesAre4Squares'
 WATERBUTLER_JWT_SECRET = 'ILiekTrianglesALot'
 WATERBUTLER_JWT_ALGORITHM = 'HS256'
 WATERBUTLER_JWT_EXPIRATION = 15
+# Seconds the access checks of the WaterButler auth endpoint are cached, 0 to disable
+WATERBUTLER_AUTH_CACHE_TTL = 30
+
+# Add the number of SQL queries of each request in a X-Query-Count header,
+# used by scripts/loadtest. Do not enable in production.
+QUERY_COUNT_HEADER = False
 
 SENSITIVE_DATA_SALT = 'yusaltydough'
 SENSITIVE_DATA_SECRET = 'TrainglesAre5Squares'
@@ -1966,6 +2031,18 @@ MAPCORE_REFRESH_PATH = '/oauth/token.php'
 MAPCORE_AUTHCODE_MAGIC = 'GRDM_mAP_AuthCode'
 MAPCORE_CLIENTID = None
 MAPCORE_SECRET = None
+# Synchronize "My Projects" with mAP groups in a background task instead of in the page request
+MAPCORE_SYNC_MY_PROJECTS_IN_BACKGROUND = True
+# Minimum interval (sec.) between two background "My Projects" synchronizations of a user
+MAPCORE_SYNC_MY_PROJECTS_INTERVAL = 60
+# Synchronize a project with its mAP group in a background task instead of in the page request
+MAPCORE_SYNC_PROJECT_IN_BACKGROUND = True
+# Minimum interval (sec.) between two background synchronizations of a project
+MAPCORE_SYNC_PROJECT_INTERVAL = 10
+# Maximum number of projects synchronized in parallel by a "My Projects" synchronization
+MAPCORE_SYNC_MAX_WORKERS = 4
+# Maximum age (sec.) of the cached member list of a mAP group
+MAPCORE_GROUP_MEMBERS_CACHE_TIMEOUT = 60 * 10
 
 # allow logged-in-user to search private projects
 ENABLE_PRIVATE_SEARCH = False
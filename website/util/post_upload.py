@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""Post-processing of the file operations reported by WaterButler.
+
+create_waterbutler_log records the log and queues a PostUploadJob; the
+file_updated signals (quota, guids, notifications), the refresh of the file
+hashes and the timestamp are then handled here by a worker.
+
+Jobs of a node are processed in the order of the operations, by one worker at
+a time. Signals are sent exactly once each, while the refresh and the
+timestamp are retried up to POST_UPLOAD_MAX_ATTEMPTS times.
+"""
+import datetime
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from addons.base import signals as file_signals
+from framework.celery_tasks import app as celery_app
+from framework.celery_tasks.handlers import enqueue_task
+from osf.models import AbstractNode, BaseFileNode, NodeLog, OSFUser, PostUploadJob
+from website import settings
+from website.util import timestamp
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(path):
+    return '/' + (path or '').lstrip('/')
+
+def _is_under(path, parent):
+    path, parent = _normalize(path), _normalize(parent)
+    return path == parent or (parent.endswith('/') and path.startswith(parent))
+
+def _cancel_timestamps(node, metadata):
+    """Drop the pending timestamps of the files removed by an operation.
+
+    The removal itself is recorded by timestamp.file_node_deleted, a pending
+    timestamp would bring the file back. The removal is also applied to the
+    sources of the pending moves into the removed path, whose records are
+    not moved yet, and such moves are dropped. Signals of the jobs are kept.
+    """
+    # (provider, path, only for the jobs older than this job id)
+    removed = [(metadata['provider'], metadata['materialized'], None)]
+    jobs = PostUploadJob.objects.select_for_update().filter(
+        node=node, status=PostUploadJob.STATUS_PENDING,
+        kind__in=[PostUploadJob.KIND_CREATED_OR_UPDATED, PostUploadJob.KIND_MOVED],
+    ).order_by('-id')
+    for job in jobs:
+        paths = [(provider, path) for provider, path, before in removed
+                 if before is None or job.id < before]
+        if job.kind == PostUploadJob.KIND_CREATED_OR_UPDATED:
+            cancelled = any(job.provider == provider and _is_under(job.metadata.get('materialized'), path)
+                            for provider, path in paths)
+        else:
+            move = job.move
+            cancelled = False
+            for provider, path in paths:
+                if provider != move['dest_provider']:
+                    continue
+                if _is_under(move['dest_path'], path):
+                    removed.append((move['src_provider'], move['src_path'], job.id))
+                    cancelled = True
+                    break
+                if _is_under(path, move['dest_path']):
+                    rest = _normalize(path)[len(_normalize(move['dest_path'])):]
+                    removed.append((move['src_provider'], _normalize(move['src_path']) + rest, job.id))
+        if cancelled:
+            job.kind = PostUploadJob.KIND_SIGNALS
+            job.metadata = None
+            job.move = None
+            job.save()
+    for provider, path, before in removed[1:]:
+        timestamp.file_node_deleted(node._id, provider, _normalize(path))
+
+def _can_coalesce(job, kind, provider, path):
+    if job.status != PostUploadJob.STATUS_PENDING or job.kind != kind:
+        return False
+    if kind == PostUploadJob.KIND_SIGNALS:
+        return True
+    return kind == PostUploadJob.KIND_CREATED_OR_UPDATED and \
+        (job.provider, job.path) == (provider, path)
+
+def enqueue(node, user, event_type, payload, metadata=None, created_flag=False, move=None):
+    """Queue the work after an operation reported by WaterButler.
+
+    `metadata` is the file created, updated or moved to, `move` the other
+    arguments of timestamp.file_node_moved. The job is merged into the latest job of
+    the node when that job is still pending and is about the same file, so
+    the timestamp of a file saved repeatedly is updated once.
+    """
+    if move is not None:
+        kind = PostUploadJob.KIND_MOVED
+    elif metadata is not None:
+        kind = PostUploadJob.KIND_CREATED_OR_UPDATED
+    else:
+        kind = PostUploadJob.KIND_SIGNALS
+    provider = metadata['provider'] if metadata is not None else None
+    path = _normalize(metadata['path']) if metadata is not None else None
+    event = {'user': user._id, 'event_type': event_type, 'payload': payload}
+
+    with transaction.atomic():
+        if event_type == NodeLog.FILE_REMOVED:
+            _cancel_timestamps(node, payload['metadata'])
+        latest = PostUploadJob.objects.select_for_update().filter(node=node).order_by('-id').first()
+        if latest is not None and _can_coalesce(latest, kind, provider, path):
+            job = latest
+            job.events = job.events + [event]
+            if kind == PostUploadJob.KIND_CREATED_OR_UPDATED:
+                job.user = user
+                job.metadata = metadata
+                job.created_flag = job.created_flag or created_flag
+            job.save()
+        else:
+            job = PostUploadJob.objects.create(
+                node=node, user=user, kind=kind, provider=provider, path=path,
+                metadata=metadata, created_flag=created_flag, move=move,
+                events=[event])
+    enqueue_task(process_post_upload_jobs.si())
+    return job
+
+def refresh_file_node(node, user, provider, path, auth_header=None):
+    """Update the hashes of the file from WaterButler for its timestamp."""
+    with transaction.atomic():
+        # to reduce possibility of MultipleObjectsReturned.
+        # [GRDM-13530, 15698, 17045, 17065]
+        # (MultipleObjectsReturned may occur when creation of
+        #  BaseFileNode is called in long transaction.)
+        file_node = BaseFileNode.resolve_class(
+            provider, BaseFileNode.FILE
+        ).get_or_create(node, _normalize(path))
+        if file_node and getattr(file_node, 'get_hash_for_timestamp', None):
+            file_node.touch(auth_header, cookie=user.get_or_create_cookie())
+
+def _send_signals(job):
+    while job.events:
+        event = job.events[0]
+        with transaction.atomic():
+            file_signals.file_updated.send(target=job.node,
+                                           user=OSFUser.load(event['user']),
+                                           event_type=event['event_type'],
+                                           payload=event['payload'])
+            job.events = job.events[1:]
+            job.save(update_fields=['events'])
+
+def _update_timestamp(job):
+    node, user = job.node, job.user
+    if job.kind == PostUploadJob.KIND_CREATED_OR_UPDATED:
+        refresh_file_node(node, user, job.provider, job.path)
+        with transaction.atomic():  # long transaction
+            timestamp.file_created_or_updated(node, job.metadata, user.id,
+                                              job.created_flag)
+    elif job.kind == PostUploadJob.KIND_MOVED:
+        move = job.move
+        refresh_file_node(node, user, job.provider, job.path)
+        with transaction.atomic():  # long transaction
+            timestamp.file_node_moved(user.id, node._id,
+                                      move['src_provider'], move['dest_provider'],
+                                      move['src_path'], move['dest_path'],
+                                      job.metadata, move['src_metadata'])
+
+def run_job(job):
+    try:
+        _send_signals(job)
+        _update_timestamp(job)
+    except Exception as e:
+        logger.exception('Post-upload job {} of node {} failed'.format(job.id, job.node_id))
+        job.attempts += 1
+        job.error = u'{}: {}'.format(type(e).__name__, e)
+        if job.attempts >= settings.POST_UPLOAD_MAX_ATTEMPTS:
+            job.status = PostUploadJob.STATUS_FAILED
+        else:
+            job.status = PostUploadJob.STATUS_PENDING
+        job.save()
+        return False
+    job.delete()
+    return True
+
+def claim_jobs(limit, exclude_ids=(), exclude_node_ids=()):
+    """Mark the oldest pending jobs as running and return them.
+
+    A node is claimed by one worker at a time: the rows of the nodes are
+    locked while their jobs are claimed, and nodes which have running jobs
+    are skipped.
+    """
+    with transaction.atomic():
+        pending = PostUploadJob.objects.filter(
+            status=PostUploadJob.STATUS_PENDING,
+            attempts__lt=settings.POST_UPLOAD_MAX_ATTEMPTS,
+        ).exclude(id__in=exclude_ids).exclude(node_id__in=exclude_node_ids)
+        node_ids = set(pending.order_by('id').values_list('node_id', flat=True)[:limit])
+        node_ids = set(AbstractNode.objects.select_for_update(skip_locked=True).filter(
+            id__in=node_ids).values_list('id', flat=True))
+        node_ids -= set(PostUploadJob.objects.filter(
+            status=PostUploadJob.STATUS_RUNNING, node_id__in=node_ids,
+        ).values_list('node_id', flat=True))
+        if not node_ids:
+            return []
+        jobs = list(pending.select_for_update().filter(node_id__in=node_ids).order_by('id')[:limit])
+        PostUploadJob.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=PostUploadJob.STATUS_RUNNING, modified=timezone.now())
+    for job in jobs:
+        job.status = PostUploadJob.STATUS_RUNNING
+    return jobs
+
+def requeue_stale_jobs():
+    """Return the jobs of a worker which stopped while running them."""
+    stale = timezone.now() - datetime.timedelta(seconds=settings.POST_UPLOAD_STALE_SEC)
+    return PostUploadJob.objects.filter(
+        status=PostUploadJob.STATUS_RUNNING, modified__lt=stale,
+    ).update(status=PostUploadJob.STATUS_PENDING)
+
+@celery_app.task(ignore_result=True)
+def process_post_upload_jobs(batch_size=None):
+    """Run the pending jobs in batches until none is left.
+
+    Each job is tried once per call and the later jobs of its node are left
+    for the next call when it fails, which keeps the order of the signals.
+    The next call is also scheduled periodically.
+    """
+    requeue_stale_jobs()
+    tried = set()
+    failed_node_ids = set()
+    done = 0
+    while True:
+        jobs = claim_jobs(batch_size or settings.POST_UPLOAD_BATCH_SIZE,
+                          exclude_ids=tried, exclude_node_ids=failed_node_ids)
+        if not jobs:
+            break
+        for job in jobs:
+            if job.node_id in failed_node_ids:
+                PostUploadJob.objects.filter(id=job.id).update(status=PostUploadJob.STATUS_PENDING)
+                continue
+            tried.add(job.id)
+            if run_job(job):
+                done += 1
+            else:
+                failed_node_ids.add(job.node_id)
+    if tried:
+        logger.info('Post-upload jobs: {} done, {} failed'.format(done, len(tried) - done))
+
+def get_pending_timestamps(node):
+    """Files of the node whose timestamp is not updated yet."""
+    jobs = PostUploadJob.objects.filter(node=node).exclude(
+        kind=PostUploadJob.KIND_SIGNALS).order_by('id')
+    return [{
+        'provider': job.provider,
+        'path': job.path,
+        'materialized': job.metadata.get('materialized'),
+        'status': job.status,
+        'attempts': job.attempts,
+        'error': job.error,
+        'queued_at': job.created.isoformat(),
+    } for job in jobs]
+
+def is_timestamp_pending(node, provider, path):
+    return PostUploadJob.objects.filter(node=node, provider=provider, path=_normalize(path)).exclude(
+        kind=PostUploadJob.KIND_SIGNALS).exists()
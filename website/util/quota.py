@@ -5,8 +5,11 @@ from addons.base import signals as file_signals
 from addons.osfstorage.models import OsfStorageFileNode, Region
 from api.base import settings as api_settings
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Sum
-from django.db.models.functions import Coalesce
+from django.db.models import (
+    BigIntegerField, ExpressionWrapper, F, FloatField, Func, OuterRef, Subquery, Sum, Value
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce
 from osf.models import (
     AbstractNode, BaseFileNode, FileLog, FileInfo, Guid, OSFUser, UserQuota,
     ProjectStorageType
@@ -36,6 +39,65 @@ def used_quota(user_id, storage_type=UserQuota.NII_STORAGE):
         filesize_sum=Coalesce(Sum('file_size'), 0))
     return db_sum['filesize_sum'] if db_sum['filesize_sum'] is not None else 0
 
+def _used_quota_sql(storage_type):
+    """SQL equivalent of used_quota() for the user row of the outer query."""
+    sql = """
+        SELECT COALESCE(SUM(FI.file_size), 0) :: BIGINT
+        FROM {fileinfo} AS FI
+          JOIN {basefilenode} AS F ON F.id = FI.file_id
+          JOIN {abstractnode} AS N ON N.id = F.target_object_id
+          JOIN {projectstoragetype} AS PST ON PST.node_id = N.id
+        WHERE N.creator_id = {osfuser}.id
+          AND PST.storage_type = %s
+          AND F.target_content_type_id = %s
+          AND F.type = ANY(%s)
+          AND F.deleted_on IS NULL
+          AND F.deleted_by_id IS NULL
+    """.format(
+        fileinfo=FileInfo._meta.db_table,
+        basefilenode=BaseFileNode._meta.db_table,
+        abstractnode=AbstractNode._meta.db_table,
+        projectstoragetype=ProjectStorageType._meta.db_table,
+        osfuser=OSFUser._meta.db_table,
+    )
+    return RawSQL(sql, (
+        storage_type,
+        ContentType.objects.get_for_model(AbstractNode).id,
+        list(OsfStorageFileNode._typedmodels_subtypes),
+    ))
+
+def annotate_quota_info(queryset, storage_type=UserQuota.NII_STORAGE):
+    """Annotate an OSFUser queryset with the values of get_quota_info() computed in SQL.
+
+    Adds ``quota_max`` (GB), ``quota_used``, ``quota_remaining`` (bytes),
+    ``quota_ratio`` (percent) and ``guid_id``, so that lists of users can be
+    sorted and paginated by the database.
+    """
+    user_quota = UserQuota.objects.filter(user=OuterRef('pk'), storage_type=storage_type)
+    max_quota_bytes = Cast(F('quota_max'), BigIntegerField()) * Value(api_settings.SIZE_UNIT_GB)
+    return queryset.annotate(
+        guid_id=Subquery(
+            Guid.objects.filter(
+                object_id=OuterRef('pk'),
+                content_type_id=ContentType.objects.get_for_model(OSFUser).id,
+            ).order_by('-created').values('_id')[:1]
+        ),
+        quota_max=Coalesce(
+            Subquery(user_quota.values('max_quota')[:1]),
+            Value(api_settings.DEFAULT_MAX_QUOTA),
+        ),
+        quota_used=Coalesce(
+            Subquery(user_quota.values('used')[:1]),
+            _used_quota_sql(storage_type),
+        ),
+    ).annotate(
+        quota_remaining=ExpressionWrapper(max_quota_bytes - F('quota_used'), output_field=BigIntegerField()),
+        quota_ratio=ExpressionWrapper(
+            F('quota_used') * Value(100.0) / Func(max_quota_bytes, Value(0), function='NULLIF'),
+            output_field=FloatField(),
+        ),
+    )
+
 def abbreviate_size(size):
     size = float(size)
     abbr_dict = {0: 'B', 1: 'KB', 2: 'MB', 3: 'GB', 4: 'TB'}
@@ -17,6 +17,7 @@ from website.util import paths
 from website.settings import DISK_SAVING_MODE
 from osf.utils import sanitize
 from osf.utils.permissions import WRITE_NODE
+from addons.osfstorage.settings import DEFAULT_REGION_ID
 
 
 logger = logging.getLogger(__name__)
@@ -251,6 +252,7 @@ class NodeFileCollector(object):
         rv = []
         region_disabled = False
         region_provider = None
+        region_down = False
         osfstorage = node.get_addon('osfstorage')
         if osfstorage:
             region = osfstorage.region
@@ -260,6 +262,9 @@ class NodeFileCollector(object):
                 storage = region.waterbutler_settings.get('storage', None)
                 if storage:
                     region_provider = storage.get('provider', None)
+                # institutional storage found down by the health check
+                if region._id != DEFAULT_REGION_ID:
+                    region_down = region.is_known_down
 
         for addon in node.get_addons():
             if addon.config.has_hgrid_files:
@@ -268,6 +273,9 @@ class NodeFileCollector(object):
                 if addon.config.for_institutions:
                     if region_provider != addon.config.short_name:
                         continue  # skip (hide this *institutions)
+                if region_down and (addon == osfstorage or addon.config.for_institutions):
+                    rv.append(self._unavailable_addon(addon))
+                    continue
 
                 # WARNING: get_hgrid_data can return None if the addon is added but has no credentials.
                 try:
@@ -281,19 +289,22 @@ class NodeFileCollector(object):
                         )
                     )
                     sentry.log_exception()
-                    rv.append({
-                        KIND: FOLDER,
-                        'unavailable': True,
-                        'iconUrl': addon.config.icon_url,
-                        'provider': addon.config.short_name,
-                        'addonFullname': addon.config.full_name,
-                        'permissions': {'view': False, 'edit': False},
-                        'name': '{} is currently unavailable'.format(addon.config.full_name),
-                    })
+                    rv.append(self._unavailable_addon(addon))
                     continue
                 rv.extend(sort_by_name(temp) or [])
         return rv
 
+    def _unavailable_addon(self, addon):
+        return {
+            KIND: FOLDER,
+            'unavailable': True,
+            'iconUrl': addon.config.icon_url,
+            'provider': addon.config.short_name,
+            'addonFullname': addon.config.full_name,
+            'permissions': {'view': False, 'edit': False},
+            'name': '{} is currently unavailable'.format(addon.config.full_name),
+        }
+
 
 # TODO: these might belong in addons module
 def collect_addon_assets(node):
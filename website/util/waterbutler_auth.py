@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Short-lived cache of the access checks of the WaterButler auth endpoint.
+
+WaterButler calls get_auth for each file of an operation, so the result of
+check_access for (user, node, provider, action) is kept for
+WATERBUTLER_AUTH_CACHE_TTL seconds. The entries of a project and its
+components are invalidated together when the permissions, the privacy or the
+deletion of one of the nodes change: they hold the generation of their
+project, which is replaced on changes. A generation expires some time after
+the entries which hold it, and a missing generation is replaced by a new one,
+so an evicted generation cannot validate older entries. Entries are signed
+with the WaterButler secret; an entry which was not written by this module is
+ignored.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings as django_settings
+from django.core import signing
+from django.core.cache import caches
+
+from website import settings
+
+SALT = 'waterbutler-auth'
+
+
+def _cache():
+    return caches[django_settings.WATERBUTLER_AUTH_CACHE_NAME]
+
+def _generation_key(root_id):
+    return 'generation:{}'.format(root_id)
+
+def _generation_timeout():
+    # longer than the entries, which are only valid with their generation
+    return settings.WATERBUTLER_AUTH_CACHE_TTL * 10
+
+def _new_generation(generation_key):
+    cache = _cache()
+    generation = uuid.uuid4().hex
+    if cache.add(generation_key, generation, _generation_timeout()):
+        return generation
+    # added concurrently
+    return cache.get(generation_key, generation)
+
+def _entry_key(auth, node, provider, action):
+    parts = [
+        auth.user._id if auth.user else u'',
+        auth.private_key or u'',
+        unicode(node.id),
+        provider,
+        action,
+    ]
+    return 'access:' + hashlib.sha256(u'\n'.join(parts).encode('utf8')).hexdigest()
+
+def lookup(auth, node, provider, action):
+    """Whether the access was allowed recently.
+
+    :return tuple: (allowed, generation), pass `generation` to store() once
+        check_access allowed the access
+    """
+    if not settings.WATERBUTLER_AUTH_CACHE_TTL:
+        return False, None
+    entry_key = _entry_key(auth, node, provider, action)
+    generation_key = _generation_key(node.root_id or node.id)
+    values = _cache().get_many([entry_key, generation_key])
+    if generation_key not in values:
+        return False, _new_generation(generation_key)
+    generation = values[generation_key]
+    if entry_key not in values:
+        return False, generation
+    try:
+        allowed_generation = signing.loads(values[entry_key], key=settings.WATERBUTLER_JWT_SECRET,
+                                           salt=SALT, max_age=settings.WATERBUTLER_AUTH_CACHE_TTL)
+    except signing.BadSignature:
+        return False, generation
+    return allowed_generation == generation, generation
+
+def store(auth, node, provider, action, generation):
+    if not settings.WATERBUTLER_AUTH_CACHE_TTL or generation is None:
+        return
+    # generation was read before the access was checked: a change of the
+    # permissions in between makes the entry invalid right away
+    _cache().set(_entry_key(auth, node, provider, action),
+                 signing.dumps(generation, key=settings.WATERBUTLER_JWT_SECRET, salt=SALT),
+                 settings.WATERBUTLER_AUTH_CACHE_TTL)
+
+def invalidate_roots(root_ids):
+    """Forget the access checks of the projects and of their components."""
+    if not settings.WATERBUTLER_AUTH_CACHE_TTL:
+        return
+    _cache().set_many({_generation_key(root_id): uuid.uuid4().hex for root_id in set(root_ids)},
+                      _generation_timeout())
+
+def invalidate(node):
+    invalidate_roots([node.root_id or node.id])
+
+def invalidate_nodes(node_ids):
+    from osf.models import AbstractNode
+    nodes = AbstractNode.objects.filter(id__in=node_ids).values_list('id', 'root_id')
+    invalidate_roots([root_id or node_id for node_id, root_id in nodes])